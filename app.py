@@ -1,50 +1,163 @@
-from flask import Flask, request, render_template, jsonify, send_file, session
+from flask import (Flask, request, render_template, jsonify, send_file, send_from_directory, session, Response,
+                   stream_with_context, g, make_response)
+from functools import wraps
+import hmac
 import os
 import uuid
 import tempfile
 import base64
 import json
 import re
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from werkzeug.utils import secure_filename
-from io import BytesIO
+from io import BytesIO, TextIOWrapper
 import PyPDF2
+from PyPDF2.generic import RectangleObject
 import pdfplumber
-from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 import anthropic
 from PIL import Image
 import logging
+from utils.progress import ProgressHub, SharedProgressHub, stream_events
+from utils.footer_layout import build_footer_assets, is_valid_footer_assets, solve_footer_layout
+from models.company import CompanyModel
+from utils.raster_footer import detect_footer_raster
+from utils.vector_footer import combine_with_text_result, detect_footer_vector
+from utils.page_geometry import build_geometry_table, geometry_classes, page_geometry
+from utils.preview import PREVIEW_THUMBNAIL_DPI, PreviewCache, band_ratio_for, content_hash, render_png
+from utils.pdf_optimize import optimize_pdf
+from utils.incremental_update import write_incremental_update
+from utils.mysouku_builder import RECORD_FORMATS, build_mysouku_pdf, detect_record_format, iter_property_records
+from utils.duplicate_index import DuplicateIndex, page_signature
+from utils.admission import ResourcePool, Saturated
+from utils.redaction_regions import find_redaction_regions, region_area
+from utils.footer_keywords import FOOTER_LINE_MIN_SCORE, prompt_elements, score_categories, score_lines
+from utils.page_text import PageTextCache
+from utils.page_modes import PAGE_MODES, fill_page_results, page_plan_summary, parse_page_ranges, plan_pages
+from utils.profiling import start_profile
+from utils.request_capture import CAPTURE_REDACT_FIELDS, RequestCapture, response_fingerprint
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'realestate_mysouku_converter_secret_key')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
 app.config['PERMANENT_SESSION_LIFETIME'] = 86400 * 30  # 30日間セッション保持
+app.config['DETECT_WORKERS'] = int(os.environ.get('DETECT_WORKERS', '1'))  # ページ検出の並列プロセス数
+app.config['DETECT_PARALLEL_MIN_PAGES'] = int(os.environ.get('DETECT_PARALLEL_MIN_PAGES', '4'))  # 並列化する最小ページ数
+app.config['OPTIMIZE_OUTPUT'] = os.environ.get('OPTIMIZE_OUTPUT', '0') == '1'  # 変換後PDFの出力最適化
+app.config['OUTPUT_WRITE_MODE'] = os.environ.get('OUTPUT_WRITE_MODE', 'full')  # full: 全体を書き直し / incremental: 増分更新で追記
+app.config['PAGE_MODE'] = os.environ.get('PAGE_MODE', 'all')  # 検出・変換するページの既定（all / first / ranges / sample）
+app.config['PAGE_SAMPLE_COUNT'] = int(os.environ.get('PAGE_SAMPLE_COUNT', '3'))  # sample モードで検出するページ数
+app.config['REDACTION_GEOMETRY'] = os.environ.get('REDACTION_GEOMETRY', 'band')  # band: 下部の全幅の帯 / regions: 事業者情報のまとまりごと
+app.config['BULK_MYSOUKU_MAX_RECORDS'] = int(os.environ.get('BULK_MYSOUKU_MAX_RECORDS', '5000'))  # 一括生成の最大物件数
+app.config['UPLOAD_MAX_CONCURRENCY'] = int(os.environ.get('UPLOAD_MAX_CONCURRENCY', str(os.cpu_count() or 2)))  # 変換・抽出・生成の同時実行数
+app.config['CPU_QUEUE_SIZE'] = int(os.environ.get('CPU_QUEUE_SIZE', str(app.config['UPLOAD_MAX_CONCURRENCY'] * 4)))  # 順番待ちできる件数
+app.config['CPU_QUEUE_TIMEOUT'] = float(os.environ.get('CPU_QUEUE_TIMEOUT', '10'))  # 順番待ちの期限（秒）
+app.config['CLAUDE_MAX_CONCURRENCY'] = int(os.environ.get('CLAUDE_MAX_CONCURRENCY', '8'))  # Claude APIの同時呼び出し数
+app.config['CLAUDE_QUEUE_TIMEOUT'] = float(os.environ.get('CLAUDE_QUEUE_TIMEOUT', '5'))  # Claude API呼び出しの順番待ちの期限（秒）
+app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED', '0') == '1'  # リクエスト単位のプロファイリングを許可
+app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN', '')  # 指定時はヘッダー／クエリの値がこれと一致した場合のみ
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profiles')  # プロファイル結果の保存先
+app.config['REQUEST_CAPTURE'] = os.environ.get('REQUEST_CAPTURE', '0') == '1'  # 再生用にリクエストを記録
+app.config['REQUEST_CAPTURE_DIR'] = os.environ.get('REQUEST_CAPTURE_DIR', 'captures')
+app.config['REQUEST_CAPTURE_STORE_INPUTS'] = os.environ.get('REQUEST_CAPTURE_STORE_INPUTS', '1') == '1'  # 0ならハッシュのみ記録
+app.config['REQUEST_CAPTURE_SAMPLE_RATE'] = float(os.environ.get('REQUEST_CAPTURE_SAMPLE_RATE', '1.0'))  # 記録する割合
+app.config['REQUEST_CAPTURE_REDACT'] = os.environ.get('REQUEST_CAPTURE_REDACT', ','.join(CAPTURE_REDACT_FIELDS))  # 伏せ字にする会社情報の項目
+app.config['PAGE_TEXT_CACHE_DIR'] = os.environ.get('PAGE_TEXT_CACHE_DIR', '')  # ページの文字・図形の保存先（空ならメモリのみ）
+app.config['DUPLICATE_CHECK'] = os.environ.get('DUPLICATE_CHECK', '0') == '1'  # アップロード時の重複マイソク照合
+app.config['DUPLICATE_INDEX_PATH'] = os.environ.get('DUPLICATE_INDEX_PATH', 'duplicate_index.db')
+app.config['DUPLICATE_INDEX_MAX_ENTRIES'] = int(os.environ.get('DUPLICATE_INDEX_MAX_ENTRIES', '50000'))
+app.config['PROGRESS_STORE_PATH'] = os.environ.get('PROGRESS_STORE_PATH', '')  # 進捗配信をプロセス間で共有するSQLiteファイル
 
 # ログ設定
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 会社情報プロフィールストア（書き込めない環境ではセッション保存にフォールバック）
+try:
+    company_model = CompanyModel()
+except Exception as e:
+    logger.warning(f"会社プロフィールストア初期化エラー: {e}")
+    company_model = None
+
 # 会社情報のセッション管理関数
+def get_company_profile(profile_id=None):
+    """プロフィールを取得（profile_id未指定ならセッションで選択中のもの）"""
+    profile_id = profile_id or session.get('profile_id')
+    if company_model is None or not profile_id:
+        return None
+    try:
+        return company_model.get(profile_id)
+    except Exception as e:
+        logger.warning(f"会社プロフィール取得エラー: {e}")
+        return None
+
 def get_company_info():
-    """セッションから会社情報を取得"""
+    """セッションで選択中のプロフィールから会社情報を取得（旧形式のセッション保存にも対応）"""
+    profile = get_company_profile()
+    if profile:
+        return profile['company_info']
     return session.get('company_info', {})
 
-def set_company_info(company_data):
-    """セッションに会社情報を保存"""
-    session['company_info'] = company_data
+def set_company_info(company_data, profile_id=None):
+    """会社情報をプロフィールストアに保存し、セッションにはプロフィールIDのみ保持"""
     session.permanent = True  # セッションを永続化
+    if company_model is not None:
+        try:
+            profile_id = company_model.save(company_data, profile_id)
+            session['profile_id'] = profile_id
+            session.pop('company_info', None)
+            return profile_id
+        except Exception as e:
+            logger.warning(f"プロフィールストア保存エラー、セッションに保存: {e}")
+    session['company_info'] = company_data
+    return None
 
 ALLOWED_EXTENSIONS = {'pdf'}
+REDACTION_GEOMETRIES = ('band', 'regions')
+
+# 変換ジョブの進捗配信（SSE、複数プロセスで待ち受ける場合はファイルを介して共有）
+progress_hub = (SharedProgressHub(app.config['PROGRESS_STORE_PATH']) if app.config['PROGRESS_STORE_PATH']
+                else ProgressHub())
+
+# 変換前後プレビュー画像のキャッシュ
+preview_cache = PreviewCache()
+page_text_cache = PageTextCache(directory=app.config['PAGE_TEXT_CACHE_DIR'])
+
+# 重い処理の受付制御（プロセスごと）: 上限を超えた分は期限付きで待たせ、待ちきれなければ429/503
+cpu_pool = ResourcePool('cpu', app.config['UPLOAD_MAX_CONCURRENCY'],
+                        max_queue=app.config['CPU_QUEUE_SIZE'], queue_timeout=app.config['CPU_QUEUE_TIMEOUT'])
+claude_pool = ResourcePool('claude', app.config['CLAUDE_MAX_CONCURRENCY'],
+                           queue_timeout=app.config['CLAUDE_QUEUE_TIMEOUT'])
+
+# 再生用のリクエスト記録（設定で有効な場合のみ）
+request_capture = RequestCapture(
+    app.config['REQUEST_CAPTURE_DIR'],
+    store_inputs=app.config['REQUEST_CAPTURE_STORE_INPUTS'],
+    sample_rate=app.config['REQUEST_CAPTURE_SAMPLE_RATE'],
+    redact=[field.strip() for field in app.config['REQUEST_CAPTURE_REDACT'].split(',') if field.strip()],
+) if app.config['REQUEST_CAPTURE'] else None
+
+# 重複・ほぼ重複マイソクの照合インデックス（最初の照合時に読み込み、終了時にファイルへ保存）
+_duplicate_index = None
+_duplicate_index_lock = threading.Lock()
 
 # Claude API設定
+CLAUDE_MODEL = "claude-3-haiku-20240307"
+CLAUDE_TIMEOUT = float(os.environ.get('CLAUDE_TIMEOUT', '30'))  # 秒
+CLAUDE_API_BASE_URL = os.environ.get('CLAUDE_API_BASE_URL') or None  # 検証用スタブ等への切替
+CLAUDE_UNAVAILABLE_REGION = {'bottom_height': 60, 'confidence': 60}  # 60mm
+CLAUDE_CONFIDENCE_THRESHOLD = 60  # これ未満の検出信頼度でClaude APIを併用
+
 try:
     claude_client = anthropic.Anthropic(
-        api_key=os.environ.get('CLAUDE_API_KEY', '')
+        api_key=os.environ.get('CLAUDE_API_KEY', ''),
+        base_url=CLAUDE_API_BASE_URL,
+        timeout=CLAUDE_TIMEOUT
     )
     CLAUDE_AVAILABLE = bool(os.environ.get('CLAUDE_API_KEY'))
 except Exception as e:
@@ -60,8 +173,7 @@ def extract_text_from_pdf_page(pdf_data, page_num):
     try:
         with pdfplumber.open(BytesIO(pdf_data)) as pdf:
             if page_num < len(pdf.pages):
-                page = pdf.pages[page_num]
-                return page.extract_text() or ""
+                return page_text_cache.page(pdf.pages[page_num]).text()
             else:
                 logger.warning(f"ページ{page_num + 1}が存在しません")
                 return ""
@@ -69,7 +181,7 @@ def extract_text_from_pdf_page(pdf_data, page_num):
         logger.error(f"ページ{page_num + 1}のテキスト抽出エラー: {str(e)}")
         return ""
 
-def extract_text_from_pdf(file_data):
+def extract_text_from_pdf(file_data, progress=None):
     """PDFからテキストを抽出（簡易版）"""
     try:
         text = ""
@@ -77,15 +189,20 @@ def extract_text_from_pdf(file_data):
         
         # PyPDF2でテキスト抽出
         pdf_reader = PyPDF2.PdfReader(pdf_file)
-        for page in pdf_reader.pages:
+        total_pages = len(pdf_reader.pages)
+        if progress:
+            progress('parsed', total=total_pages, bytes=len(file_data))
+        for page_num, page in enumerate(pdf_reader.pages):
             text += page.extract_text() + "\n"
+            if progress:
+                progress('extracted', page=page_num + 1, total=total_pages)
         
         if not text.strip():
             # pdfplumberで再試行
             pdf_file.seek(0)
             with pdfplumber.open(pdf_file) as pdf:
                 for page in pdf.pages:
-                    page_text = page.extract_text()
+                    page_text = page_text_cache.page(page).text()
                     if page_text:
                         text += page_text + "\n"
         
@@ -172,41 +289,30 @@ def create_page_with_footer_overlay(original_page, overlay_page, page_width, pag
         logger.error(f"フォールバック処理エラー: {str(e)}")
         return original_page
 
-def detect_footer_region_with_claude_fallback(pdf_data, page_num=0):
-    """Claude APIを使用してフッター領域を検出（フォールバック用）"""
-    if not CLAUDE_AVAILABLE:
-        logger.warning("Claude API利用不可、大きめのデフォルト領域を使用")
-        return {'bottom_height': 60, 'confidence': 60}  # 60mm
-    
-    try:
-        # PDFからテキストを抽出（ページ指定に対応）
-        if page_num is not None:
-            text_content = extract_text_from_pdf_page(pdf_data, page_num)
-            logger.info(f"ページ{page_num + 1}のテキスト抽出完了: {len(text_content)}文字")
-        else:
-            text_content = extract_text_from_pdf(pdf_data)
-            logger.info(f"全PDFのテキスト抽出完了: {len(text_content)}文字")
-        
-        # Claude APIでフッター領域を分析（視覚的レイアウト重視プロンプト）
-        response = claude_client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=1500,
-            temperature=0.1,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""
+def extract_text_for_claude(pdf_data, page_num=0):
+    """Claude APIに渡すテキストを抽出（page_num=Noneで全ページ）"""
+    if page_num is not None:
+        text_content = extract_text_from_pdf_page(pdf_data, page_num)
+        logger.info(f"ページ{page_num + 1}のテキスト抽出完了: {len(text_content)}文字")
+    else:
+        text_content = extract_text_from_pdf(pdf_data)
+        logger.info(f"全PDFのテキスト抽出完了: {len(text_content)}文字")
+    return text_content
+
+def build_claude_footer_messages(text_content):
+    """フッター検出用のClaude APIメッセージを組み立て（視覚的レイアウト重視プロンプト）"""
+    text_content = text_content[-2000:]
+    return [
+        {
+            "role": "user",
+            "content": f"""
 不動産マイソクPDFの事業者フッター領域を精密に検出してください。物件情報を侵害せず、フッター部分のみを正確に特定する必要があります。
 
 【最重要】検出精度の向上:
 以下の事業者情報パターンを最下部から検索し、その直前で物件情報との境界を特定してください。
 
 【事業者情報の必須要素】:
-1. 会社名（株式会社○○、○○不動産、有限会社○○）
-2. 宅建業免許番号（東京都知事（○）第○○号、国土交通大臣（○）第○○号）
-3. 連絡先（TEL、FAX、住所）
-4. 取引形態（仲介、媒介、代理、売主）
-5. AD情報、手数料情報
+{prompt_elements()}
 
 【精密な境界検出手法】:
 1. テキストを下から上に解析
@@ -230,7 +336,7 @@ def detect_footer_region_with_claude_fallback(pdf_data, page_num=0):
 - 設備情報、築年月
 
 【入力テキスト】:
-{text_content[-2000:]}
+{text_content}
 
 【必須出力】:
 {{
@@ -244,35 +350,57 @@ def detect_footer_region_with_claude_fallback(pdf_data, page_num=0):
     "reason": "境界判定の根拠"
 }}
 """
-                }
-            ]
-        )
+        }
+    ]
+
+def parse_claude_footer_response(response_text):
+    """Claude APIのJSON応答を検証してフッター検出結果に変換"""
+    try:
+        result = json.loads(response_text)
+        
+        # 必須フィールドの検証
+        if 'bottom_height' not in result or not isinstance(result['bottom_height'], (int, float)):
+            logger.warning(f"Claude API応答に問題: bottom_heightが無効 - {result}")
+            return {'bottom_height': 30, 'confidence': 40, 'reason': 'APIレスポンス検証失敗'}
         
-        response_text = response.content[0].text
+        logger.info(f"Claude API 視覚的フッター検出結果: {result}")
+        return result
+    except json.JSONDecodeError as json_error:
+        logger.error(f"Claude API JSON解析エラー: {str(json_error)}")
+        logger.error(f"生レスポンス: {response_text[:500]}")
+        return {'bottom_height': 30, 'confidence': 30, 'reason': 'JSON解析失敗'}
+
+def detect_footer_region_with_claude_fallback(pdf_data, page_num=0):
+    """Claude APIを使用してフッター領域を検出（フォールバック用）"""
+    if not CLAUDE_AVAILABLE:
+        logger.warning("Claude API利用不可、大きめのデフォルト領域を使用")
+        return CLAUDE_UNAVAILABLE_REGION.copy()
+    
+    try:
+        # PDFからテキストを抽出（ページ指定に対応）
+        text_content = extract_text_for_claude(pdf_data, page_num)
         
-        # JSONレスポンスを解析
-        import json
+        # Claude APIでフッター領域を分析（同時呼び出し数を超えたら待ち、期限切れならデフォルト領域）
         try:
-            result = json.loads(response_text)
-            
-            # 必須フィールドの検証
-            if 'bottom_height' not in result or not isinstance(result['bottom_height'], (int, float)):
-                logger.warning(f"Claude API応答に問題: bottom_heightが無効 - {result}")
-                return {'bottom_height': 30, 'confidence': 40, 'reason': 'APIレスポンス検証失敗'}
-            
-            logger.info(f"Claude API 視覚的フッター検出結果: {result}")
-            return result
-        except json.JSONDecodeError as json_error:
-            logger.error(f"Claude API JSON解析エラー: {str(json_error)}")
-            logger.error(f"生レスポンス: {response_text[:500]}")
-            return {'bottom_height': 30, 'confidence': 30, 'reason': 'JSON解析失敗'}
+            with claude_pool.slot():
+                response = claude_client.messages.create(
+                    model=CLAUDE_MODEL,
+                    max_tokens=1500,
+                    temperature=0.1,
+                    messages=build_claude_footer_messages(text_content)
+                )
+        except Saturated:
+            logger.warning("🚦 Claude API呼び出しが混雑、大きめのデフォルト領域を使用")
+            return CLAUDE_UNAVAILABLE_REGION.copy()
+        
+        return parse_claude_footer_response(response.content[0].text)
         
     except Exception as e:
         logger.error(f"Claude API エラー: {str(e)}")
         return None
 
-def detect_footer_with_pdfplumber(pdf_data, page_num=0):
-    """pdfplumberを使用した高精度フッター検出"""
+def detect_footer_with_pdfplumber(pdf_data, page_num=0, regions=False):
+    """pdfplumberを使用した高精度フッター検出（regions は detect_footer_on_page を参照）"""
     try:
         logger.info("🔍 pdfplumber高精度フッター検出開始")
         
@@ -282,79 +410,116 @@ def detect_footer_with_pdfplumber(pdf_data, page_num=0):
                 logger.warning("⚠️ PDFページなし")
                 return {'bottom_height': 40, 'confidence': 30, 'method': 'fallback'}
             
-            page = pdf.pages[page_num]
-            page_height = page.height  # pt単位
-            page_width = page.width
-            
-            # テキストオブジェクトを取得（座標付き）
-            chars = page.chars
-            logger.info(f"📄 文字数: {len(chars)}")
+            return detect_footer_on_page(pdf.pages[page_num], regions=regions)
             
-            # フッターキーワード
-            footer_keywords = [
-                "株式会社", "有限会社", "合同会社", "宅建", "免許", "知事", "大臣",
-                "TEL", "FAX", "電話", "仲介", "媒介", "代理", "売主", "AD", "手数料",
-                "宅地建物取引業", "不動産", "賃貸", "売買"
-            ]
-            
-            # フッターキーワードを含む文字の位置を検索
-            footer_y_positions = []
-            footer_texts = []
-            
-            for char in chars:
-                text = char.get('text', '')
-                y_pos = char.get('y0', 0)  # 文字の下端
-                
-                if any(keyword in text for keyword in footer_keywords):
-                    footer_y_positions.append(y_pos)
-                    footer_texts.append(text)
-                    logger.info(f"🎯 フッターキーワード発見: '{text}' at Y={y_pos:.1f}")
-            
-            # 下部25%領域内のテキストも考慮
-            bottom_quarter = page_height * 0.75
-            bottom_texts = [char for char in chars if char.get('y0', page_height) > bottom_quarter]
-            
-            if bottom_texts:
-                logger.info(f"📍 下部25%領域のテキスト: {len(bottom_texts)}個")
-                
-            if not footer_y_positions and not bottom_texts:
-                logger.warning("⚠️ フッター情報なし")
-                return {'bottom_height': 25, 'confidence': 40, 'method': 'no_footer_detected'}
-            
-            # フッター高さ計算
-            if footer_y_positions:
-                # キーワードベース
-                min_footer_y = min(footer_y_positions)
-                footer_height_pt = page_height - min_footer_y
-                method = 'keyword_based'
-                confidence = min(90, 70 + len(footer_texts) * 3)
-            else:
-                # 下部テキストベース
-                min_bottom_y = min(char.get('y0', page_height) for char in bottom_texts)
-                footer_height_pt = page_height - min_bottom_y
-                method = 'bottom_text_based'
-                confidence = 60
-            
-            # pt → mm変換
-            footer_height_mm = footer_height_pt * 25.4 / 72
-            
-            # 安全マージン追加
-            final_height_mm = footer_height_mm + 5
-            final_height_mm = max(15, min(70, final_height_mm))  # 15-70mmの範囲
-            
-            result = {
-                'bottom_height': round(final_height_mm, 1),
-                'confidence': confidence,
-                'method': method,
-                'keywords_found': len(footer_texts),
-                'page_height': page_height,
-                'footer_y_position': min_footer_y if footer_y_positions else None,
-                'raw_footer_height_mm': round(footer_height_mm, 1)
-            }
-            
-            logger.info(f"✅ 検出完了: {result}")
-            return result
+    except Exception as e:
+        logger.error(f"❌ pdfplumber検出エラー: {e}")
+        return {
+            'bottom_height': 45, 
+            'confidence': 50, 
+            'method': 'error_fallback', 
+            'error': str(e)
+        }
+
+def detect_footer_on_page(page, regions=False):
+    """開済みのpdfplumberページに対するフッター検出本体
+    
+    regions: Trueなら、検出した帯の中で白塗りする矩形（事業者情報のまとまりごと）も求めて 'regions' に入れる
+    """
+    try:
+        # 文字・図形を省メモリの配列で取得（内容ハッシュ・ページ単位でキャッシュ、座標はpt）
+        page_text = page_text_cache.page(page)
+        page_height = page_text.height
+        logger.info(f"📄 文字数: {len(page_text)}")
+        
+        # テキストレイヤーがない（スキャン画像の）ページは下部帯の画像から検出
+        if not len(page_text):
+            try:
+                result = detect_footer_raster(page)
+                logger.info(f"🖼️ 画像ベース検出完了: {result}")
+                return result
+            except Exception as raster_error:
+                logger.warning(f"画像ベース検出エラー: {raster_error}")
+        
+        # 下部25%領域の行を事業者情報のキーワード（カテゴリ別の重み付き）で照合
+        # （1文字ずつの照合では「株式会社」等の複数文字のキーワードに一致しないため、行単位で照合する）
+        bottom_quarter = page_height * 0.75
+        bottom_mask = page_text.top > bottom_quarter
+        bottom_lines = page_text.lines(bottom_mask)
+        footer_y_positions = []
+        footer_texts = []
+        footer_categories = set()
+        
+        for line, (score, categories) in zip(bottom_lines, score_lines(line['text'] for line in bottom_lines)):
+            if score >= FOOTER_LINE_MIN_SCORE:
+                footer_y_positions.append(line['top'])
+                footer_texts.append(line['text'])
+                footer_categories.update(categories)
+                logger.info(f"🎯 フッターキーワード発見: '{line['text']}' at Y={line['top']:.1f} "
+                            f"({', '.join(sorted(categories))})")
+        
+        # 下部25%領域内のテキストも考慮
+        bottom_count = int(bottom_mask.sum())
+        
+        if bottom_count:
+            logger.info(f"📍 下部25%領域のテキスト: {bottom_count}個")
             
+        if not footer_y_positions and not bottom_count:
+            logger.warning("⚠️ フッター情報なし")
+            return {'bottom_height': 25, 'confidence': 40, 'method': 'no_footer_detected'}
+        
+        # フッター高さ計算
+        if footer_y_positions:
+            # キーワードベース
+            min_footer_y = min(footer_y_positions)
+            footer_height_pt = page_height - min_footer_y
+            method = 'keyword_based'
+            confidence = min(90, 70 + score_categories(footer_categories))
+        else:
+            # 下部テキストベース
+            min_bottom_y = float(page_text.top[bottom_mask].min())
+            footer_height_pt = page_height - min_bottom_y
+            method = 'bottom_text_based'
+            confidence = 60
+        
+        # pt → mm変換
+        footer_height_mm = footer_height_pt * 25.4 / 72
+        
+        # 安全マージン追加
+        final_height_mm = footer_height_mm + 5
+        final_height_mm = max(15, min(70, final_height_mm))  # 15-70mmの範囲
+        
+        result = {
+            'bottom_height': round(final_height_mm, 1),
+            'confidence': confidence,
+            'method': method,
+            'keywords_found': len(footer_texts),
+            'keyword_categories': sorted(footer_categories),
+            'page_height': page_height,
+            'footer_y_position': min_footer_y if footer_y_positions else None,
+            'raw_footer_height_mm': round(footer_height_mm, 1)
+        }
+        
+        # 罫線・枠による区切りが見つかれば、その位置で境界を確定
+        try:
+            vector_result = detect_footer_vector(page_text, text_top=page_height - footer_height_pt)
+            if vector_result:
+                logger.info(f"📏 区切り線検出: {vector_result}")
+                result = combine_with_text_result(vector_result, result)
+        except Exception as vector_error:
+            logger.warning(f"区切り線検出エラー: {vector_error}")
+        
+        # 白塗り範囲を事業者情報のまとまりごとの矩形に絞る（帯全体を塗るべきならNone）
+        if regions:
+            try:
+                result['regions'] = find_redaction_regions(page_text, result['bottom_height'] * mm)
+                result['regions_page_size'] = [round(page_text.width, 2), round(page_height, 2)]
+            except Exception as region_error:
+                logger.warning(f"白塗り範囲の検出エラー（全幅の帯で塗ります）: {region_error}")
+        
+        logger.info(f"✅ 検出完了: {result}")
+        return result
+        
     except Exception as e:
         logger.error(f"❌ pdfplumber検出エラー: {e}")
         return {
@@ -364,9 +529,155 @@ def detect_footer_with_pdfplumber(pdf_data, page_num=0):
             'error': str(e)
         }
 
+# ページ並列検出用: ワーカープロセスごとにPDFを1回だけ受け取り、開いたまま保持する
+_worker_pdf = None
+_worker_regions = False
+
+def _init_detect_worker(pdf_data, regions=False):
+    """プロセスプール初期化（PDFデータはタスク毎ではなくワーカー毎に1回だけ渡す）"""
+    global _worker_pdf, _worker_regions
+    _worker_pdf = pdfplumber.open(BytesIO(pdf_data))
+    _worker_regions = regions
 
-def convert_pdf_footer(pdf_data, company_info):
-    """PDFのフッター部分を白塗りし、新しい会社情報を配置"""
+def _detect_page_in_worker(page_num):
+    """ワーカー側: ページ番号だけを受け取り、保持済みのPDFで検出"""
+    page = _worker_pdf.pages[page_num]
+    try:
+        return detect_footer_on_page(page, regions=_worker_regions)
+    finally:
+        page.flush_cache()
+
+def detect_footers_for_pages(pdf_data, page_numbers, workers=None, progress=None, regions=False):
+    """複数ページのフッター検出（workers>1ならプロセスプールで並列実行、結果はページ順）
+    
+    regions: Trueなら白塗りする矩形も求める（detect_footer_on_page を参照）
+    """
+    page_numbers = list(page_numbers)
+    total = len(page_numbers)
+    
+    def report(index, result):
+        if progress:
+            progress('detected', page=index + 1, total=total,
+                     bottom_height=result.get('bottom_height'), confidence=result.get('confidence'))
+    if workers is None:
+        workers = app.config['DETECT_WORKERS']
+    
+    if workers > 1 and len(page_numbers) >= app.config['DETECT_PARALLEL_MIN_PAGES']:
+        try:
+            workers = min(workers, len(page_numbers))
+            with ProcessPoolExecutor(max_workers=workers,
+                                     initializer=_init_detect_worker,
+                                     initargs=(pdf_data, regions)) as executor:
+                # ページ番号だけを配布（chunksizeでIPC回数を抑える）
+                chunksize = max(1, len(page_numbers) // (workers * 4))
+                results = []
+                for index, result in enumerate(executor.map(_detect_page_in_worker, page_numbers, chunksize=chunksize)):
+                    results.append(result)
+                    report(index, result)
+            logger.info(f"⚡ 並列フッター検出完了: {len(page_numbers)}ページ / {workers}プロセス")
+            return results
+        except Exception as e:
+            logger.warning(f"並列フッター検出に失敗、逐次処理にフォールバック: {e}")
+    
+    # 逐次処理（PDFは1回だけ開く）
+    try:
+        results = []
+        with pdfplumber.open(BytesIO(pdf_data)) as pdf:
+            for index, page_num in enumerate(page_numbers):
+                page = pdf.pages[page_num]
+                results.append(detect_footer_on_page(page, regions=regions))
+                page.flush_cache()
+                report(index, results[-1])
+        return results
+    except Exception as e:
+        logger.error(f"❌ pdfplumber検出エラー: {e}")
+        return [{
+            'bottom_height': 45, 
+            'confidence': 50, 
+            'method': 'error_fallback', 
+            'error': str(e)
+        } for _ in page_numbers]
+
+
+def reference_page(pdf_data, page_mode=None, page_ranges=None, sample_count=None):
+    """グローバルフッター領域の基準にするページ（検出するページの先頭、変換するページがなければNone）
+
+    convert_pdf_footer と同じページ計画から決める（ページ範囲指定で1ページ目を変換しない場合は範囲の最初のページ）。
+    """
+    total_pages = len(PyPDF2.PdfReader(BytesIO(pdf_data)).pages)
+    detect_pages, _ = plan_pages(page_mode or app.config['PAGE_MODE'], total_pages, page_ranges,
+                                 sample_count or app.config['PAGE_SAMPLE_COUNT'])
+    return detect_pages[0] if detect_pages else None
+
+def detect_global_footer_region(pdf_data, progress=None, page_num=0, page_result=None):
+    """先頭ページの精密検出＋低信頼度時のClaude API併用でグローバルなフッター領域を決定
+    
+    page_num: 基準にするページ（ページ範囲指定で先頭ページを変換しない場合は範囲の最初のページ）
+    page_result: そのページの精密検出結果が既にあれば渡す（同じページを2回解析しない）
+    """
+    # 新しいpdfplumber精密検出を使用（全ページ同じ設定で安全動作）
+    # まず精密検出を試行、フォールバックでClaude API
+    try:
+        logger.info("🚀 新pdfplumber精密フッター検出を開始!")
+        if page_result is not None:
+            global_footer_region = dict(page_result)
+        else:
+            global_footer_region = detect_footer_with_pdfplumber(pdf_data, page_num)
+        logger.info(f"🎯 pdfplumber検出結果: {global_footer_region}")
+        
+        # 信頼度が低い場合はClaude APIを併用
+        if global_footer_region.get('confidence', 0) < CLAUDE_CONFIDENCE_THRESHOLD:
+            logger.info("信頼度が低いため、Claude APIも併用")
+            if progress:
+                progress('claude_fallback', status='start')
+            claude_result = detect_footer_region_with_claude_fallback(pdf_data, page_num)
+            adopted = bool(claude_result and claude_result.get('confidence', 0) > global_footer_region.get('confidence', 0))
+            if adopted:
+                global_footer_region = claude_result
+                logger.info("Claude API結果を採用")
+            if progress:
+                progress('claude_fallback', status='done', adopted=adopted)
+        
+    except Exception as detection_error:
+        logger.error(f"❌ PyMuPDF検出エラー: {str(detection_error)}")
+        import traceback
+        logger.error(f"❌ PyMuPDF詳細エラー: {traceback.format_exc()}")
+        # フォールバック: Claude API
+        try:
+            logger.info("⚠️ フォールバック: Claude API検出を試行")
+            if progress:
+                progress('claude_fallback', status='start')
+            global_footer_region = detect_footer_region_with_claude_fallback(pdf_data, page_num)
+            if not global_footer_region:
+                global_footer_region = {'bottom_height': 40, 'confidence': 70}
+            logger.info(f"✅ Claude API検出完了: {global_footer_region}")
+        except Exception as claude_error:
+            logger.error(f"❌ Claude API検出エラー: {str(claude_error)}")
+            global_footer_region = {'bottom_height': 40, 'confidence': 70}
+        if progress:
+            # 精密検出の結果が無いため、置き換えた（adopted）ことにはしない
+            progress('claude_fallback', status='done', adopted=False)
+    
+    return global_footer_region
+
+def convert_pdf_footer(pdf_data, company_info, detect_workers=None, footer_region=None, progress=None,
+                       footer_assets=None, optimize=None, report=None, write_mode=None,
+                       page_mode=None, page_ranges=None, sample_count=None, redaction=None, page_results=None):
+    """PDFのフッター部分を白塗りし、新しい会社情報を配置
+    
+    detect_workers: ページ個別検出の並列プロセス数（Noneで設定値 DETECT_WORKERS を使用）
+    footer_region: 検出済みのグローバルフッター領域（Noneなら内部で検出）
+    progress: 進捗通知コールバック progress(stage, **data)（utils.progress.ProgressReporter等）
+    footer_assets: プロフィールで事前計算済みのフッターアセット（Noneなら文書ごとに1回計算）
+    optimize: 出力最適化（重複除去・圧縮・オブジェクトストリーム）を行うか（Noneで設定値 OPTIMIZE_OUTPUT）
+    report: 渡されたdictに処理結果（検出結果・最適化前後のサイズ・所要時間など）を書き込む
+    write_mode: 'full'（全体を書き直し）/ 'incremental'（元のPDFに増分更新で追記）。Noneで設定値 OUTPUT_WRITE_MODE
+    page_mode: 'all' / 'first'（1ページ目の検出結果を全ページに適用）/ 'ranges'（page_rangesのページだけ変換）/
+               'sample'（sample_count ページだけ検出し、間のページは前後から補う）。Noneで設定値 PAGE_MODE
+    redaction: 'band'（下部の全幅の帯を白塗り）/ 'regions'（事業者情報のまとまりごとの矩形だけ白塗り）。
+               Noneで設定値 REDACTION_GEOMETRY
+    page_results: 検出済みのページごとの結果 {ページ番号: 結果}（同じ redaction で検出したもの。該当ページは検出しない）
+    """
     try:
         # PDFを読み込み
         pdf_input = BytesIO(pdf_data)
@@ -385,110 +696,111 @@ def convert_pdf_footer(pdf_data, company_info):
         if len(pdf_reader.pages) == 0:
             raise Exception("PDFにページがありません")
         
-        first_page = pdf_reader.pages[0]
-        if first_page.mediabox:
-            page_width = float(first_page.mediabox.width)
-            page_height = float(first_page.mediabox.height)
+        total_pages = len(pdf_reader.pages)
+        if progress:
+            progress('parsed', total=total_pages, bytes=len(pdf_data))
+        
+        # ページ形状表（用紙サイズ・回転・UserUnitが混在しても文書ごとに1回だけ計算）
+        geometry_table = build_geometry_table(pdf_reader)
+        logger.info(f"ページ形状: {len(geometry_classes(geometry_table))}種類 / {total_pages}ページ")
+        
+        # 検出・変換するページ（モードに応じて検出しないページは前後の結果を引き継ぐ）
+        if page_mode is None:
+            page_mode = app.config['PAGE_MODE']
+        detect_pages, target_pages = plan_pages(page_mode, total_pages, page_ranges,
+                                                sample_count or app.config['PAGE_SAMPLE_COUNT'])
+        if len(detect_pages) < total_pages:
+            logger.info(f"📑 ページモード {page_mode}: 検出{len(detect_pages)}ページ / 変換{len(target_pages)}ページ"
+                        f" / 全{total_pages}ページ")
+        
+        if redaction is None:
+            redaction = app.config['REDACTION_GEOMETRY']
+        
+        # ページ個別検出（各ページ独立なので、設定に応じて並列実行）
+        detected = {page_num: page_results[page_num] for page_num in detect_pages
+                    if page_results and page_num in page_results}
+        pending_pages = [page_num for page_num in detect_pages if page_num not in detected]
+        detected.update(zip(pending_pages, detect_footers_for_pages(
+            pdf_data, pending_pages, workers=detect_workers, progress=progress, regions=redaction == 'regions'
+        )))
+        page_results, inherited_pages = fill_page_results(detected, target_pages)
+        
+        # グローバルフッター領域（非同期モード等で検出済みの場合はそれを使用、基準ページの解析は上の結果を再利用）
+        if footer_region is not None:
+            global_footer_region = footer_region
+        elif detect_pages:
+            global_footer_region = detect_global_footer_region(pdf_data, progress=progress, page_num=detect_pages[0],
+                                                               page_result=detected[detect_pages[0]])
         else:
-            page_width, page_height = A4  # デフォルト
-        
-        # 新しいpdfplumber精密検出を使用（全ページ同じ設定で安全動作）
-        # まず精密検出を試行、フォールバックでClaude API
-        try:
-            logger.info("🚀 新pdfplumber精密フッター検出を開始!")
-            global_footer_region = detect_footer_with_pdfplumber(pdf_data, 0)
-            logger.info(f"🎯 pdfplumber検出結果: {global_footer_region}")
-            
-            # 信頼度が低い場合はClaude APIを併用
-            if global_footer_region.get('confidence', 0) < 60:
-                logger.info("信頼度が低いため、Claude APIも併用")
-                claude_result = detect_footer_region_with_claude_fallback(pdf_data, 0)
-                if claude_result and claude_result.get('confidence', 0) > global_footer_region.get('confidence', 0):
-                    global_footer_region = claude_result
-                    logger.info("Claude API結果を採用")
-            
-        except Exception as detection_error:
-            logger.error(f"❌ PyMuPDF検出エラー: {str(detection_error)}")
-            import traceback
-            logger.error(f"❌ PyMuPDF詳細エラー: {traceback.format_exc()}")
-            # フォールバック: Claude API
-            try:
-                logger.info("⚠️ フォールバック: Claude API検出を試行")
-                global_footer_region = detect_footer_region_with_claude_fallback(pdf_data, 0)
-                if not global_footer_region:
-                    global_footer_region = {'bottom_height': 40, 'confidence': 70}
-                logger.info(f"✅ Claude API検出完了: {global_footer_region}")
-            except Exception as claude_error:
-                logger.error(f"❌ Claude API検出エラー: {str(claude_error)}")
-                global_footer_region = {'bottom_height': 40, 'confidence': 70}
+            global_footer_region = {'bottom_height': 0, 'confidence': 100, 'reason': '変換するページなし'}
         
         global_confidence = global_footer_region.get('confidence', 70)
         global_detected_height = global_footer_region.get('bottom_height', 40)
         logger.info(f"グローバル設定: 検出高さ{global_detected_height}mm、信頼度{global_confidence}%")
         
+        # フッター描画アセット（フォント・文字列幅）は文書内で共通
+        if not is_valid_footer_assets(footer_assets):
+            footer_assets = build_footer_assets(company_info)
+        
+        if write_mode is None:
+            write_mode = app.config['OUTPUT_WRITE_MODE']
+        
         # 各ページを処理（同じ設定で統一処理）
+        redaction_pages = []
+        overlay_pages = {}
+        page_overlays = {}  # 増分更新モード用: ページ番号 -> オーバーレイ
         for page_num, page in enumerate(pdf_reader.pages):
             logger.info(f"=== ページ {page_num + 1} の処理開始 ===")
             
             try:
-                # オーバーレイページを作成
-                overlay_buffer = BytesIO()
-                overlay_canvas = canvas.Canvas(overlay_buffer, pagesize=(page_width, page_height))
+                geometry = geometry_table[page_num]
+                page_width, page_height = geometry.display_size
                 
-                # フッター部分を白で塗りつぶし
-                # *** ページ個別検出に変更 ***
-                logger.info(f"ページ{page_num + 1}: 個別フッター検出実行")
-                page_footer_result = detect_footer_with_pdfplumber(pdf_data, page_num)
+                # 変換対象外のページ（ページ範囲指定）はそのまま出力
+                page_footer_result = page_results.get(page_num)
+                if page_footer_result is None:
+                    if write_mode != 'incremental':
+                        pdf_writer.add_page(page)
+                    if progress:
+                        progress('overlaid', page=page_num + 1, total=total_pages, skipped=True)
+                    continue
                 
+                # ページ個別検出の結果を使用（ループ前に一括検出済み、検出しなかったページは前後から引き継ぎ）
                 confidence = page_footer_result.get('confidence', 60)
                 detected_height = page_footer_result.get('bottom_height', 40)
                 
-                logger.info(f"ページ{page_num + 1}: 個別検出結果 - 高さ{detected_height}mm、信頼度{confidence}%")
-                
-                # 信頼度に応じた高さ調整
-                if confidence < 60:
-                    # 低信頼度の場合は安全マージンを追加
-                    safe_height = max(detected_height + 10, 30)
-                    logger.info(f"低信頼度({confidence}%)のため高さを{detected_height}mm→{safe_height}mmに調整")
-                    bottom_height_pt = safe_height * mm
+                if 'inherited_from' in page_footer_result:
+                    logger.info(f"ページ{page_num + 1}: ページ{page_footer_result['inherited_from']}の結果を引き継ぎ"
+                                f" - 高さ{detected_height}mm、信頼度{confidence}%")
                 else:
-                    bottom_height_pt = detected_height * mm
-                # 確実な白塗り処理（複数の矩形で確実にカバー）
-                overlay_canvas.setFillColor(colors.white)
-                overlay_canvas.setStrokeColor(colors.white)
-                
-                # シンプルな白塗り矩形（下部フッター領域のみ）
-                # PDF座標系: 左下が原点(0,0)、Y軸は上向き
-                # bottom_height_ptの高さで、ページ下部からその高さまでを白塗り
-                overlay_canvas.rect(0, 0, page_width, bottom_height_pt, fill=1, stroke=0)
-                
-                logger.info(f"白塗り矩形: X=0, Y=0, Width={page_width/mm:.1f}mm, Height={bottom_height_pt/mm:.1f}mm")
-                logger.info(f"座標詳細: 左下(0,0) → 右上({page_width/mm:.1f}mm, {bottom_height_pt/mm:.1f}mm)")
+                    logger.info(f"ページ{page_num + 1}: 個別検出結果 - 高さ{detected_height}mm、信頼度{confidence}%")
                 
-                # デバッグ用: 白塗り範囲を赤い枠で囲む（座標確認用）
-                overlay_canvas.setStrokeColor(colors.red)
-                overlay_canvas.setLineWidth(3)  # より見やすく
-                overlay_canvas.rect(0, 0, page_width, bottom_height_pt, fill=0, stroke=1)
-                logger.info(f"デバッグ: 赤い枠でマーキング - ページ下部から{bottom_height_pt/mm:.1f}mm高さ")
-                
-                # 新しい会社情報を配置
-                add_company_footer(overlay_canvas, company_info, page_width, bottom_height_pt)
+                # 信頼度に応じた高さ調整
+                bottom_height_pt = resolve_footer_height_pt(page_footer_result)
+                regions = page_redaction_regions(page_footer_result, geometry) if redaction == 'regions' else None
+                redaction_pages.append(redaction_coverage(page_num, geometry, bottom_height_pt, regions))
                 
-                overlay_canvas.save()
+                # オーバーレイは形状区分と白塗り範囲が同じページ間で使い回す
+                overlay_key = (geometry.key, round(bottom_height_pt, 2),
+                               tuple(tuple(region) for region in regions) if regions else None)
+                if overlay_key in overlay_pages:
+                    overlay_page = overlay_pages[overlay_key]
+                else:
+                    overlay_page = build_footer_overlay(company_info, geometry, bottom_height_pt, footer_assets,
+                                                        regions=regions)
+                    overlay_pages[overlay_key] = overlay_page
+                    logger.info(f"ページ{page_num + 1}: オーバーレイ作成（{page_width/mm:.1f}mm x {page_height/mm:.1f}mm、"
+                                f"回転{geometry.rotation}°、白塗り高さ{bottom_height_pt/mm:.1f}mm）")
                 
-                # オーバーレイをPDFとして読み込み
-                overlay_buffer.seek(0)
-                overlay_reader = PyPDF2.PdfReader(overlay_buffer)
+                if write_mode == 'incremental':
+                    # 増分更新ではページを書き換えず、出力時にXObjectとして追記する
+                    page_overlays[page_num] = overlay_page
+                    if progress:
+                        progress('overlaid', page=page_num + 1, total=total_pages)
+                    continue
                 
-                if len(overlay_reader.pages) > 0:
-                    overlay_page = overlay_reader.pages[0]
-                    
-                    # デバッグ: オーバーレイ処理の詳細ログ
-                    logger.info(f"ページ{page_num + 1}: 白塗り高さ{bottom_height_pt/mm:.1f}mm、信頼度{confidence}%")
-                    logger.info(f"ページサイズ: {page_width/mm:.1f}mm x {page_height/mm:.1f}mm")
-                    logger.info(f"PDF座標系: 左下(0,0)が原点、白塗りは下部{bottom_height_pt/mm:.1f}mmを範囲指定")
-                    
-                    # 元のページとオーバーレイをマージ（オーバーレイを最前面に）
+                # 元のページとオーバーレイをマージ（オーバーレイを最前面に）
+                if overlay_page is not None:
                     try:
                         page.merge_page(overlay_page)
                         logger.info(f"ページ{page_num + 1}: オーバーレイ合成完了")
@@ -506,21 +818,77 @@ def convert_pdf_footer(pdf_data, company_info):
                 
                 # 処理済みページを追加
                 pdf_writer.add_page(page)
+                if progress:
+                    progress('overlaid', page=page_num + 1, total=total_pages)
                 
             except Exception as page_error:
                 logger.error(f"ページ {page_num + 1} 処理エラー: {str(page_error)}")
-                # エラーが発生したページも元のまま追加
-                pdf_writer.add_page(page)
+                # エラーが発生したページも元のまま追加（増分更新では変更しないだけ）
+                if write_mode != 'incremental':
+                    pdf_writer.add_page(page)
         
         # 最終PDFを出力
-        output_buffer = BytesIO()
-        pdf_writer.write(output_buffer)
-        output_buffer.seek(0)
-        
-        result = output_buffer.getvalue()
+        write_started = time.perf_counter()
+        result = None
+        if write_mode == 'incremental':
+            try:
+                result = write_incremental_update(pdf_data, pdf_reader, page_overlays, geometry_table)
+                logger.info(f"📎 増分更新で出力: 追記{len(result) - len(pdf_data)}バイト")
+            except Exception as incremental_error:
+                logger.warning(f"増分更新での出力エラー（全体の書き直しに切り替え）: {incremental_error}")
+                write_mode = 'full'
+                for page_num, page in enumerate(pdf_reader.pages):
+                    overlay_page = page_overlays.get(page_num)
+                    if overlay_page is not None:
+                        try:
+                            page.merge_page(overlay_page)
+                        except Exception as merge_error:
+                            logger.error(f"ページ{page_num + 1}: merge_page失敗 - {str(merge_error)}")
+                    pdf_writer.add_page(page)
+        
+        if result is None:
+            output_buffer = BytesIO()
+            pdf_writer.write(output_buffer)
+            output_buffer.seek(0)
+            result = output_buffer.getvalue()
+        write_ms = round((time.perf_counter() - write_started) * 1000, 1)
         if len(result) == 0:
             raise Exception("生成されたPDFが空です")
         
+        if progress:
+            progress('written', bytes=len(result))
+        
+        # 出力最適化（失敗しても最適化前のPDFを返す）
+        if optimize is None:
+            optimize = app.config['OPTIMIZE_OUTPUT']
+        if optimize:
+            try:
+                result, optimization = optimize_pdf(result)
+                logger.info(f"📦 出力最適化: {optimization['before_bytes']}→{optimization['after_bytes']}バイト"
+                            f"（{optimization['elapsed_ms']}ms）")
+                if report is not None:
+                    report['optimization'] = optimization
+                if progress:
+                    progress('optimized', bytes=optimization['after_bytes'],
+                             before_bytes=optimization['before_bytes'],
+                             optimize_ms=optimization['elapsed_ms'])
+            except Exception as optimize_error:
+                logger.warning(f"出力最適化エラー（最適化なしで出力）: {optimize_error}")
+        
+        if report is not None:
+            report['pages'] = total_pages
+            report['output_bytes'] = len(result)
+            report['write_mode'] = write_mode
+            report['write_ms'] = write_ms
+            report['footer_region'] = global_footer_region
+            report['page_footer_heights_mm'] = [
+                page_results[page_num].get('bottom_height') if page_num in page_results else None
+                for page_num in range(total_pages)
+            ]
+            report['page_plan'] = page_plan_summary(page_mode, total_pages, detect_pages, inherited_pages,
+                                                    target_pages)
+            report['redaction'] = redaction_summary(redaction, redaction_pages)
+        
         return result
         
     except Exception as e:
@@ -529,119 +897,190 @@ def convert_pdf_footer(pdf_data, company_info):
         logger.error(f"詳細なトレースバック: {traceback.format_exc()}")
         return None
 
-def add_company_footer(canvas, company_info, page_width, footer_height):
-    """フッター領域に会社情報をバランス良く配置"""
+def resolve_footer_height_pt(page_footer_result):
+    """ページの検出結果から白塗りする高さ（pt）を決める（低信頼度なら安全マージンを追加）"""
+    confidence = page_footer_result.get('confidence', 60)
+    detected_height = page_footer_result.get('bottom_height', 40)
+    if confidence < 60:
+        safe_height = max(detected_height + 10, 30)
+        logger.info(f"低信頼度({confidence}%)のため高さを{detected_height}mm→{safe_height}mmに調整")
+        return safe_height * mm
+    return detected_height * mm
+
+def page_redaction_regions(page_footer_result, geometry):
+    """検出結果の白塗り矩形（検出時とページの表示サイズが違う引き継ぎ結果などは使わずNone＝全幅の帯）"""
+    regions = page_footer_result.get('regions')
+    size = page_footer_result.get('regions_page_size')
+    if not regions or not size:
+        return None
+    width, height = geometry.display_size
+    if abs(size[0] - width) > 1 or abs(size[1] - height) > 1:
+        return None
+    return regions
+
+def redaction_coverage(page_num, geometry, bottom_height_pt, regions):
+    """ページの白塗り面積（ページ面積に対する割合。全幅の帯で塗った場合の割合も併記）"""
+    page_width, page_height = geometry.display_size
+    page_area = page_width * page_height
+    band_area = page_width * bottom_height_pt
+    painted_area = region_area(regions) if regions else band_area
+    return {
+        'page': page_num + 1,
+        'regions': [[round(value / mm, 1) for value in region] for region in regions] if regions else None,
+        'painted_area_ratio': round(painted_area / page_area, 4),
+        'band_area_ratio': round(band_area / page_area, 4),
+    }
+
+def redaction_summary(redaction, pages):
+    """白塗り範囲の集計（矩形で塗ったページ数・平均の白塗り面積の割合）"""
+    count = max(1, len(pages))
+    return {
+        'geometry': redaction,
+        'region_pages': sum(1 for page in pages if page['regions']),
+        'painted_area_ratio': round(sum(page['painted_area_ratio'] for page in pages) / count, 4),
+        'band_area_ratio': round(sum(page['band_area_ratio'] for page in pages) / count, 4),
+        'pages': pages,
+    }
+
+def build_footer_preview(pdf_data, company_info, page_num=0, footer_assets=None, thumbnail=False, redaction=None):
+    """指定ページの変換前後のプレビューPNG（下部の帯、任意でページ全体のサムネイル）を作成
+    
+    検出結果と画像は内容ハッシュ・ページ・白塗り範囲・会社情報の指紋をキーにキャッシュする。
+    """
+    if redaction is None:
+        redaction = app.config['REDACTION_GEOMETRY']
+    pdf_hash = content_hash(pdf_data)
+    page_footer_result = preview_cache.detection(
+        (pdf_hash, page_num, redaction),
+        lambda: detect_footers_for_pages(pdf_data, [page_num], workers=1, regions=redaction == 'regions')[0]
+    )
+    bottom_height_pt = resolve_footer_height_pt(page_footer_result)
+    
+    if not is_valid_footer_assets(footer_assets):
+        footer_assets = build_footer_assets(company_info)
+    
+    pdf_reader = PyPDF2.PdfReader(BytesIO(pdf_data))
+    page = pdf_reader.pages[page_num]
+    geometry = page_geometry(page)
+    band_ratio = band_ratio_for(bottom_height_pt, geometry.display_size[1])
+    regions = page_redaction_regions(page_footer_result, geometry) if redaction == 'regions' else None
+    params = (round(bottom_height_pt, 2), footer_assets['fingerprint'],
+              tuple(tuple(region) for region in regions) if regions else None)
+    
+    def converted_page():
+        # 対象ページだけにオーバーレイを重ねた1ページのPDF
+        overlay_page = build_footer_overlay(company_info, geometry, bottom_height_pt, footer_assets,
+                                            regions=regions)
+        if overlay_page is not None:
+            page.merge_page(overlay_page)
+        pdf_writer = PyPDF2.PdfWriter()
+        pdf_writer.add_page(page)
+        output_buffer = BytesIO()
+        pdf_writer.write(output_buffer)
+        return output_buffer.getvalue()
+    
+    converted = {}
+    def converted_pdf():
+        if 'data' not in converted:
+            converted['data'] = converted_page()
+        return converted['data']
+    
+    images = {}
+    cached = True
+    renders = {
+        'before': lambda: render_png(pdf_data, page_num, band_ratio=band_ratio),
+        'after': lambda: render_png(converted_pdf(), 0, band_ratio=band_ratio),
+    }
+    if thumbnail:
+        renders['thumbnail_before'] = lambda: render_png(pdf_data, page_num, dpi=PREVIEW_THUMBNAIL_DPI)
+        renders['thumbnail_after'] = lambda: render_png(converted_pdf(), 0, dpi=PREVIEW_THUMBNAIL_DPI)
+    for kind, render in renders.items():
+        png, hit = preview_cache.image((pdf_hash, page_num, kind) + params, render)
+        images[kind] = 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
+        cached = cached and hit
+    
+    return {
+        'page': page_num + 1,
+        'total_pages': len(pdf_reader.pages),
+        'bottom_height': round(bottom_height_pt / mm, 1),
+        'confidence': page_footer_result.get('confidence'),
+        'method': page_footer_result.get('method'),
+        'redaction': redaction_coverage(page_num, geometry, bottom_height_pt, regions),
+        'images': images,
+        'cached': cached,
+    }
+
+def build_footer_overlay(company_info, geometry, bottom_height_pt, footer_assets=None, regions=None):
+    """表示上のページ下部を白塗りして会社情報を描いたオーバーレイページを作成
+    
+    表示座標（回転・CropBox適用後、左下原点）で描画し、ページのユーザー空間へ変換済みの
+    PyPDF2ページを返す。同じ形状・高さのページ間で使い回せる。
+    regions: 白塗りする矩形 [x0, y0, x1, y1] のリスト（Noneなら下部の全幅の帯）。
+             会社情報は最も大きい矩形の中に配置する
+    """
+    page_width, page_height = geometry.display_size
+    overlay_buffer = BytesIO()
+    overlay_canvas = canvas.Canvas(overlay_buffer, pagesize=(page_width, page_height))
+    
+    # 確実な白塗り処理（下部フッター領域のみ）
+    # 表示座標系: 左下が原点(0,0)、Y軸は上向き
+    boxes = [(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in regions] if regions else [(0, 0, page_width, bottom_height_pt)]
+    overlay_canvas.setFillColor(colors.white)
+    overlay_canvas.setStrokeColor(colors.white)
+    for x, y, width, height in boxes:
+        overlay_canvas.rect(x, y, width, height, fill=1, stroke=0)
+        logger.info(f"白塗り矩形: X={x/mm:.1f}mm, Y={y/mm:.1f}mm, Width={width/mm:.1f}mm, Height={height/mm:.1f}mm")
+    
+    # デバッグ用: 白塗り範囲を赤い枠で囲む（座標確認用）
+    overlay_canvas.setStrokeColor(colors.red)
+    overlay_canvas.setLineWidth(3)  # より見やすく
+    for x, y, width, height in boxes:
+        overlay_canvas.rect(x, y, width, height, fill=0, stroke=1)
+    
+    # 新しい会社情報を配置（矩形で塗る場合は最も大きい矩形の中）
+    x, y, width, height = max(boxes, key=lambda box: box[2] * box[3])
+    overlay_canvas.saveState()
+    overlay_canvas.translate(x, y)
+    add_company_footer(overlay_canvas, company_info, width, height, footer_assets)
+    overlay_canvas.restoreState()
+    
+    overlay_canvas.save()
+    
+    # オーバーレイをPDFとして読み込み
+    overlay_buffer.seek(0)
+    overlay_reader = PyPDF2.PdfReader(overlay_buffer)
+    if len(overlay_reader.pages) == 0:
+        return None
+    
+    overlay_page = overlay_reader.pages[0]
+    if not geometry.is_identity:
+        # 回転ページ・原点のずれたCropBox・UserUnitに合わせてユーザー空間へ写す
+        overlay_page.add_transformation(geometry.overlay_transform())
+        # merge_page はオーバーレイ側のボックスで切り抜くため、変換後の表示領域に合わせる
+        overlay_page.mediabox = RectangleObject(geometry.cropbox)
+    return overlay_page
+
+def add_company_footer(canvas, company_info, page_width, footer_height, assets=None):
+    """フッター領域に会社情報をバランス良く配置
+    
+    assets: プロフィール保存時に事前計算したフッターアセット（Noneならその場で計算）
+    """
     try:
-        from reportlab.lib.units import mm
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-        
-        # 配置エリアの設定（バランス改善）
-        margin = 8 * mm  # 左右マージンを増加
-        vertical_margin = 4 * mm  # 上下マージン
-        text_start_x = margin
-        # フッター領域を3つのゾーンに分割：上余白 + コンテンツ + 下余白
-        content_height = footer_height - (2 * vertical_margin)
-        text_start_y = footer_height - vertical_margin - 2 * mm  # 上から少し下げて開始
-        
-        # 日本語フォントの登録と設定（複数のフォールバック）
-        font_name = "Helvetica"  # デフォルト
-        try:
-            # 1. HeiseiKakuGo-W5（標準的な日本語ゴシック）
-            pdfmetrics.registerFont(UnicodeCIDFont('HeiseiKakuGo-W5'))
-            font_name = 'HeiseiKakuGo-W5'
-            canvas.setFont(font_name, 10)
-            logger.info(f"日本語フォント設定成功: {font_name}")
-        except Exception:
-            try:
-                # 2. HeiseiMin-W3（明朝体）
-                pdfmetrics.registerFont(UnicodeCIDFont('HeiseiMin-W3'))
-                font_name = 'HeiseiMin-W3'
-                canvas.setFont(font_name, 10)
-                logger.info(f"日本語フォント設定成功（明朝）: {font_name}")
-            except Exception:
-                try:
-                    # 3. 汎用日本語フォント
-                    pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
-                    font_name = 'STSong-Light'
-                    canvas.setFont(font_name, 10)
-                    logger.info(f"汎用日本語フォント設定成功: {font_name}")
-                except Exception as font_error:
-                    logger.warning(f"すべての日本語フォント設定に失敗: {font_error}")
-                    try:
-                        canvas.setFont("Times-Roman", 10)
-                        font_name = "Times-Roman"
-                        logger.info("Times-Romanフォントに設定")
-                    except:
-                        canvas.setFont("Helvetica", 10)
-                        font_name = "Helvetica"
-                        logger.warning("Helveticaフォントにフォールバック")
-        
-        canvas.setFillColor(colors.black)
+        if not is_valid_footer_assets(assets):
+            assets = build_footer_assets(company_info)
         
-        # 水平レイアウト設計: 3カラム構成
-        # 左カラム: 宅建番号 + 会社名
-        # 中央カラム: 住所 + 電話番号  
-        # 右カラム: メール + Web (必要に応じて)
+        # フッター枠に収まる配置（カラム幅・フォントサイズ・位置）を取得（同じ幅・高さ区分ではキャッシュ済み）
+        layout = solve_footer_layout(assets, page_width, footer_height)
+        if layout['overflow']:
+            logger.info("フッター枠に収まらない項目を縮小・省略して配置")
         
-        # カラム幅の設定
-        left_column_width = page_width * 0.35  # 35%
-        center_column_width = page_width * 0.45  # 45%
-        right_column_width = page_width * 0.2   # 20%
-        
-        left_x = margin
-        center_x = left_x + left_column_width
-        right_x = center_x + center_column_width
-        
-        # Y位置の設定（2行レイアウト）
-        top_line_y = text_start_y
-        bottom_line_y = text_start_y - 8 * mm  # 8mm下
-        
-        logger.info(f"水平レイアウト: page_width={page_width/mm:.1f}mm, left_x={left_x/mm:.1f}mm, center_x={center_x/mm:.1f}mm")
-        
-        # 左カラム: 宅建番号（上）+ 会社名（下）
-        license_number = company_info.get('license_number', '')
-        company_name = company_info.get('company_name', '不動産会社')
-        
-        if license_number:
-            canvas.setFont(font_name, 8)
-            canvas.drawString(left_x, top_line_y, f"免許番号: {license_number}")
-            
-        if company_name:
-            canvas.setFont(font_name, 20)  # 会社名を20ptに変更
-            canvas.drawString(left_x, bottom_line_y, company_name)
-        
-        # 中央カラム: 住所（上）+ 電話番号（下）
-        address = company_info.get('address', '')
-        postal_code = company_info.get('postal_code', '')
-        phone = company_info.get('phone', '')
-        fax = company_info.get('fax', '')
-        
-        if address:
-            address_text = f"〒{postal_code} {address}" if postal_code else address
-            canvas.setFont(font_name, 9)
-            canvas.drawString(center_x, top_line_y, address_text)
-            
-        if phone:
-            contact_line = f"TEL: {phone}"
-            if fax:
-                contact_line += f" / FAX: {fax}"
-            canvas.setFont(font_name, 9)
-            canvas.drawString(center_x, bottom_line_y, contact_line)
-        
-        # 右カラム: メール（上）+ Web（下）※オプション
-        email = company_info.get('email', '')
-        website = company_info.get('website', '')
-        
-        if email or website:
-            canvas.setFont(font_name, 8)
+        canvas.setFillColor(colors.black)
+        for item in layout['items']:
             try:
-                if email:
-                    canvas.drawString(right_x, top_line_y, f"E-mail: {email}")
-                if website:
-                    canvas.drawString(right_x, bottom_line_y, f"Web: {website}")
+                canvas.setFont(layout['font_name'], item['size'])
+                canvas.drawString(item['x'], item['y'], item['text'])
             except Exception as e:
-                logger.warning(f"右カラム描画エラー: {e}")
+                logger.warning(f"フッター項目描画エラー（{item['key']}）: {e}")
         
     except Exception as e:
         logger.error(f"フッター情報描画エラー: {str(e)}")
@@ -659,83 +1098,207 @@ def add_company_footer(canvas, company_info, page_width, footer_height):
             pass
 
 def generate_simple_mysouku(property_data, company_data):
-    """簡易マイソクPDF生成"""
+    """簡易マイソクPDF生成（スタイル・フォントはプロセスで共有）"""
     try:
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=20*mm, rightMargin=20*mm,
-                              topMargin=20*mm, bottomMargin=20*mm)
-        
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle('Title', parent=styles['Heading1'], 
-                                   fontSize=16, textColor=colors.navy, 
-                                   alignment=1, spaceAfter=20)
-        
-        elements = []
-        
-        # タイトル
-        company_name = company_data.get('company_name', '不動産会社')
-        elements.append(Paragraph(company_name, title_style))
-        
-        # 物件情報テーブル
-        data = [
-            ['物件種別', property_data.get('property_type', '')],
-            ['取引種別', property_data.get('transaction_type', '')],
-            ['価格・賃料', property_data.get('price', '')],
-            ['所在地', property_data.get('address', '')],
-            ['間取り', property_data.get('floor_plan', '')],
-            ['築年数', property_data.get('building_age', '')]
-        ]
-        
-        # 空の項目を除外
-        data = [[k, v] for k, v in data if v]
-        
-        if data:
-            table = Table(data, colWidths=[50*mm, 120*mm])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightblue),
-                ('BACKGROUND', (1, 0), (1, -1), colors.white),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 5),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-            ]))
-            elements.append(table)
-        
-        # 連絡先
-        contact_info = []
-        if company_data.get('address'):
-            contact_info.append(f"住所: {company_data['address']}")
-        if company_data.get('phone'):
-            contact_info.append(f"TEL: {company_data['phone']}")
-        if company_data.get('license_number'):
-            contact_info.append(f"免許番号: {company_data['license_number']}")
-        
-        if contact_info:
-            from reportlab.platypus import Spacer
-            elements.append(Spacer(1, 20*mm))
-            
-            contact_table = Table([[info] for info in contact_info], colWidths=[170*mm])
-            contact_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ]))
-            elements.append(contact_table)
-        
-        doc.build(elements)
-        buffer.seek(0)
-        return buffer.getvalue()
+        pdf_data, _ = build_mysouku_pdf([property_data], company_data)
+        return pdf_data
         
     except Exception as e:
         print(f"PDF生成エラー: {e}")
         return None
 
+def get_duplicate_index():
+    """重複照合インデックス（照合しない設定ならNone）"""
+    global _duplicate_index
+    if not app.config['DUPLICATE_CHECK']:
+        return None
+    with _duplicate_index_lock:
+        if _duplicate_index is None:
+            _duplicate_index = DuplicateIndex(app.config['DUPLICATE_INDEX_PATH'],
+                                              max_entries=app.config['DUPLICATE_INDEX_MAX_ENTRIES'])
+        return _duplicate_index
+
+
+def duplicate_signature(file_data):
+    """照合用シグネチャ（照合しない設定・作成できない場合はNone。プロセスプール内でも実行できる）"""
+    if not app.config['DUPLICATE_CHECK']:
+        return None
+    try:
+        return page_signature(file_data)
+    except Exception as e:
+        logger.warning(f"重複照合用シグネチャ作成エラー（照合せずに続行）: {e}")
+        return None
+
+
+def find_duplicate(file_data, signature=None):
+    """重複インデックスと照合し (内容ハッシュ, シグネチャ, 一致したエントリ) を返す（照合できなければ全てNone）"""
+    if signature is None:
+        signature = duplicate_signature(file_data)
+    if signature is None:
+        return None, None, None
+    try:
+        content_key = content_hash(file_data)
+        match = get_duplicate_index().find(content_key, signature)
+        if match:
+            logger.info(f"🔁 重複マイソクを検出: {match['meta'].get('filename')} "
+                        f"(類似度: {match['similarity']}, 画像距離: {match['image_distance']})")
+        return content_key, signature, match
+    except Exception as e:
+        logger.warning(f"重複照合エラー（照合せずに続行）: {e}")
+        return None, None, None
+
+
+def register_duplicate(content_key, signature, filename, **meta):
+    if content_key is None:
+        return
+    get_duplicate_index().add(content_key, signature,
+                        dict(meta, filename=filename, added_at=time.strftime('%Y-%m-%dT%H:%M:%S')))
+
+
+def duplicate_summary(match):
+    """レスポンスに含める一致情報"""
+    if not match:
+        return None
+    return {
+        'filename': match['meta'].get('filename'),
+        'added_at': match['meta'].get('added_at'),
+        'exact': match['exact'],
+        'similarity': match['similarity'],
+        'image_distance': match['image_distance'],
+    }
+
+
+def conversion_options(form):
+    """リクエストの変換指定（page_mode / page_ranges / sample_pages / redaction）を検証して convert_pdf_footer の引数にする"""
+    page_mode = form.get('page_mode') or app.config['PAGE_MODE']
+    if page_mode not in PAGE_MODES:
+        raise ValueError(f"ページモードは {' / '.join(PAGE_MODES)} のいずれかを指定してください")
+    options = {'page_mode': page_mode}
+    if page_mode == 'ranges':
+        options['page_ranges'] = parse_page_ranges(form.get('page_ranges'))
+    elif page_mode == 'sample':
+        try:
+            options['sample_count'] = int(form.get('sample_pages') or app.config['PAGE_SAMPLE_COUNT'])
+        except ValueError:
+            raise ValueError('検出するページ数は整数で指定してください')
+        if options['sample_count'] < 1:
+            raise ValueError('検出するページ数は1以上で指定してください')
+    options['redaction'] = form.get('redaction') or app.config['REDACTION_GEOMETRY']
+    if options['redaction'] not in REDACTION_GEOMETRIES:
+        raise ValueError(f"白塗り範囲は {' / '.join(REDACTION_GEOMETRIES)} のいずれかを指定してください")
+    return options
+
+
+def saturated_payload(error):
+    """受付を断るときのレスポンス本文"""
+    logger.info(f"🚦 混雑のため受付を見送り（{error.pool}: {error.reason}、{error.retry_after}秒後に再試行）")
+    return {'status': 'error', 'message': '混雑しています。しばらくしてから再試行してください',
+            'retry_after': error.retry_after}
+
+
+def admission_limited(view):
+    """CPU処理の枠を確保してから実行（待ち行列が満杯なら429、期限切れなら503 + Retry-After）"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            acquired = cpu_pool.acquire()
+        except Saturated as e:
+            response = jsonify(saturated_payload(e))
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, e.status_code
+        try:
+            return view(*args, **kwargs)
+        finally:
+            cpu_pool.release(acquired)
+    return wrapper
+
+
+def profiling_requested():
+    """このリクエストをプロファイルするか（X-Profile ヘッダーまたは ?profile= で指定、設定で許可時のみ）"""
+    if not app.config['PROFILING_ENABLED']:
+        return False
+    value = request.headers.get('X-Profile') or request.args.get('profile')
+    if not value:
+        return False
+    token = app.config['PROFILE_TOKEN']
+    if token:
+        return hmac.compare_digest(value, token)
+    return value in ('1', 'true')
+
+
+def profiled(view):
+    """指定されたリクエストをプロファイルし、JSONレスポンスに概要（profile）を付ける"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not profiling_requested():
+            return view(*args, **kwargs)
+        profile_session = start_profile(app.config['PROFILE_DIR'], f"{request.method} {request.path}")
+        if profile_session is None:
+            logger.warning("他のリクエストをプロファイル中のため、プロファイルせずに実行")
+            return view(*args, **kwargs)
+
+        g.profile_session = profile_session
+        try:
+            response = make_response(view(*args, **kwargs))
+        finally:
+            g.profile_session = None
+            summary = profile_session.finish()
+        logger.info(f"🔬 プロファイルを保存: {summary['profile_id']}（{summary['elapsed_ms']}ms, {summary['samples']}サンプル）")
+
+        response.headers['X-Profile-Id'] = summary['profile_id']
+        if response.is_json:
+            payload = response.get_json()
+            payload['profile'] = summary
+            response.set_data(json.dumps(payload, ensure_ascii=False))
+        return response
+    return wrapper
+
+
+def profile_progress(progress):
+    """プロファイル中のリクエストなら、進捗通知を段階ごとの計測にも流す"""
+    profile_session = g.get('profile_session')
+    return profile_session.wrap_progress(progress) if profile_session else progress
+
+
+def captured(view):
+    """記録が有効なら、リクエスト（入力PDF・伏せ字にした会社情報）と応答の要約・所要時間を記録"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request_capture is None or not request_capture.sampled():
+            return view(*args, **kwargs)
+        try:
+            files = {}
+            for field, storage in request.files.items():
+                files[field] = (storage.filename, storage.read())
+                storage.stream.seek(0)
+            profile = get_company_profile(request.form.get('profile_id'))
+            company_info = profile['company_info'] if profile else get_company_info()
+            entry = request_capture.build_entry(request.method, request.path, request.form.to_dict(), files,
+                                                company_info)
+        except Exception as e:
+            logger.warning(f"⚠️ リクエストを記録できませんでした: {e}")
+            return view(*args, **kwargs)
+
+        started = time.perf_counter()
+        response = make_response(view(*args, **kwargs))
+        entry['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        entry['status_code'] = response.status_code
+        try:
+            entry['response'] = response_fingerprint(response.get_json()) if response.is_json else None
+        except Exception as e:
+            entry['response'] = {'error': str(e)}
+        request_capture.record(entry)
+        return response
+    return wrapper
+
+
+def _limit_records(records, limit):
+    """レコード数の上限を超えたらエラー（逐次読み込みのまま数える）"""
+    for index, record in enumerate(records):
+        if index >= limit:
+            raise ValueError(f"一度に生成できる物件は{limit}件までです")
+        yield record
+
 @app.route('/test_basic', methods=['POST', 'GET'])
 def test_basic():
     """最もシンプルなテスト"""
@@ -823,7 +1386,9 @@ def index():
 
 @app.route('/company_settings')
 def company_settings():
-    return render_template('company_settings.html', company_info=get_company_info())
+    profiles = company_model.list() if company_model is not None else []
+    return render_template('company_settings.html', company_info=get_company_info(),
+                           profiles=profiles, current_profile_id=session.get('profile_id', ''))
 
 @app.route('/save_company', methods=['POST'])
 def save_company():
@@ -841,14 +1406,72 @@ def save_company():
             'representative_name': request.form.get('representative_name', ''),
         }
         
-        set_company_info(company_data)
+        # profile_id が送られていればそのプロフィール（空文字なら新規）、無ければ選択中のプロフィールを更新
+        if 'profile_id' in request.form:
+            profile_id = request.form.get('profile_id') or None
+        else:
+            profile_id = session.get('profile_id')
+        
+        profile_id = set_company_info(company_data, profile_id)
         logger.info(f"会社情報を保存: {company_data.get('company_name', '未設定')}")
-        return jsonify({'status': 'success', 'message': '会社情報を保存しました'})
+        return jsonify({'status': 'success', 'message': '会社情報を保存しました', 'profile_id': profile_id})
         
     except Exception as e:
         return jsonify({'status': 'error', 'message': f'エラーが発生しました: {str(e)}'})
 
+@app.route('/profiles', methods=['GET'])
+def list_profiles():
+    """会社プロフィール一覧"""
+    if company_model is None:
+        return jsonify({'status': 'error', 'message': 'プロフィールストアが利用できません'})
+    return jsonify({
+        'status': 'success',
+        'profiles': company_model.list(),
+        'current_profile_id': session.get('profile_id')
+    })
+
+@app.route('/select_profile', methods=['POST'])
+def select_profile():
+    """使用する会社プロフィールを切り替え"""
+    profile_id = request.form.get('profile_id', '')
+    profile = get_company_profile(profile_id)
+    if not profile:
+        return jsonify({'status': 'error', 'message': '指定された会社プロフィールが見つかりません'})
+    session['profile_id'] = profile_id
+    session.pop('company_info', None)
+    session.permanent = True
+    return jsonify({'status': 'success', 'message': f"{profile['company_info'].get('company_name', '')} を選択しました"})
+
+@app.route('/profiles/<profile_id>', methods=['DELETE'])
+def delete_profile(profile_id):
+    """会社プロフィールを削除"""
+    if company_model is None or not company_model.delete(profile_id):
+        return jsonify({'status': 'error', 'message': '指定された会社プロフィールが見つかりません'})
+    if session.get('profile_id') == profile_id:
+        session.pop('profile_id', None)
+    return jsonify({'status': 'success', 'message': '会社プロフィールを削除しました'})
+
+@app.route('/upload_hints', methods=['GET'])
+def upload_hints():
+    """クライアントのアップロードスケジューラ向けの同時実行数ヒント"""
+    return jsonify(dict(cpu_pool.hints(), status='success'))
+
+@app.route('/profiling/<path:filename>', methods=['GET'])
+def profiling_file(filename):
+    """保存したプロファイル（.collapsed / .json）の取得（プロファイル指定と同じ条件で許可）"""
+    if not profiling_requested():
+        return jsonify({'status': 'error', 'message': 'プロファイリングは許可されていません'}), 403
+    return send_from_directory(os.path.abspath(app.config['PROFILE_DIR']), filename, as_attachment=True)
+
+@app.route('/admission_metrics', methods=['GET'])
+def admission_metrics():
+    """受付制御の状況（資源ごとの実行中・待ち件数、断った件数、待ち時間）"""
+    return jsonify({'status': 'success', 'cpu': cpu_pool.metrics(), 'claude': claude_pool.metrics()})
+
 @app.route('/upload_pdf', methods=['POST'])
+@captured
+@admission_limited
+@profiled
 def upload_pdf():
     try:
         if 'pdf_file' not in request.files:
@@ -862,27 +1485,53 @@ def upload_pdf():
             return jsonify({'status': 'error', 'message': 'PDFファイルのみ許可されています'})
         
         # PDF解析
+        progress = profile_progress(progress_hub.reporter(request.form.get('job_id')))
         file_data = file.read()
-        text = extract_text_from_pdf(file_data)
+        
+        # 重複照合（on_duplicate=reuse なら既存の抽出結果を返す）
+        content_key, signature, duplicate = find_duplicate(file_data)
+        if duplicate and request.form.get('on_duplicate') == 'reuse' and duplicate['meta'].get('extracted_data'):
+            if progress:
+                progress('done')
+            return jsonify({
+                'status': 'success',
+                'file_id': uuid.uuid4().hex,
+                'filename': secure_filename(file.filename),
+                'extracted_data': duplicate['meta']['extracted_data'],
+                'raw_text': '',
+                'duplicate': duplicate_summary(duplicate),
+                'reused': True
+            })
+        
+        text = extract_text_from_pdf(file_data, progress=progress)
         
         if not text.strip():
+            if progress:
+                progress('error', message='PDFからテキストを抽出できませんでした')
             return jsonify({'status': 'error', 'message': 'PDFからテキストを抽出できませんでした'})
         
         property_data = parse_property_data(text)
         file_id = uuid.uuid4().hex
+        register_duplicate(content_key, signature, secure_filename(file.filename), extracted_data=property_data)
+        if progress:
+            progress('done')
         
         return jsonify({
             'status': 'success',
             'file_id': file_id,
             'filename': secure_filename(file.filename),
             'extracted_data': property_data,
-            'raw_text': text[:500] + '...' if len(text) > 500 else text
+            'raw_text': text[:500] + '...' if len(text) > 500 else text,
+            'duplicate': duplicate_summary(duplicate)
         })
         
     except Exception as e:
         return jsonify({'status': 'error', 'message': f'エラーが発生しました: {str(e)}'})
 
 @app.route('/process_pdf_simple', methods=['POST'])
+@captured
+@admission_limited
+@profiled
 def process_pdf_simple():
     """シンプルなPDF処理 - フッター検出と会社名変換"""
     try:
@@ -908,8 +1557,19 @@ def process_pdf_simple():
         output_format = request.form.get('output_format', 'separate')
         logger.info(f"出力形式: {output_format}")
         
-        # 会社情報確認
-        company_info = get_company_info()
+        # ページ指定（1ページ目の結果を全ページに適用・ページ範囲・抜き取り検出）と白塗り範囲
+        try:
+            page_options = conversion_options(request.form)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)})
+        
+        # 会社情報確認（profile_id指定時はそのプロフィールの事前計算済みアセットを使用）
+        requested_profile_id = request.form.get('profile_id')
+        profile = get_company_profile(requested_profile_id)
+        if requested_profile_id and not profile:
+            return jsonify({'status': 'error', 'message': '指定された会社プロフィールが見つかりません'})
+        company_info = profile['company_info'] if profile else get_company_info()
+        footer_assets = profile['footer_assets'] if profile else None
         if not company_info:
             logger.warning("会社情報が設定されていません")
             return jsonify({
@@ -930,33 +1590,59 @@ def process_pdf_simple():
             logger.error(f"ファイル読み込みエラー: {str(e)}")
             return jsonify({'status': 'error', 'message': 'ファイル読み込みに失敗しました'})
         
+        # 重複照合（on_duplicate=skip なら変換せずに一致情報だけ返す）
+        content_key, signature, duplicate = find_duplicate(file_data)
+        if duplicate and request.form.get('on_duplicate') == 'skip':
+            return jsonify({
+                'status': 'duplicate',
+                'message': f"既に処理済みのマイソクとほぼ同じ内容です: {duplicate['meta'].get('filename')}",
+                'duplicate': duplicate_summary(duplicate)
+            })
+        
         # 内部でグローバルフッター検出を実行
         logger.info("PDF変換でフッター検出を実行")
         
-        # PDFを変換
+        # 進捗通知（フロントエンドが job_id を付けて /progress/<job_id> を購読している場合のみ配信）
+        progress = profile_progress(progress_hub.reporter(request.form.get('job_id')))
+        
+        # PDFを変換（プロファイル中はページ検出もこのスレッドで行い、サンプリング対象にする）
         try:
             logger.info("PDF変換開始")
-            converted_pdf = convert_pdf_footer(file_data, company_info)
+            conversion_report = {}
+            converted_pdf = convert_pdf_footer(file_data, company_info, progress=progress,
+                                               footer_assets=footer_assets,
+                                               detect_workers=1 if g.get('profile_session') else None,
+                                               report=conversion_report, **page_options)
             
             if converted_pdf and len(converted_pdf) > 0:
                 logger.info(f"PDF変換成功: {len(converted_pdf)} bytes")
+                if progress:
+                    progress('done', bytes=len(converted_pdf))
                 pdf_base64 = base64.b64encode(converted_pdf).decode('utf-8')
                 filename = f"converted_{secure_filename(file.filename)}"
+                register_duplicate(content_key, signature, secure_filename(file.filename))
                 
                 return jsonify({
                     'status': 'success',
                     'message': 'PDF変換が完了しました',
                     'pdf_data': pdf_base64,
-                    'filename': filename
+                    'filename': filename,
+                    'duplicate': duplicate_summary(duplicate),
+                    'page_plan': conversion_report.get('page_plan'),
+                    'redaction': conversion_report.get('redaction')
                 })
             else:
                 logger.error("PDF変換結果が空またはNone")
+                if progress:
+                    progress('error', message='PDF変換に失敗しました')
                 return jsonify({'status': 'error', 'message': 'PDF変換に失敗しました'})
                 
         except Exception as e:
             logger.error(f"PDF変換処理エラー: {str(e)}")
             import traceback
             logger.error(f"変換エラートレースバック: {traceback.format_exc()}")
+            if progress:
+                progress('error', message=str(e))
             return jsonify({'status': 'error', 'message': f'PDF変換エラー: {str(e)}'})
             
     except Exception as e:
@@ -965,7 +1651,72 @@ def process_pdf_simple():
         logger.error(f"全体エラートレースバック: {traceback.format_exc()}")
         return jsonify({'status': 'error', 'message': f'システムエラー: {str(e)}'})
 
+@app.route('/preview', methods=['POST'])
+@captured
+@profiled
+def preview_pdf():
+    """変換前後のプレビュー画像（下部の帯、thumbnail=1でページ全体も）を返す"""
+    try:
+        if 'pdf_file' not in request.files:
+            return jsonify({'status': 'error', 'message': 'ファイルが選択されていません'})
+        
+        file = request.files['pdf_file']
+        if not file or file.filename == '' or not allowed_file(file.filename):
+            return jsonify({'status': 'error', 'message': 'PDFファイルのみ許可されています'})
+        
+        requested_profile_id = request.form.get('profile_id')
+        profile = get_company_profile(requested_profile_id)
+        if requested_profile_id and not profile:
+            return jsonify({'status': 'error', 'message': '指定された会社プロフィールが見つかりません'})
+        company_info = profile['company_info'] if profile else get_company_info()
+        footer_assets = profile['footer_assets'] if profile else None
+        if not company_info:
+            return jsonify({
+                'status': 'error',
+                'message': '会社情報が設定されていません。先に会社情報を設定してください。'
+            })
+        
+        try:
+            page_num = int(request.form.get('page', 1)) - 1
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'ページ番号が不正です'})
+        thumbnail = request.form.get('thumbnail') == '1'
+        redaction = request.form.get('redaction') or app.config['REDACTION_GEOMETRY']
+        if redaction not in REDACTION_GEOMETRIES:
+            return jsonify({'status': 'error', 'message': f"白塗り範囲は {' / '.join(REDACTION_GEOMETRIES)} のいずれかを指定してください"})
+        
+        file_data = file.read()
+        if len(file_data) == 0:
+            return jsonify({'status': 'error', 'message': 'ファイルデータが空です'})
+        
+        try:
+            page_count = len(PyPDF2.PdfReader(BytesIO(file_data)).pages)
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': f'PDFファイルの読み込みに失敗しました: {str(e)}'})
+        if not 0 <= page_num < page_count:
+            return jsonify({'status': 'error', 'message': f'ページ番号は1〜{page_count}で指定してください'})
+        
+        preview = build_footer_preview(file_data, company_info, page_num, footer_assets, thumbnail, redaction)
+        logger.info(f"🔍 プレビュー作成: {file.filename} ページ{page_num + 1}"
+                    f"（{'キャッシュ' if preview['cached'] else '新規'}）")
+        return jsonify({'status': 'success', **preview})
+        
+    except Exception as e:
+        logger.error(f"プレビュー作成エラー: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'プレビュー作成エラー: {str(e)}'})
+
+@app.route('/progress/<job_id>')
+def progress_stream(job_id):
+    """変換ジョブの進捗をServer-Sent Eventsで配信"""
+    subscriber = progress_hub.subscribe(job_id)
+    return Response(
+        stream_with_context(stream_events(progress_hub, job_id, subscriber)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/generate_mysouku', methods=['POST'])
+@admission_limited
 def generate_mysouku():
     try:
         data = request.get_json()
@@ -999,6 +1750,58 @@ def generate_mysouku():
     except Exception as e:
         return jsonify({'status': 'error', 'message': f'エラーが発生しました: {str(e)}'})
 
+@app.route('/generate_mysouku_bulk', methods=['POST'])
+@admission_limited
+def generate_mysouku_bulk():
+    """複数物件のマイソクを1つのPDFにまとめて生成
+    
+    本文に JSON配列（または {"properties": [...]}）/ JSON Lines / CSV を送るか、
+    records_file としてアップロードする。形式は ?format= または Content-Type・拡張子で判定。
+    """
+    try:
+        company_info = get_company_info()
+        if not company_info:
+            return jsonify({
+                'status': 'error',
+                'message': '会社情報が設定されていません。先に会社情報を設定してください。'
+            })
+        
+        upload = request.files.get('records_file')
+        if upload:
+            record_format = request.args.get('format') or detect_record_format(None, upload.filename)
+            raw_stream = upload.stream
+        else:
+            record_format = request.args.get('format') or detect_record_format(request.content_type)
+            raw_stream = request.stream
+        if record_format not in RECORD_FORMATS:
+            return jsonify({'status': 'error', 'message': '形式を判定できません（json / jsonl / csv を指定してください）'})
+        
+        started = time.perf_counter()
+        text_stream = TextIOWrapper(raw_stream, encoding='utf-8-sig')
+        records = _limit_records(iter_property_records(text_stream, record_format),
+                                 app.config['BULK_MYSOUKU_MAX_RECORDS'])
+        pdf_data, count = build_mysouku_pdf(records, company_info)
+        elapsed = time.perf_counter() - started
+        
+        if count == 0:
+            return jsonify({'status': 'error', 'message': '物件データがありません'})
+        
+        logger.info(f"📚 一括マイソク生成: {count}件 {elapsed:.2f}秒（{count / elapsed:.0f}件/秒）")
+        return jsonify({
+            'status': 'success',
+            'message': f'{count}件のマイソクを生成しました',
+            'pdf_data': base64.b64encode(pdf_data).decode('utf-8'),
+            'filename': f'mysouku_bulk_{count}.pdf',
+            'count': count,
+            'elapsed_ms': round(elapsed * 1000, 1)
+        })
+        
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+    except Exception as e:
+        logger.error(f"一括マイソク生成エラー: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'エラーが発生しました: {str(e)}'})
+
 @app.errorhandler(413)
 def too_large(e):
     return jsonify({'status': 'error', 'message': 'ファイルサイズが大きすぎます（最大16MB）'}), 413
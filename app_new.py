@@ -10,6 +10,7 @@ import fitz  # PyMuPDF
 from reportlab.pdfgen import canvas
 from reportlab.lib.colors import colors
 from reportlab.lib.units import mm
+from utils.footer_keywords import FOOTER_LINE_MIN_SCORE, score_lines
 
 # ログ設定
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -62,24 +63,25 @@ def pymupdf_footer_detection(pdf_data):
         words = page.get_text("words")
         logger.info(f"📄 単語検出: {len(words)}個")
         
-        # フッター候補キーワード
-        footer_keywords = [
-            "株式会社", "有限会社", "宅建", "免許", "知事", "大臣",
-            "TEL", "FAX", "仲介", "媒介", "代理", "売主", "AD"
-        ]
+        # フッター候補の行（PyMuPDFのブロック・行番号で単語を行にまとめ、共有のキーワード照合で判定）
+        lines = {}
+        for word in words:
+            if len(word) >= 7:  # PyMuPDFの単語タプルは通常8要素
+                x0, y0, x1, y1, text, block_no, line_no = word[:7]
+                line = lines.setdefault((block_no, line_no), {'y0': y0, 'words': []})
+                line['y0'] = min(line['y0'], y0)
+                line['words'].append(text)
+        lines = list(lines.values())
         
-        # フッターキーワードの位置を検索
         footer_positions = []
         found_keywords = []
         
-        for word in words:
-            if len(word) >= 5:  # PyMuPDFの単語タプルは通常8要素
-                x0, y0, x1, y1, text = word[:5]
-                
-                if any(keyword in text for keyword in footer_keywords):
-                    footer_positions.append(y0)
-                    found_keywords.append(text)
-                    logger.info(f"🎯 フッターキーワード発見: '{text}' at Y={y0:.1f}")
+        for line, (score, _) in zip(lines, score_lines(' '.join(line['words']) for line in lines)):
+            if score >= FOOTER_LINE_MIN_SCORE:
+                text = ' '.join(line['words'])
+                footer_positions.append(line['y0'])
+                found_keywords.append(text)
+                logger.info(f"🎯 フッターキーワード発見: '{text}' at Y={line['y0']:.1f}")
         
         if not footer_positions:
             logger.warning("⚠️ フッターキーワードが見つかりません")
@@ -0,0 +1,463 @@
+"""
+マイソク自動変換システム ASGI版エントリポイント（非同期サービングモード）
+
+CPU負荷の高いPDF処理はプロセスプールへ、Claude API呼び出しは非同期クライアントへ
+逃がすことで、遅いAPI応答でワーカー全体が止まらないようにする。
+ルート・レスポンス形式はFlask版（app.py）と同一で、重い処理以外のルートは
+Flaskアプリをそのままマウントして提供する。
+
+    pip install -r requirements-async.txt
+    uvicorn asgi:asgi_app --host 0.0.0.0 --port 5001
+"""
+
+import asyncio
+import base64
+import logging
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import anthropic
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+from werkzeug.utils import secure_filename
+
+from app import (
+    app as flask_app,
+    company_model,
+    allowed_file,
+    build_claude_footer_messages,
+    convert_pdf_footer,
+    detect_footer_with_pdfplumber,
+    duplicate_signature,
+    duplicate_summary,
+    extract_text_for_claude,
+    extract_text_from_pdf,
+    find_duplicate,
+    generate_simple_mysouku,
+    conversion_options,
+    parse_claude_footer_response,
+    parse_property_data,
+    progress_hub,
+    reference_page,
+    register_duplicate,
+    claude_pool,
+    cpu_pool,
+    saturated_payload,
+    Saturated,
+    CLAUDE_API_BASE_URL,
+    CLAUDE_CONFIDENCE_THRESHOLD,
+    CLAUDE_MODEL,
+    CLAUDE_TIMEOUT,
+    CLAUDE_UNAVAILABLE_REGION,
+)
+
+logger = logging.getLogger(__name__)
+
+ASYNC_CPU_WORKERS = int(os.environ.get('ASYNC_CPU_WORKERS', str(os.cpu_count() or 2)))  # PDF処理プロセス数
+CLAUDE_MAX_CONCURRENCY = claude_pool.limit  # 同時Claude API呼び出し数（CLAUDE_MAX_CONCURRENCY）
+
+cpu_executor = None
+
+# 受付制御の順番待ち用スレッド（待てる件数ぶん用意し、イベントループを止めない）
+admission_waiters = ThreadPoolExecutor(max_workers=cpu_pool.max_queue + claude_pool.max_queue + 4,
+                                       thread_name_prefix='admission')
+
+# 非同期Claude APIクライアント（タイムアウトと接続数上限を明示）
+try:
+    async_claude_client = anthropic.AsyncAnthropic(
+        api_key=os.environ.get('CLAUDE_API_KEY', ''),
+        base_url=CLAUDE_API_BASE_URL,
+        timeout=CLAUDE_TIMEOUT,
+        max_retries=1,
+        http_client=httpx.AsyncClient(
+            timeout=CLAUDE_TIMEOUT,
+            limits=httpx.Limits(max_connections=CLAUDE_MAX_CONCURRENCY)
+        )
+    )
+    ASYNC_CLAUDE_AVAILABLE = bool(os.environ.get('CLAUDE_API_KEY'))
+except Exception as e:
+    logger.warning(f"非同期Claude API初期化エラー: {e}")
+    async_claude_client = None
+    ASYNC_CLAUDE_AVAILABLE = False
+
+
+async def acquire_slot(pool):
+    """資源の枠を確保（順番待ちは別スレッドで行う）。確保できなければ Saturated"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(admission_waiters, pool.acquire)
+
+
+def admission_limited(handler):
+    """CPU処理の枠を確保してから実行（Flask版と同じ枠・同じ429/503応答）"""
+    async def wrapper(request):
+        try:
+            acquired = await acquire_slot(cpu_pool)
+        except Saturated as e:
+            return json_response(saturated_payload(e), status_code=e.status_code,
+                                 headers={'Retry-After': str(e.retry_after)})
+        try:
+            return await handler(request)
+        finally:
+            cpu_pool.release(acquired)
+    return wrapper
+
+
+def json_response(payload, status_code=200, headers=None):
+    """JSONレスポンス（Flask版 after_request と同じCORSヘッダーを付与）"""
+    response = JSONResponse(payload, status_code=status_code, headers=headers)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization'
+    response.headers['Access-Control-Allow-Methods'] = 'GET,PUT,POST,DELETE,OPTIONS'
+    return response
+
+
+async def run_cpu(func, *args):
+    """CPU負荷の高い処理をプロセスプールで実行"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, func, *args)
+
+
+def convert_with_report(pdf_data, company_info, footer_region, footer_assets, options, page_results=None):
+    """プロセスプール側: 変換して、変換後PDFと応答に載せる処理結果（ページごとの検出状況・白塗り面積）を返す
+
+    page_results: グローバル領域の決定で検出済みのページの結果（変換時に同じページを検出し直さない）
+    """
+    report = {}
+    # プール内では並列検出を使わない（リクエスト間で既に並列化されている）
+    result = convert_pdf_footer(pdf_data, company_info, 1, footer_region, None, footer_assets,
+                                report=report, page_results=page_results, **options)
+    return result, {'page_plan': report.get('page_plan'), 'redaction': report.get('redaction')}
+
+
+def load_flask_session(request):
+    """Flaskのセッションクッキーを読み込む（Flask版と同じ署名で検証）"""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not cookie:
+        return {}
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+        return serializer.loads(cookie, max_age=max_age)
+    except Exception:
+        return {}
+
+
+def get_company_from_request(request, profile_id=None):
+    """会社情報とフッターアセットを取得（プロフィール指定 → セッションのプロフィール → 旧形式セッション）
+
+    profile_id を指定してそのプロフィールが見つからない場合は (None, None)（Flask版と同じくエラーにする）
+    """
+    session_data = load_flask_session(request)
+    requested_profile_id = profile_id
+    profile_id = profile_id or session_data.get('profile_id')
+    profile = None
+    if company_model is not None and profile_id:
+        try:
+            profile = company_model.get(profile_id)
+        except Exception as e:
+            logger.warning(f"会社プロフィール取得エラー: {e}")
+    if profile:
+        return profile['company_info'], profile['footer_assets']
+    if requested_profile_id:
+        return None, None
+    return session_data.get('company_info', {}), None
+
+
+async def detect_footer_region_with_claude_async(pdf_data, page_num=0):
+    """Claude APIを使用したフッター領域検出（非同期・タイムアウト・同時実行数制限付き）"""
+    if not ASYNC_CLAUDE_AVAILABLE:
+        logger.warning("Claude API利用不可、大きめのデフォルト領域を使用")
+        return CLAUDE_UNAVAILABLE_REGION.copy()
+
+    try:
+        text_content = await run_cpu(extract_text_for_claude, pdf_data, page_num)
+
+        try:
+            acquired = await acquire_slot(claude_pool)
+        except Saturated:
+            logger.warning("🚦 Claude API呼び出しが混雑、大きめのデフォルト領域を使用")
+            return CLAUDE_UNAVAILABLE_REGION.copy()
+        try:
+            response = await asyncio.wait_for(
+                async_claude_client.messages.create(
+                    model=CLAUDE_MODEL,
+                    max_tokens=1500,
+                    temperature=0.1,
+                    messages=build_claude_footer_messages(text_content)
+                ),
+                timeout=CLAUDE_TIMEOUT
+            )
+        finally:
+            claude_pool.release(acquired)
+
+        return parse_claude_footer_response(response.content[0].text)
+
+    except asyncio.TimeoutError:
+        logger.error(f"Claude API タイムアウト（{CLAUDE_TIMEOUT}秒）")
+        return None
+    except Exception as e:
+        logger.error(f"Claude API エラー: {str(e)}")
+        return None
+
+
+async def detect_global_footer_region_async(pdf_data, progress=None, page_num=0, page_result=None):
+    """detect_global_footer_region の非同期版（精密検出はプロセスプール、Claudeは非同期）
+
+    page_num: 基準にするページ（Flask版と同じく、変換するページ計画の先頭ページ）
+    page_result: そのページの精密検出結果が既にあれば渡す（同じページを2回解析しない）
+    """
+    try:
+        if page_result is not None:
+            global_footer_region = dict(page_result)
+        else:
+            global_footer_region = await run_cpu(detect_footer_with_pdfplumber, pdf_data, page_num)
+        logger.info(f"🎯 pdfplumber検出結果: {global_footer_region}")
+    except Exception as detection_error:
+        logger.error(f"❌ 精密検出エラー: {str(detection_error)}")
+        if progress:
+            progress('claude_fallback', status='start')
+        claude_result = await detect_footer_region_with_claude_async(pdf_data, page_num)
+        if progress:
+            # 精密検出の結果が無いため、置き換えた（adopted）ことにはしない
+            progress('claude_fallback', status='done', adopted=False)
+        return claude_result or {'bottom_height': 40, 'confidence': 70}
+
+    # 信頼度が低い場合はClaude APIを併用
+    if global_footer_region.get('confidence', 0) < CLAUDE_CONFIDENCE_THRESHOLD:
+        logger.info("信頼度が低いため、Claude APIも併用")
+        if progress:
+            progress('claude_fallback', status='start')
+        claude_result = await detect_footer_region_with_claude_async(pdf_data, page_num)
+        adopted = bool(claude_result and claude_result.get('confidence', 0) > global_footer_region.get('confidence', 0))
+        if adopted:
+            global_footer_region = claude_result
+            logger.info("Claude API結果を採用")
+        if progress:
+            progress('claude_fallback', status='done', adopted=adopted)
+
+    return global_footer_region
+
+
+async def read_pdf_upload(request):
+    """multipartフォームからPDFを取り出す（エラー時は (None, form, エラーレスポンス)）"""
+    content_length = int(request.headers.get('content-length') or 0)
+    if content_length > flask_app.config['MAX_CONTENT_LENGTH']:
+        return None, None, json_response(
+            {'status': 'error', 'message': 'ファイルサイズが大きすぎます（最大16MB）'}, status_code=413
+        )
+    form = await request.form()
+    file = form.get('pdf_file')
+    if file is None or isinstance(file, str) or not file.filename:
+        return None, form, json_response({'status': 'error', 'message': 'ファイルが選択されていません'})
+    if not allowed_file(file.filename):
+        return None, form, json_response({'status': 'error', 'message': 'PDFファイルのみ許可されています'})
+    return file, form, None
+
+
+async def process_pdf_simple(request):
+    """シンプルなPDF処理 - フッター検出と会社名変換（非同期版）"""
+    try:
+        file, form, error_response = await read_pdf_upload(request)
+        if error_response:
+            return error_response
+
+        company_info, footer_assets = get_company_from_request(request, form.get('profile_id'))
+        if company_info is None:
+            return json_response({'status': 'error', 'message': '指定された会社プロフィールが見つかりません'})
+        if not company_info:
+            return json_response({
+                'status': 'error',
+                'message': '会社情報が設定されていません。先に会社情報を設定してください。'
+            })
+
+        try:
+            options = conversion_options(form)
+        except ValueError as e:
+            return json_response({'status': 'error', 'message': str(e)})
+
+        file_data = await file.read()
+        if len(file_data) == 0:
+            return json_response({'status': 'error', 'message': 'ファイルデータが空です'})
+
+        # 重複照合（シグネチャ作成はプール内、インデックス照合はこのプロセスで行う）
+        signature = await run_cpu(duplicate_signature, file_data)
+        content_key, signature, duplicate = find_duplicate(file_data, signature)
+        if duplicate and form.get('on_duplicate') == 'skip':
+            return json_response({
+                'status': 'duplicate',
+                'message': f"既に処理済みのマイソクとほぼ同じ内容です: {duplicate['meta'].get('filename')}",
+                'duplicate': duplicate_summary(duplicate)
+            })
+
+        # 進捗通知（プロセスプール内のページ単位イベントは届かないため段階単位で配信）
+        progress = progress_hub.reporter(form.get('job_id'))
+        try:
+            if progress:
+                progress('parsed', bytes=len(file_data))
+            page_num = await run_cpu(reference_page, file_data, options.get('page_mode'),
+                                     options.get('page_ranges'), options.get('sample_count'))
+            page_results = None
+            if page_num is None:
+                footer_region = {'bottom_height': 0, 'confidence': 100, 'reason': '変換するページなし'}
+            else:
+                # 基準ページの検出結果は変換時のページ個別検出にも使う（Flask版と同じく同じページを2回解析しない）
+                page_result = await run_cpu(detect_footer_with_pdfplumber, file_data, page_num,
+                                            options['redaction'] == 'regions')
+                page_results = {page_num: page_result}
+                footer_region = await detect_global_footer_region_async(file_data, progress=progress,
+                                                                        page_num=page_num, page_result=page_result)
+            converted_pdf, conversion_report = await run_cpu(convert_with_report, file_data, company_info,
+                                                             footer_region, footer_assets, options, page_results)
+
+            if converted_pdf and len(converted_pdf) > 0:
+                if progress:
+                    progress('written', bytes=len(converted_pdf))
+                    progress('done', bytes=len(converted_pdf))
+                register_duplicate(content_key, signature, secure_filename(file.filename))
+                return json_response({
+                    'status': 'success',
+                    'message': 'PDF変換が完了しました',
+                    'pdf_data': base64.b64encode(converted_pdf).decode('utf-8'),
+                    'filename': f"converted_{secure_filename(file.filename)}",
+                    'duplicate': duplicate_summary(duplicate),
+                    **conversion_report
+                })
+            if progress:
+                progress('error', message='PDF変換に失敗しました')
+            return json_response({'status': 'error', 'message': 'PDF変換に失敗しました'})
+
+        except Exception as e:
+            logger.error(f"PDF変換処理エラー: {str(e)}")
+            if progress:
+                progress('error', message=str(e))
+            return json_response({'status': 'error', 'message': f'PDF変換エラー: {str(e)}'})
+
+    except Exception as e:
+        logger.error(f"予期しないエラー: {str(e)}")
+        return json_response({'status': 'error', 'message': f'システムエラー: {str(e)}'})
+
+
+async def upload_pdf(request):
+    """PDFアップロード・物件データ抽出（非同期版）"""
+    try:
+        file, form, error_response = await read_pdf_upload(request)
+        if error_response:
+            return error_response
+
+        file_data = await file.read()
+        signature = await run_cpu(duplicate_signature, file_data)
+        content_key, signature, duplicate = find_duplicate(file_data, signature)
+        if duplicate and form.get('on_duplicate') == 'reuse' and duplicate['meta'].get('extracted_data'):
+            return json_response({
+                'status': 'success',
+                'file_id': uuid.uuid4().hex,
+                'filename': secure_filename(file.filename),
+                'extracted_data': duplicate['meta']['extracted_data'],
+                'raw_text': '',
+                'duplicate': duplicate_summary(duplicate),
+                'reused': True
+            })
+
+        text = await run_cpu(extract_text_from_pdf, file_data)
+        if not text.strip():
+            return json_response({'status': 'error', 'message': 'PDFからテキストを抽出できませんでした'})
+
+        property_data = parse_property_data(text)
+        register_duplicate(content_key, signature, secure_filename(file.filename), extracted_data=property_data)
+        return json_response({
+            'status': 'success',
+            'file_id': uuid.uuid4().hex,
+            'filename': secure_filename(file.filename),
+            'extracted_data': property_data,
+            'raw_text': text[:500] + '...' if len(text) > 500 else text,
+            'duplicate': duplicate_summary(duplicate)
+        })
+
+    except Exception as e:
+        return json_response({'status': 'error', 'message': f'エラーが発生しました: {str(e)}'})
+
+
+async def generate_mysouku(request):
+    """マイソク生成（非同期版）"""
+    try:
+        try:
+            data = await request.json()
+        except Exception:
+            data = None
+        if not data:
+            return json_response({'status': 'error', 'message': '無効なデータです'})
+
+        company_info, _ = get_company_from_request(request)
+        if not company_info:
+            return json_response({
+                'status': 'error',
+                'message': '会社情報が設定されていません。先に会社情報を設定してください。'
+            })
+
+        pdf_data = await run_cpu(generate_simple_mysouku, data.get('property_data', {}), company_info)
+        if pdf_data:
+            return json_response({
+                'status': 'success',
+                'message': 'マイソクを生成しました',
+                'pdf_data': base64.b64encode(pdf_data).decode('utf-8'),
+                'filename': f"mysouku_{data.get('file_id')}.pdf"
+            })
+        return json_response({'status': 'error', 'message': 'マイソク生成に失敗しました'})
+
+    except Exception as e:
+        return json_response({'status': 'error', 'message': f'エラーが発生しました: {str(e)}'})
+
+
+async def test_pdfplumber_detection(request):
+    """pdfplumber高精度検出テスト（非同期版）"""
+    try:
+        form = await request.form()
+        file = form.get('pdf_file')
+        if file is None or isinstance(file, str):
+            return json_response({'status': 'error', 'message': 'ファイルなし'})
+        if not file.filename:
+            return json_response({'status': 'error', 'message': 'ファイル選択なし'})
+
+        file_data = await file.read()
+        result = await run_cpu(detect_footer_with_pdfplumber, file_data, 0)
+        return json_response({
+            'status': 'success',
+            'message': 'pdfplumber高精度検出成功',
+            'detection_result': result,
+            'file_size': len(file_data)
+        })
+
+    except Exception as e:
+        return json_response({'status': 'error', 'message': f'pdfplumber検出エラー: {str(e)}'})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global cpu_executor
+    cpu_executor = ProcessPoolExecutor(max_workers=ASYNC_CPU_WORKERS)
+    logger.info(f"非同期モード起動: PDF処理{ASYNC_CPU_WORKERS}プロセス、Claude同時{CLAUDE_MAX_CONCURRENCY}件")
+    try:
+        yield
+    finally:
+        cpu_executor.shutdown(wait=False, cancel_futures=True)
+        if async_claude_client is not None:
+            await async_claude_client.close()
+
+
+asgi_app = Starlette(
+    routes=[
+        Route('/process_pdf_simple', admission_limited(process_pdf_simple), methods=['POST']),
+        Route('/upload_pdf', admission_limited(upload_pdf), methods=['POST']),
+        Route('/generate_mysouku', admission_limited(generate_mysouku), methods=['POST']),
+        Route('/test_pdfplumber_detection', test_pdfplumber_detection, methods=['POST']),
+        # その他のルート（画面・会社設定等）はFlaskアプリで処理
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan,
+)
+
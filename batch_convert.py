@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+マイソク一括変換 コマンドラインツール
+
+ディレクトリ配下のPDFを convert_pdf_footer でまとめて変換し、入力と同じ構成で出力する。
+Webサーバーを経由せず、プロセスプールで並列に処理する。
+
+- 出力は一時ファイルに書いてから置き換えるため、中断しても壊れたPDFは残らない
+- マニフェスト（JSON Lines、入力ハッシュ → 状態・所要時間・検出結果）を追記し、
+  中断後に再実行すると完了済みのファイルを飛ばして続きから処理する
+  （会社情報・変換オプションが前回と異なるファイルは飛ばさずに変換し直す）
+- 最後にスループットの集計を表示する
+
+    python batch_convert.py archive/ converted/ --company company.json --workers 4
+    python batch_convert.py archive/ converted/ --profile-id <プロフィールID>
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+MANIFEST_NAME = '.batch_manifest.jsonl'
+HASH_CHUNK_SIZE = 1024 * 1024
+# オプション未指定時に変換結果を決める設定値（app.py が環境変数から読む）
+DEFAULT_SETTING_NAMES = ('OUTPUT_WRITE_MODE', 'PAGE_MODE', 'PAGE_SAMPLE_COUNT', 'REDACTION_GEOMETRY')
+
+# ワーカープロセスごとに1回だけ設定する変換条件
+_worker_options = None
+
+
+def file_hash(path):
+    """入力ファイルの内容ハッシュ（SHA-1）"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_pdfs(input_dir):
+    """入力ディレクトリ配下のPDFを相対パス順に列挙"""
+    paths = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith('.pdf'):
+                paths.append(os.path.join(root, name))
+    return paths
+
+
+def settings_hash(options):
+    """出力に影響する条件（会社情報・フッターアセット・変換オプション・既定の設定値）のハッシュ"""
+    footer_assets = options['footer_assets'] or {}
+    settings = {
+        'company_info': options['company_info'],
+        'footer_assets': footer_assets.get('fingerprint'),
+        'optimize': options['optimize'],
+        'write_mode': options['write_mode'],
+        'page_options': options['page_options'],
+        'defaults': {name: os.environ.get(name) for name in DEFAULT_SETTING_NAMES},
+    }
+    encoded = json.dumps(settings, ensure_ascii=False, sort_keys=True, default=list).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def load_manifest(manifest_path):
+    """マニフェストを読み込み、入力ハッシュごとの最新の記録を返す（途中で切れた最終行は無視）"""
+    entries = {}
+    if not os.path.exists(manifest_path):
+        return entries
+    with open(manifest_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[entry.get('input_hash')] = entry
+    return entries
+
+
+def atomic_write(path, data):
+    """同じディレクトリの一時ファイルに書いてから置き換える"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def load_company(args):
+    """会社情報と事前計算済みフッターアセットを取得"""
+    if args.company:
+        from utils.footer_layout import build_footer_assets
+        with open(args.company, encoding='utf-8') as f:
+            company_info = json.load(f)
+        return company_info, build_footer_assets(company_info)
+    from models.company import CompanyModel
+    profile = CompanyModel().get(args.profile_id)
+    if not profile:
+        raise SystemExit(f"✗ 会社プロフィールが見つかりません: {args.profile_id}")
+    return profile['company_info'], profile['footer_assets']
+
+
+def init_worker(options):
+    """ワーカー初期化: ログを抑え、変換条件を保持（appの読み込みもここで1回だけ）"""
+    global _worker_options
+    logging.disable(options['log_level'])
+    import app  # noqa: F401  フォント登録・設定読み込みをワーカー起動時に済ませる
+    _worker_options = options
+
+
+def convert_one(input_path, output_path, input_hash):
+    """1ファイルを変換して出力し、マニフェストに記録する内容を返す"""
+    from app import convert_pdf_footer
+
+    options = _worker_options
+    started = time.perf_counter()
+    entry = {'input_hash': input_hash, 'settings_hash': options['settings_hash'],
+             'input': input_path, 'output': output_path}
+    try:
+        with open(input_path, 'rb') as f:
+            pdf_data = f.read()
+        report = {}
+        result = convert_pdf_footer(pdf_data, options['company_info'], detect_workers=1,
+                                    footer_assets=options['footer_assets'], optimize=options['optimize'],
+                                    report=report, write_mode=options['write_mode'], **options['page_options'])
+        if not result:
+            raise RuntimeError('PDF変換に失敗しました')
+        atomic_write(output_path, result)
+
+        region = report.get('footer_region') or {}
+        entry.update({
+            'status': 'done',
+            'pages': report.get('pages'),
+            'bytes_in': len(pdf_data),
+            'bytes_out': len(result),
+            'detection': {
+                'bottom_height': region.get('bottom_height'),
+                'confidence': region.get('confidence'),
+                'method': region.get('method'),
+                'page_heights_mm': report.get('page_footer_heights_mm'),
+                'page_plan': report.get('page_plan'),
+                'painted_area_ratio': (report.get('redaction') or {}).get('painted_area_ratio'),
+            },
+        })
+    except Exception as e:
+        entry.update({'status': 'failed', 'error': str(e)})
+    entry['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    entry['finished_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    return entry
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def print_summary(results, skipped, wall_seconds):
+    done = [entry for entry in results if entry['status'] == 'done']
+    failed = [entry for entry in results if entry['status'] != 'done']
+    bytes_in = sum(entry.get('bytes_in', 0) for entry in done)
+    pages = sum(entry.get('pages') or 0 for entry in done)
+
+    print("=" * 50)
+    print(f"変換: {len(done)}件 / 失敗: {len(failed)}件 / スキップ（記録済み）: {skipped}件")
+    print(f"経過時間: {wall_seconds:.1f}秒")
+    if done and wall_seconds > 0:
+        latencies = [entry['elapsed_ms'] for entry in done]
+        print(f"スループット: {len(done) / wall_seconds:.2f}件/秒, {pages / wall_seconds:.1f}ページ/秒, "
+              f"{bytes_in / 1e6 / wall_seconds:.2f}MB/秒")
+        print(f"1件あたり: 中央値 {percentile(latencies, 50):.0f}ms, p95 {percentile(latencies, 95):.0f}ms, "
+              f"最大 {max(latencies):.0f}ms")
+    for entry in failed[:10]:
+        print(f"✗ {entry['input']}: {entry.get('error')}")
+    if len(failed) > 10:
+        print(f"  ほか{len(failed) - 10}件（マニフェスト参照）")
+    print("=" * 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='マイソクPDFの一括変換（会社情報フッターの差し替え）')
+    parser.add_argument('input_dir', help='変換元PDFのディレクトリ（サブディレクトリも対象）')
+    parser.add_argument('output_dir', help='出力先ディレクトリ（入力と同じ構成で出力）')
+    company = parser.add_mutually_exclusive_group(required=True)
+    company.add_argument('--company', help='会社情報のJSONファイル（company_name, address, phone 等）')
+    company.add_argument('--profile-id', help='会社プロフィールID（COMPANY_DB_PATH のDBから取得）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='並列プロセス数（1で逐次処理）')
+    parser.add_argument('--manifest', help=f'マニフェストのパス（既定: 出力先/{MANIFEST_NAME}）')
+    parser.add_argument('--retry-failed', action='store_true', help='前回失敗したファイルも再処理する')
+    parser.add_argument('--write-mode', choices=['full', 'incremental'], default=None,
+                        help='出力方式（既定: OUTPUT_WRITE_MODE の設定値）')
+    parser.add_argument('--optimize', action='store_true', help='出力PDFを最適化する')
+    parser.add_argument('--page-mode', choices=['all', 'first', 'ranges', 'sample'], default=None,
+                        help='検出するページ（first: 1ページ目の結果を全ページに適用 / ranges: --page-ranges のみ変換 / '
+                             'sample: --sample-pages ページだけ検出して間を補う。既定: PAGE_MODE の設定値）')
+    parser.add_argument('--page-ranges', help='変換するページ範囲（例: 1-3,5）')
+    parser.add_argument('--sample-pages', type=int, help='sample モードで検出するページ数')
+    parser.add_argument('--redaction', choices=['band', 'regions'], default=None,
+                        help='白塗り範囲（band: 下部の全幅の帯 / regions: 事業者情報のまとまりごと。既定: REDACTION_GEOMETRY の設定値）')
+    parser.add_argument('--verbose', action='store_true', help='変換処理のログを表示する')
+    args = parser.parse_args()
+
+    input_dir = os.path.abspath(args.input_dir)
+    output_dir = os.path.abspath(args.output_dir)
+    manifest_path = args.manifest or os.path.join(output_dir, MANIFEST_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+
+    company_info, footer_assets = load_company(args)
+    page_options = {'page_mode': args.page_mode, 'sample_count': args.sample_pages, 'redaction': args.redaction}
+    if args.page_mode == 'ranges':
+        from utils.page_modes import parse_page_ranges
+        try:
+            page_options['page_ranges'] = parse_page_ranges(args.page_ranges)
+        except ValueError as e:
+            raise SystemExit(f"✗ {e}")
+    options = {
+        'company_info': company_info,
+        'footer_assets': footer_assets,
+        'optimize': args.optimize,
+        'write_mode': args.write_mode,
+        'page_options': page_options,
+        # 失敗の内容はマニフェストに残るので、既定では変換処理のログ（エラーを含む）を出さない
+        'log_level': logging.NOTSET if args.verbose else logging.ERROR,
+    }
+    options['settings_hash'] = settings_hash(options)
+
+    # 未処理のファイルを決める（内容ハッシュで完了済みを判定、会社情報・オプションが異なる記録は未処理扱い）
+    manifest = load_manifest(manifest_path)
+    tasks = []
+    skipped = 0
+    changed = 0
+    for input_path in find_pdfs(input_dir):
+        output_path = os.path.join(output_dir, os.path.relpath(input_path, input_dir))
+        input_hash = file_hash(input_path)
+        entry = manifest.get(input_hash)
+        status = entry.get('status') if entry else None
+        if status and entry.get('settings_hash') != options['settings_hash']:
+            changed += 1
+            status = None
+        if (status == 'done' and os.path.exists(output_path)) or (status == 'failed' and not args.retry_failed):
+            skipped += 1
+            continue
+        tasks.append((input_path, output_path, input_hash))
+
+    print(f"対象: {len(tasks) + skipped}件（未処理 {len(tasks)}件 / 記録済み {skipped}件"
+          f"{f' / 条件変更で再変換 {changed}件' if changed else ''}）, ワーカー: {args.workers}")
+
+    results = []
+    interrupted = False
+    started = time.perf_counter()
+    with open(manifest_path, 'a', encoding='utf-8') as manifest_file:
+        def record(entry):
+            results.append(entry)
+            manifest_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            manifest_file.flush()
+            mark = '✓' if entry['status'] == 'done' else '✗'
+            print(f"{mark} [{len(results)}/{len(tasks)}] {os.path.relpath(entry['input'], input_dir)} "
+                  f"({entry['elapsed_ms']:.0f}ms)")
+
+        try:
+            if args.workers <= 1:
+                init_worker(options)
+                for task in tasks:
+                    record(convert_one(*task))
+            else:
+                with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                         initargs=(options,)) as executor:
+                    futures = [executor.submit(convert_one, *task) for task in tasks]
+                    try:
+                        for future in as_completed(futures):
+                            record(future.result())
+                    except KeyboardInterrupt:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        raise
+        except KeyboardInterrupt:
+            interrupted = True
+            print("\n中断しました（再実行すると続きから処理します）")
+
+    print_summary(results, skipped, time.perf_counter() - started)
+    if interrupted:
+        sys.exit(130)
+    sys.exit(1 if any(entry['status'] != 'done' for entry in results) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+非同期サービングモード（asgi.py）の同時リクエスト負荷テスト
+
+ローカルにClaude APIのスタブ（応答遅延を指定可能）を立て、テキストレイヤーもフッターもない
+サンプルPDFで /process_pdf_simple を叩く（画像ベース検出の信頼度が低く、必ずClaudeフォールバックが発生する）。
+同時接続数ごとのスループットとレイテンシを表示する。
+
+    pip install -r requirements-async.txt
+    python benchmarks/bench_async_load.py --requests 64 --concurrency 1 8 32 --claude-delay 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_claude_stub(port, delay):
+    """Messages APIを模したスタブサーバーをバックグラウンドスレッドで起動"""
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    async def messages(request):
+        await asyncio.sleep(delay)
+        body = {'footer_detected': True, 'bottom_height': 28, 'confidence': 80, 'reason': 'stub'}
+        return JSONResponse({
+            'id': 'msg_stub',
+            'type': 'message',
+            'role': 'assistant',
+            'model': 'stub',
+            'content': [{'type': 'text', 'text': json.dumps(body)}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': {'input_tokens': 1, 'output_tokens': 1},
+        })
+
+    stub = Starlette(routes=[Route('/v1/messages', messages, methods=['POST'])])
+    server = uvicorn.Server(uvicorn.Config(stub, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_level(client, pdf_data, cookie, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                '/process_pdf_simple',
+                files={'pdf_file': ('sample.pdf', pdf_data, 'application/pdf')},
+                cookies={'session': cookie},
+            )
+            latencies.append(time.perf_counter() - start)
+            assert response.json()['status'] == 'success', response.text[:200]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start, latencies
+
+
+async def main_async(args):
+    import httpx
+    import asgi
+    from utils.sample_pdf import build_sample_mysouku
+
+    serializer = asgi.flask_app.session_interface.get_signing_serializer(asgi.flask_app)
+    cookie = serializer.dumps({'company_info': {'company_name': '負荷試験不動産', 'phone': '03-0000-0000'}})
+    pdf_data = build_sample_mysouku(pages=args.pages, with_text=False, with_footer=False)
+
+    async with asgi.lifespan(asgi.asgi_app):
+        transport = httpx.ASGITransport(app=asgi.asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test', timeout=300) as client:
+            # ウォームアップ（プロセスプール起動・フォント登録）
+            await run_level(client, pdf_data, cookie, asgi.ASYNC_CPU_WORKERS, asgi.ASYNC_CPU_WORKERS)
+
+            print(f"CPU workers: {asgi.ASYNC_CPU_WORKERS}, Claude concurrency: {asgi.CLAUDE_MAX_CONCURRENCY}, "
+                  f"Claude stub delay: {args.claude_delay}s, pages: {args.pages}")
+            print(f"{'conc':>5} {'reqs':>5} {'time(s)':>8} {'req/s':>7} {'p50(s)':>7} {'p95(s)':>7} {'max(s)':>7}")
+            for concurrency in args.concurrency:
+                elapsed, latencies = await run_level(client, pdf_data, cookie, args.requests, concurrency)
+                print(f"{concurrency:>5} {args.requests:>5} {elapsed:>8.2f} {args.requests / elapsed:>7.2f} "
+                      f"{statistics.median(latencies):>7.2f} {percentile(latencies, 95):>7.2f} "
+                      f"{max(latencies):>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='非同期モード負荷テスト（Claudeスタブ使用）')
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--claude-delay', type=float, default=1.0, help='スタブの応答遅延（秒）')
+    parser.add_argument('--pages', type=int, default=1)
+    args = parser.parse_args()
+
+    port = free_port()
+    start_claude_stub(port, args.claude_delay)
+    # asgi/app のインポート前にスタブへ向ける
+    os.environ['CLAUDE_API_KEY'] = 'stub-key'
+    os.environ['CLAUDE_API_BASE_URL'] = f'http://127.0.0.1:{port}'
+    logging.disable(logging.WARNING)
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
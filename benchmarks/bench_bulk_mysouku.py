@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+簡易マイソク一括生成のスループットベンチマーク
+
+物件ごとに generate_simple_mysouku を呼ぶ場合（1物件1ビルド）と、
+build_mysouku_pdf で全物件を1回のビルドにまとめる場合の1物件あたりの時間を比較する。
+/generate_mysouku_bulk に JSON Lines を送った場合（解析・base64化込み）も計測する。
+
+    python benchmarks/bench_bulk_mysouku.py --records 1000
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, generate_simple_mysouku  # noqa: E402
+from utils.mysouku_builder import build_mysouku_pdf, get_mysouku_styles  # noqa: E402
+
+COMPANY_INFO = {
+    'company_name': 'ベンチマーク不動産株式会社',
+    'address': '東京都千代田区丸の内1-1-1',
+    'phone': '03-0000-0000',
+    'license_number': '東京都知事(1)第00000号',
+}
+
+
+def sample_records(count):
+    return [{
+        'property_type': 'マンション',
+        'transaction_type': '賃貸',
+        'price': f'{10 + index % 20}.5万円',
+        'address': f'東京都渋谷区神宮前{index % 6 + 1}-{index % 30 + 1}-{index % 9 + 1}',
+        'floor_plan': ('1K', '1LDK', '2LDK', '3LDK')[index % 4],
+        'building_age': f'{index % 40}年',
+    } for index in range(count)]
+
+
+def report(label, count, elapsed, size):
+    print(f"{label:<28} {count:>6} {elapsed:>9.2f} {elapsed * 1000 / count:>10.2f} "
+          f"{count / elapsed:>9.0f} {size / 1e6:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='簡易マイソク一括生成ベンチマーク')
+    parser.add_argument('--records', type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    records = sample_records(args.records)
+    get_mysouku_styles()  # フォント登録はウォームアップ扱い
+
+    print(f"{'mode':<28} {'recs':>6} {'time(s)':>9} {'ms/rec':>10} {'rec/s':>9} {'MB':>9}")
+
+    start = time.perf_counter()
+    size = sum(len(generate_simple_mysouku(record, COMPANY_INFO)) for record in records)
+    report('per-property builds', args.records, time.perf_counter() - start, size)
+
+    start = time.perf_counter()
+    pdf_data, count = build_mysouku_pdf(records, COMPANY_INFO)
+    report('single bulk build', count, time.perf_counter() - start, len(pdf_data))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['company_info'] = COMPANY_INFO
+    body = '\n'.join(json.dumps(record, ensure_ascii=False) for record in records).encode('utf-8')
+    start = time.perf_counter()
+    result = client.post('/generate_mysouku_bulk', data=body, content_type='application/x-ndjson').get_json()
+    elapsed = time.perf_counter() - start
+    assert result['status'] == 'success', result.get('message')
+    report('/generate_mysouku_bulk (jsonl)', result['count'], elapsed, len(result['pdf_data']) * 3 / 4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+フッターキーワード照合のベンチマーク（従来のキーワードリスト / 共有の照合器）
+
+事業者フッターの行と物件情報の行をランダムに組み合わせたコーパスで、
+従来の `any(keyword in text ...)` による照合と utils.footer_keywords の照合
+（1行ずつ / 複数行をまとめて1回の走査）の所要時間と、フッター行とみなした件数を比較する。
+従来の detect_footer_on_page のように1文字ずつ照合した場合の件数も表示する。
+
+    python benchmarks/bench_footer_keywords.py --lines 10000 100000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.footer_keywords import FOOTER_LINE_MIN_SCORE, score_line, score_lines  # noqa: E402
+
+# app.py・app_new.py・redaction_regions.py にあったキーワードリストの和集合
+LEGACY_KEYWORDS = [
+    "株式会社", "有限会社", "合同会社", "宅建", "免許", "知事", "大臣",
+    "TEL", "FAX", "電話", "仲介", "媒介", "代理", "売主", "AD", "手数料",
+    "宅地建物取引業", "不動産", "賃貸", "売買",
+]
+LEGACY_PHONE_PATTERN = re.compile(r'\d{2,4}-\d{2,4}-\d{3,4}')
+
+PREFECTURES = ['東京都', '神奈川県', '大阪府', '北海道', '埼玉県', '千葉県', '福岡県']
+COMPANY_FORMS = ['株式会社{}', '{}株式会社', '有限会社{}', '㈱{}', '{}不動産']
+NAMES = ['サンプル', '青葉ハウジング', 'みどり住販', '東都リアルティ', '港南エステート']
+FOOTER_TEMPLATES = [
+    '{company} {pref}知事({n})第{num}号',
+    '国土交通大臣（{n}）第{num}号 {company}',
+    'TEL: {phone} / FAX: {phone}',
+    'ＴＥＬ ０３－{p4}－{p4}',
+    '取引態様: {deal} / AD: {ad}%',
+    '{company} 〒{zip} {pref}{city}{n}-{n}-{n}',
+    '手数料: {ad}% 広告料相談',
+]
+BODY_TEMPLATES = [
+    '賃料: {rent}万円 / 管理費: {fee}円',
+    '所在地: {pref}{city}{n}-{n}-{n}',
+    '交通: JR{line}線 {station}駅 徒歩{n}分',
+    '間取り: {n}LDK / 専有面積: {area}㎡',
+    '設備: オートロック、宅配ボックス、ADSL対応',
+    '賃貸マンション 築{n}年 RC造',
+    'ADDRESS: 1-2-3 Jingumae / READY TO MOVE',
+]
+
+
+def random_line(rng, templates):
+    phone = f"0{rng.randint(3, 99)}-{rng.randint(100, 9999)}-{rng.randint(1000, 9999)}"
+    return rng.choice(templates).format(
+        company=rng.choice(COMPANY_FORMS).format(rng.choice(NAMES)),
+        pref=rng.choice(PREFECTURES), city='中央区', n=rng.randint(1, 12), num=rng.randint(1000, 99999),
+        phone=phone, p4=''.join(chr(0xFF10 + int(d)) for d in str(rng.randint(1000, 9999))),
+        deal=rng.choice(['仲介', '媒介', '代理', '売主']), ad=rng.choice([50, 100, 200]),
+        zip=f"{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+        rent=round(rng.uniform(5, 30), 1), fee=rng.randint(0, 20) * 1000,
+        line=rng.choice(['山手', '中央', '京浜東北']), station=rng.choice(['原宿', '新宿', '品川']),
+        area=round(rng.uniform(20, 90), 2),
+    )
+
+
+def build_corpus(count, footer_ratio=0.3, seed=0):
+    """(行, フッター行か) のリスト"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        is_footer = rng.random() < footer_ratio
+        corpus.append((random_line(rng, FOOTER_TEMPLATES if is_footer else BODY_TEMPLATES), is_footer))
+    return corpus
+
+
+def legacy_match(lines):
+    return [any(keyword in line for keyword in LEGACY_KEYWORDS) or bool(LEGACY_PHONE_PATTERN.search(line))
+            for line in lines]
+
+
+def legacy_per_char(lines):
+    """従来の detect_footer_on_page（1文字ずつの照合）"""
+    return [any(any(keyword in char for keyword in LEGACY_KEYWORDS) for char in line) for line in lines]
+
+
+def matcher_per_line(lines):
+    return [score_line(line)[0] >= FOOTER_LINE_MIN_SCORE for line in lines]
+
+
+def matcher_batched(lines):
+    return [score >= FOOTER_LINE_MIN_SCORE for score, _ in score_lines(lines)]
+
+
+METHODS = [
+    ('従来（文字単位）', legacy_per_char),
+    ('従来（リスト）', legacy_match),
+    ('照合器（1行ずつ）', matcher_per_line),
+    ('照合器（まとめて）', matcher_batched),
+]
+
+
+def timed(func, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(lines)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='フッターキーワード照合のベンチマーク')
+    parser.add_argument('--lines', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--footer-ratio', type=float, default=0.3, help='コーパス中のフッター行の割合')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'行数':>8}  {'方式':<16}{'時間(ms)':>10}{'行/秒':>12}{'検出':>8}{'見逃し':>8}{'誤検出':>8}")
+    for count in args.lines:
+        corpus = build_corpus(count, args.footer_ratio)
+        lines = [line for line, _ in corpus]
+        for name, func in METHODS:
+            elapsed_ms, flags = timed(func, lines, args.repeat)
+            missed = sum(1 for flag, (_, is_footer) in zip(flags, corpus) if is_footer and not flag)
+            false_hits = sum(1 for flag, (_, is_footer) in zip(flags, corpus) if flag and not is_footer)
+            print(f"{count:>8}  {name:<16}{elapsed_ms:>10.1f}{count / (elapsed_ms / 1000):>12.0f}"
+                  f"{sum(flags):>8}{missed:>8}{false_hits:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+出力方式（全体の書き直し / 増分更新）の比較ベンチマーク
+
+写真（圧縮の効かないJPEG）を含むサンプルマイソクで convert_pdf_footer を実行し、
+出力段階の所要時間・出力サイズ・ピークメモリ（tracemalloc）を比較する。
+
+    python benchmarks/bench_incremental_write.py --pages 4 16 --photo-px 1200
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import convert_pdf_footer  # noqa: E402
+from utils.sample_pdf import build_sample_mysouku  # noqa: E402
+
+COMPANY_INFO = {'company_name': 'ベンチマーク不動産', 'phone': '03-0000-0000', 'address': '東京都千代田区1-1-1'}
+FOOTER_REGION = {'bottom_height': 30, 'confidence': 90, 'method': 'benchmark'}
+
+
+def run(pdf_data, write_mode, repeat, trace_memory):
+    """repeat回実行し、(最短の出力時間ms, 最短の全体時間s, 出力サイズ, ピークメモリMB) を返す"""
+    best_write = best_total = None
+    output_bytes = peak_mb = 0
+    for _ in range(repeat):
+        report = {}
+        start = time.perf_counter()
+        result = convert_pdf_footer(pdf_data, COMPANY_INFO, footer_region=FOOTER_REGION,
+                                    write_mode=write_mode, report=report)
+        total = time.perf_counter() - start
+        assert result is not None and report['write_mode'] == write_mode
+        best_write = report['write_ms'] if best_write is None else min(best_write, report['write_ms'])
+        best_total = total if best_total is None else min(best_total, total)
+        output_bytes = len(result)
+
+    if trace_memory:
+        tracemalloc.start()
+        convert_pdf_footer(pdf_data, COMPANY_INFO, footer_region=FOOTER_REGION, write_mode=write_mode)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return best_write, best_total, output_bytes, peak_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全体書き直しと増分更新の出力比較')
+    parser.add_argument('--pages', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--photo-px', type=int, default=1200, help='各ページの写真の一辺（ピクセル）')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='tracemallocによるピークメモリ計測を省略')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    print(f"{'pages':>6} {'input(MB)':>10} {'mode':>12} {'write(ms)':>10} {'total(s)':>9} "
+          f"{'output(MB)':>11} {'peak(MB)':>9}")
+    for page_count in args.pages:
+        pdf_data = build_sample_mysouku(pages=page_count, photo_px=args.photo_px)
+        for write_mode in ('full', 'incremental'):
+            write_ms, total, output_bytes, peak_mb = run(pdf_data, write_mode, args.repeat, not args.no_memory)
+            print(f"{page_count:>6} {len(pdf_data) / 1e6:>10.2f} {write_mode:>12} {write_ms:>10.1f} "
+                  f"{total:>9.2f} {output_bytes / 1e6:>11.2f} {peak_mb:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
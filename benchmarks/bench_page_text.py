@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+ページの文字・図形の保持方法（pdfplumber の page.chars 等 / utils.page_text.PageText）の比較ベンチマーク
+
+本文の密度を変えた1ページのサンプルPDFで、文字・図形を取り出す時間と、取り出した後も
+保持されるメモリ（tracemalloc）を比較する。PageText は直列化したサイズと復元時間、
+pdfplumber の extract_words と単語が一致するかも表示する。
+
+    python benchmarks/bench_page_text.py --body-repeat 3 10 30
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdfplumber  # noqa: E402
+
+from utils.page_text import PageText  # noqa: E402
+from utils.sample_pdf import build_sample_mysouku  # noqa: E402
+
+
+def retained(pdf_data, extract):
+    """新しく開いたページで extract(page) を実行し、(所要時間ms, 実行後も保持されるバイト数, 戻り値)"""
+    pdf = pdfplumber.open(BytesIO(pdf_data))
+    page = pdf.pages[0]
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = extract(page)
+    elapsed = (time.perf_counter() - started) * 1000
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pdf.close()
+    return elapsed, current, result
+
+
+def pdfplumber_objects(page):
+    return page.chars, page.lines, page.rects, page.curves, page.images
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ページの文字・図形の保持方法の比較')
+    parser.add_argument('--body-repeat', type=int, nargs='+', default=[3, 10, 30],
+                        help='1ページあたりの本文ブロック数（ページの密度）')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    # フォント・CMapの読み込み（プロセスで1回）を計測に含めないよう、先に1回ずつ実行しておく
+    warmup = build_sample_mysouku(pages=1)
+    retained(warmup, pdfplumber_objects)
+    retained(warmup, PageText.from_page)
+
+    print(f"{'文字数':>7} {'pdfplumber(ms)':>15} {'保持(KB)':>9} {'PageText(ms)':>13} {'保持(KB)':>9}"
+          f" {'比':>6} {'直列化(KB)':>11} {'復元(ms)':>9} {'単語一致':>8}")
+    for body_repeat in args.body_repeat:
+        pdf_data = build_sample_mysouku(pages=1, body_repeat=body_repeat, footer_layout='right_column')
+        plumber_ms, plumber_bytes, objects = retained(pdf_data, pdfplumber_objects)
+        text_ms, text_bytes, page_text = retained(pdf_data, PageText.from_page)
+
+        data = page_text.to_bytes()
+        started = time.perf_counter()
+        PageText.from_bytes(data)
+        restore_ms = (time.perf_counter() - started) * 1000
+
+        with pdfplumber.open(BytesIO(pdf_data)) as pdf:
+            expected = [(w['text'], round(w['x0'], 1), round(w['top'], 1)) for w in pdf.pages[0].extract_words()]
+        actual = [(w['text'], round(w['x0'], 1), round(w['top'], 1)) for w in page_text.words()]
+
+        print(f"{len(objects[0]):>7} {plumber_ms:>15.0f} {plumber_bytes / 1024:>9.0f} {text_ms:>13.0f}"
+              f" {text_bytes / 1024:>9.0f} {plumber_bytes / max(text_bytes, 1):>5.0f}x {len(data) / 1024:>11.1f}"
+              f" {restore_ms:>9.2f} {str(expected == actual):>8}")
+
+
+if __name__ == '__main__':
+    main()
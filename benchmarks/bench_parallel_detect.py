@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+ページ並列フッター検出のスケーリングベンチマーク
+
+ページ数 × ワーカー数ごとに detect_footers_for_pages の所要時間を計測し、
+逐次処理（workers=1）に対する速度向上率を表示する。
+
+    python benchmarks/bench_parallel_detect.py --pages 4 16 64 --workers 1 2 4 8
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, detect_footers_for_pages  # noqa: E402
+from utils.sample_pdf import build_sample_mysouku  # noqa: E402
+
+
+def measure(pdf_data, page_count, workers, repeat):
+    """repeat回実行した最短時間（秒）を返す"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = detect_footers_for_pages(pdf_data, range(page_count), workers=workers)
+        elapsed = time.perf_counter() - start
+        assert len(results) == page_count
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ページ並列フッター検出ベンチマーク')
+    parser.add_argument('--pages', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 4])
+    parser.add_argument('--body-repeat', type=int, default=6, help='1ページあたりの本文ブロック数（ページの密度）')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    app.config['DETECT_PARALLEL_MIN_PAGES'] = 1
+
+    worker_counts = sorted(set(args.workers))
+    print(f"CPU: {os.cpu_count()}")
+    print(f"{'pages':>6} {'workers':>8} {'time(s)':>9} {'ms/page':>8} {'speedup':>8}")
+    for page_count in args.pages:
+        pdf_data = build_sample_mysouku(pages=page_count, body_repeat=args.body_repeat)
+        baseline = None
+        for workers in worker_counts:
+            elapsed = measure(pdf_data, page_count, workers, args.repeat)
+            if baseline is None:
+                baseline = elapsed
+            print(f"{page_count:>6} {workers:>8} {elapsed:>9.3f} "
+                  f"{elapsed * 1000 / page_count:>8.1f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
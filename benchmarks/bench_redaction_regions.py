@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+白塗り範囲の単語クラスタリング（グリッド索引 / 総当たり）の比較ベンチマーク
+
+単語が密集したページを想定し、行に沿ってランダムに並べた単語の外接矩形を
+utils.redaction_regions.cluster_boxes（グリッド索引）と総当たりの比較でまとめ、
+所要時間と結果が一致することを確認する。
+
+    python benchmarks/bench_redaction_regions.py --words 200 1000 4000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.redaction_regions import (  # noqa: E402
+    REGION_HORIZONTAL_GAP, REGION_VERTICAL_GAP, _find, cluster_boxes,
+)
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+LINE_PITCH = 14
+
+
+def random_words(count, seed=0):
+    """ページに並ぶ単語の外接矩形（行に沿って配置、文字サイズ6〜10pt）"""
+    rng = random.Random(seed)
+    boxes = []
+    for _ in range(count):
+        size = rng.uniform(6, 10)
+        x0 = rng.uniform(0, PAGE_WIDTH - 60)
+        top = rng.randrange(0, PAGE_HEIGHT - LINE_PITCH, LINE_PITCH * rng.choice((1, 3)))
+        boxes.append((x0, top, x0 + rng.uniform(size, size * 4), top + size))
+    return boxes
+
+
+def cluster_pairwise(boxes):
+    """総当たりの比較でのクラスタリング（比較用）"""
+    parents = list(range(len(boxes)))
+    for index, (x0, top, x1, bottom) in enumerate(boxes):
+        for other in range(index + 1, len(boxes)):
+            ox0, otop, ox1, obottom = boxes[other]
+            gap_x = max(0, max(x0, ox0) - min(x1, ox1))
+            gap_y = max(0, max(top, otop) - min(bottom, obottom))
+            line_height = max(bottom - top, obottom - otop)
+            if gap_x <= line_height * REGION_HORIZONTAL_GAP and gap_y <= line_height * REGION_VERTICAL_GAP:
+                parents[_find(parents, index)] = _find(parents, other)
+    clusters = {}
+    for index in range(len(boxes)):
+        clusters.setdefault(_find(parents, index), []).append(index)
+    return list(clusters.values())
+
+
+def canonical(clusters):
+    return sorted(tuple(sorted(cluster)) for cluster in clusters)
+
+
+def timed(func, boxes, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(boxes)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='白塗り範囲の単語クラスタリングの比較')
+    parser.add_argument('--words', type=int, nargs='+', default=[200, 1000, 4000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'words':>6} {'grid(ms)':>9} {'pairwise(ms)':>13} {'clusters':>9} {'same':>5}")
+    for count in args.words:
+        boxes = random_words(count)
+        grid_ms, grid_clusters = timed(cluster_boxes, boxes, args.repeat)
+        pairwise_ms, pairwise_clusters = timed(cluster_pairwise, boxes, args.repeat)
+        same = canonical(grid_clusters) == canonical(pairwise_clusters)
+        print(f"{count:>6} {grid_ms:>9.1f} {pairwise_ms:>13.1f} {len(grid_clusters):>9} {str(same):>5}")
+
+
+if __name__ == '__main__':
+    main()
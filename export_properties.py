@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+物件データ一括抽出 コマンドラインツール
+
+ディレクトリ配下のPDFから物件データ（parse_property_data）を抽出し、
+JSON Lines / CSV / Parquet の1ファイルに固定スキーマで書き出す。
+
+- 抽出はプロセスプールで並列に行い、結果は入力順に1件ずつ書き込む
+- 同時に処理中のファイル数を上限で抑えるため、件数が増えてもメモリ使用量は一定
+- 出力は一時ファイルに書き、完了時に置き換える（取り込み側が書きかけを読まない）
+
+    python export_properties.py archive/ exports/properties.jsonl --workers 4
+    python export_properties.py archive/ exports/properties.parquet
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_convert import find_pdfs
+from utils.property_export import EXPORT_FORMATS, export_format_for, open_export_writer
+
+# ワーカー1つあたりの先行投入数（処理中＋完了待ちのファイル数の上限 = ワーカー数 × この値）
+INFLIGHT_PER_WORKER = 4
+
+
+def init_worker(log_level):
+    logging.disable(log_level)
+    if log_level:
+        warnings.simplefilter('ignore')
+    import app  # noqa: F401  ワーカー起動時に1回だけ読み込む
+
+
+def extract_record(input_path, input_dir):
+    """1ファイルから物件データを抽出してエクスポート用レコードを返す"""
+    from app import extract_text_from_pdf, parse_property_data
+
+    record = {
+        'source_path': os.path.relpath(input_path, input_dir),
+        'extracted_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    try:
+        with open(input_path, 'rb') as f:
+            file_data = f.read()
+        record['source_hash'] = hashlib.sha1(file_data).hexdigest()
+        record['bytes'] = len(file_data)
+
+        def progress(stage, **data):
+            if stage == 'parsed':
+                record['pages'] = data.get('total')
+
+        text = extract_text_from_pdf(file_data, progress=progress)
+        record['text_chars'] = len(text)
+        if not text.strip():
+            record['error'] = 'PDFからテキストを抽出できませんでした'
+        else:
+            record.update(parse_property_data(text))
+    except Exception as e:
+        record['error'] = str(e)
+    return record
+
+
+def iter_records(paths, input_dir, workers, log_level):
+    """抽出結果を入力順に返す（先行投入数を制限して結果を溜め込まない）"""
+    if workers <= 1:
+        init_worker(log_level)
+        for path in paths:
+            yield extract_record(path, input_dir)
+        return
+
+    limit = workers * INFLIGHT_PER_WORKER
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(log_level,)) as executor:
+        pending = deque()
+        try:
+            for path in paths:
+                pending.append(executor.submit(extract_record, path, input_dir))
+                if len(pending) >= limit:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description='マイソクPDFから物件データを一括抽出してファイルに書き出す')
+    parser.add_argument('input_dir', help='PDFのディレクトリ（サブディレクトリも対象）')
+    parser.add_argument('output', help='出力ファイル（.jsonl / .csv / .parquet）')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, help='出力形式（既定: 拡張子から判定）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='並列プロセス数（1で逐次処理）')
+    parser.add_argument('--verbose', action='store_true', help='抽出処理のログを表示する')
+    args = parser.parse_args()
+
+    try:
+        export_format = export_format_for(args.output, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    input_dir = os.path.abspath(args.input_dir)
+    paths = find_pdfs(input_dir)
+    log_level = logging.NOTSET if args.verbose else logging.ERROR
+    print(f"対象: {len(paths)}件, 形式: {export_format}, ワーカー: {args.workers}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    temp_path = f"{args.output}.tmp"
+    try:
+        writer = open_export_writer(temp_path, export_format)
+    except RuntimeError as e:
+        sys.exit(f"✗ {e}")
+    started = time.perf_counter()
+    count = failed = pages = 0
+    try:
+        for record in iter_records(paths, input_dir, args.workers, log_level):
+            writer.write(record)
+            count += 1
+            pages += record.get('pages') or 0
+            if record.get('error'):
+                failed += 1
+                print(f"✗ {record['source_path']}: {record['error']}")
+            if count % 100 == 0:
+                print(f"  {count}/{len(paths)}件")
+        writer.close()
+    except BaseException:
+        writer.close()
+        os.unlink(temp_path)
+        print("\n✗ 中断しました（出力ファイルは作成していません）")
+        raise
+    os.replace(temp_path, args.output)
+
+    elapsed = time.perf_counter() - started
+    print("=" * 50)
+    print(f"出力: {args.output}（{count}件, 抽出失敗 {failed}件）")
+    if elapsed > 0:
+        print(f"経過時間: {elapsed:.1f}秒, {count / elapsed:.2f}件/秒, {pages / elapsed:.1f}ページ/秒")
+    print("=" * 50)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""マイソク変換システムのデータモデル"""
@@ -0,0 +1,111 @@
+"""
+会社情報（支店プロフィール）のSQLiteストア
+
+プロフィールIDで会社情報を管理し、保存時にフッター描画用アセット
+（フォント・文字列幅・配置パラメータ）を事前計算して一緒に保存する。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils.footer_layout import build_footer_assets, is_valid_footer_assets
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.environ.get('COMPANY_DB_PATH', 'company.db')
+
+COMPANY_FIELDS = [
+    'company_name', 'company_name_kana', 'postal_code', 'address', 'phone', 'fax',
+    'email', 'website', 'license_number', 'representative_name',
+]
+
+
+class CompanyModel:
+    """会社情報プロフィールの保存・取得"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS company_profiles (
+                    profile_id TEXT PRIMARY KEY,
+                    company_name TEXT NOT NULL DEFAULT '',
+                    company_info TEXT NOT NULL,
+                    footer_assets TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+
+    def save(self, company_info, profile_id=None):
+        """プロフィールを保存（フッターアセットを事前計算）してプロフィールIDを返す"""
+        profile_id = profile_id or uuid.uuid4().hex
+        company_info = {field: company_info.get(field, '') for field in COMPANY_FIELDS}
+        assets = build_footer_assets(company_info)
+        now = time.time()
+
+        with self._lock, self._connect() as conn:
+            conn.execute('''
+                INSERT INTO company_profiles
+                    (profile_id, company_name, company_info, footer_assets, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(profile_id) DO UPDATE SET
+                    company_name = excluded.company_name,
+                    company_info = excluded.company_info,
+                    footer_assets = excluded.footer_assets,
+                    updated_at = excluded.updated_at
+            ''', (profile_id, company_info['company_name'],
+                  json.dumps(company_info, ensure_ascii=False),
+                  json.dumps(assets, ensure_ascii=False), now, now))
+
+        logger.info(f"会社プロフィールを保存: {profile_id} ({company_info['company_name']})")
+        return profile_id
+
+    def get(self, profile_id):
+        """プロフィールを取得（{'profile_id', 'company_info', 'footer_assets'}、無ければNone）"""
+        if not profile_id:
+            return None
+
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT company_info, footer_assets FROM company_profiles WHERE profile_id = ?',
+                (profile_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        company_info = json.loads(row[0])
+        assets = json.loads(row[1])
+        if not is_valid_footer_assets(assets):
+            # 形式が古いアセットは再計算して保存し直す
+            self.save(company_info, profile_id)
+            assets = build_footer_assets(company_info)
+
+        return {'profile_id': profile_id, 'company_info': company_info, 'footer_assets': assets}
+
+    def list(self):
+        """プロフィール一覧（ID・会社名・更新日時）"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT profile_id, company_name, updated_at FROM company_profiles ORDER BY updated_at DESC'
+            ).fetchall()
+        return [{'profile_id': r[0], 'company_name': r[1], 'updated_at': r[2]} for r in rows]
+
+    def delete(self, profile_id):
+        with self._lock, self._connect() as conn:
+            deleted = conn.execute(
+                'DELETE FROM company_profiles WHERE profile_id = ?', (profile_id,)
+            ).rowcount
+        return deleted > 0
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+記録済みリクエストの再生ツール
+
+REQUEST_CAPTURE=1 で記録したリクエスト（utils/request_capture.py）を、Flaskアプリのテストクライアントで
+指定した同時実行数で再生し、ルートごとのレイテンシ分位点と応答の違いを表示する。
+
+- Claude APIは固定の応答を返すスタブに置き換える（--claude-delay で応答遅延を指定）
+- 重複照合は無効、会社情報は記録時点のもの（伏せ字）を一時的なプロフィールとして登録して使う
+- 応答の要約を記録時の応答、または --baseline で指定した以前の再生結果（別バージョン）と比較する
+
+    python replay_requests.py captures/ --concurrency 4 --output results-v1.jsonl
+    python replay_requests.py captures/ --concurrency 4 --baseline results-v1.jsonl
+    python replay_requests.py captures/ --inputs archive/ --speed 1   # 入力を保存しない記録・記録時の間隔で再生
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from types import SimpleNamespace
+
+from batch_convert import file_hash, find_pdfs, percentile
+from utils.request_capture import CAPTURE_INPUT_DIR, diff_fingerprints, load_captures, response_fingerprint
+
+STUB_CLAUDE_RESPONSE = {'footer_detected': True, 'bottom_height': 28, 'confidence': 80, 'reason': 'replay stub'}
+
+
+class StubClaudeClient:
+    """messages.create だけを持つClaude APIクライアントのスタブ（固定の応答・遅延）"""
+
+    def __init__(self, delay=0.0, response=None):
+        self.delay = delay
+        self.text = json.dumps(response or STUB_CLAUDE_RESPONSE)
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return SimpleNamespace(content=[SimpleNamespace(text=self.text)])
+
+
+def load_app(claude_client, verbose=False):
+    """再生用の設定でアプリを読み込む（記録・重複照合・プロファイリングは無効、会社情報は一時DB）"""
+    os.environ['REQUEST_CAPTURE'] = '0'
+    os.environ['DUPLICATE_CHECK'] = '0'
+    os.environ['PROFILING_ENABLED'] = '0'
+    os.environ['COMPANY_DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='replay_'), 'company.db')
+    if not verbose:
+        logging.disable(logging.ERROR)
+        warnings.filterwarnings('ignore')
+
+    # ReportLabの出力から日時・乱数由来の値を除く（応答の比較を安定させる）
+    from reportlab import rl_config
+    rl_config.invariant = 1
+    random.seed(0)
+
+    import app as app_module
+    app_module.claude_client = claude_client
+    app_module.CLAUDE_AVAILABLE = True
+    return app_module
+
+
+def index_inputs(directories):
+    """入力を保存しない記録のために、指定フォルダのPDFを内容ハッシュで引けるようにする"""
+    index = {}
+    for directory in directories:
+        for path in find_pdfs(directory):
+            index.setdefault(file_hash(path), path)
+    return index
+
+
+def input_path(capture_dir, file_entry, input_index):
+    stored = os.path.join(capture_dir, CAPTURE_INPUT_DIR, f"{file_entry['sha1']}.pdf")
+    if os.path.exists(stored):
+        return stored
+    return input_index.get(file_entry['sha1'])
+
+
+def register_profiles(app_module, entries):
+    """記録された会社情報ごとに一時プロフィールを作る（同じ内容は1つにまとめる）"""
+    profile_ids = {}
+    for entry in entries:
+        company_info = entry.get('company_info')
+        if not company_info:
+            continue
+        key = json.dumps(company_info, sort_keys=True, ensure_ascii=False)
+        if key not in profile_ids:
+            profile_ids[key] = app_module.company_model.save(company_info)
+        entry['replay_profile_id'] = profile_ids[key]
+    return len(profile_ids)
+
+
+def replay_one(app_module, local, capture_dir, entry, input_index):
+    """1件を再生して結果（ステータス・所要時間・応答の要約）を返す"""
+    result = {
+        'capture_id': entry['capture_id'],
+        'path': entry['path'],
+        'captured_latency_ms': entry.get('latency_ms'),
+        'captured_status_code': entry.get('status_code'),
+    }
+    data = dict(entry.get('form', {}))
+    data.pop('profile_id', None)
+    if entry.get('replay_profile_id'):
+        data['profile_id'] = entry['replay_profile_id']
+    for field, file_entry in entry.get('files', {}).items():
+        path = input_path(capture_dir, file_entry, input_index)
+        if path is None:
+            result['status'] = 'missing_input'
+            return result
+        with open(path, 'rb') as f:
+            data[field] = (BytesIO(f.read()), file_entry['filename'])
+
+    client = getattr(local, 'client', None)
+    if client is None:
+        client = local.client = app_module.app.test_client()
+    started = time.perf_counter()
+    response = client.open(entry['path'], method=entry.get('method', 'POST'), data=data,
+                           content_type='multipart/form-data')
+    result['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    result['status_code'] = response.status_code
+    result['response'] = response_fingerprint(response.get_json()) if response.is_json else None
+    result['status'] = 'replayed'
+    return result
+
+
+def replay(app_module, capture_dir, entries, input_index, concurrency, repeat, speed):
+    """記録順に再生（speed > 0 なら記録時の間隔を speed 倍速で再現）"""
+    schedule = [(iteration, entry) for iteration in range(repeat) for entry in entries]
+    first_at = entries[0].get('captured_at', 0) if entries else 0
+    local = threading.local()
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = []
+        for iteration, entry in schedule:
+            if speed > 0:
+                offset = (entry.get('captured_at', first_at) - first_at) / speed
+                delay = started + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append((iteration, executor.submit(replay_one, app_module, local, capture_dir, entry,
+                                                       input_index)))
+        results = []
+        for iteration, future in futures:
+            result = future.result()
+            result['iteration'] = iteration
+            results.append(result)
+    return results, time.perf_counter() - started
+
+
+def load_results(path):
+    """以前の再生結果（1回目の再生分）を記録IDで引けるようにする"""
+    baseline = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            result = json.loads(line)
+            if result.get('iteration', 0) == 0:
+                baseline[result['capture_id']] = result
+    return baseline
+
+
+def compare(results, entries, baseline=None):
+    """1回目の再生分の応答を、記録時の応答（または以前の再生結果）と比較して違いのあるものを返す"""
+    captured = {entry['capture_id']: entry for entry in entries}
+    changed = []
+    for result in results:
+        if result['iteration'] != 0 or result['status'] != 'replayed':
+            continue
+        reference = (baseline or captured).get(result['capture_id'])
+        if reference is None or reference.get('response') is None:
+            continue
+        differences = diff_fingerprints(reference['response'], result['response'])
+        if reference.get('status_code') != result['status_code']:
+            differences.insert(0, {'field': 'status_code', 'before': reference.get('status_code'),
+                                   'after': result['status_code']})
+        if differences:
+            changed.append({'capture_id': result['capture_id'], 'path': result['path'],
+                            'differences': differences})
+    return changed
+
+
+def print_summary(results, changed, wall_seconds, reference_name, stub, redacted=0):
+    replayed = [result for result in results if result['status'] == 'replayed']
+    missing = len(results) - len(replayed)
+    print(f"\n再生: {len(replayed)}件（入力なし {missing}件） / {wall_seconds:.1f}秒"
+          f" / {len(replayed) / max(wall_seconds, 1e-9):.2f}件/秒 / Claudeスタブ呼び出し {stub.calls}回")
+
+    print(f"\n{'ルート':<22}{'件数':>6}{'p50':>10}{'p90':>10}{'p99':>10}{'最大':>10}{'記録時p50':>12}  ステータス")
+    for path in sorted({result['path'] for result in replayed}):
+        group = [result for result in replayed if result['path'] == path]
+        latencies = [result['latency_ms'] for result in group]
+        captured = [result['captured_latency_ms'] for result in group if result.get('captured_latency_ms')]
+        statuses = {}
+        for result in group:
+            statuses[result['status_code']] = statuses.get(result['status_code'], 0) + 1
+        captured_p50 = f"{percentile(captured, 50):.0f}ms" if captured else '-'
+        print(f"{path:<22}{len(group):>6}{percentile(latencies, 50):>8.0f}ms{percentile(latencies, 90):>8.0f}ms"
+              f"{percentile(latencies, 99):>8.0f}ms{max(latencies):>8.0f}ms{captured_p50:>12}  "
+              + ', '.join(f"{code}: {count}" for code, count in sorted(statuses.items())))
+
+    compared = len({result['capture_id'] for result in replayed})
+    print(f"\n応答の比較（{reference_name}）: {compared - len(changed)}件一致 / {len(changed)}件相違")
+    if redacted:
+        print(f"  ※ {redacted}件は会社情報を伏せ字にした記録のため、フッター部分は記録時の応答と必ず違います"
+              "（バージョン間の比較は --baseline を使ってください）")
+    for item in changed[:20]:
+        print(f"  {item['capture_id']} {item['path']}")
+        for difference in item['differences'][:5]:
+            detail = (f"画像の距離 {difference['distance']}" if 'distance' in difference
+                      else f"{difference.get('before')!r} → {difference.get('after')!r}")
+            print(f"    - {difference['field']}: {detail}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='記録済みリクエストを再生してレイテンシと応答の違いを表示')
+    parser.add_argument('capture_dir', help='REQUEST_CAPTURE_DIR（captures.jsonl と inputs/）')
+    parser.add_argument('--concurrency', type=int, default=1, help='同時に再生する件数')
+    parser.add_argument('--repeat', type=int, default=1, help='全件を繰り返す回数（比較は1回目のみ）')
+    parser.add_argument('--speed', type=float, default=0, help='記録時の間隔を何倍速で再現するか（0で間隔なし）')
+    parser.add_argument('--path', action='append', help='再生するルート（複数指定可、既定は全て）')
+    parser.add_argument('--limit', type=int, help='先頭から再生する件数')
+    parser.add_argument('--inputs', action='append', default=[], help='入力PDFを探すフォルダ（入力を保存しない記録用）')
+    parser.add_argument('--claude-delay', type=float, default=0.0, help='Claudeスタブの応答遅延（秒）')
+    parser.add_argument('--baseline', help='比較対象にする以前の再生結果（既定は記録時の応答）')
+    parser.add_argument('--output', help='再生結果を JSON Lines で保存するファイル')
+    parser.add_argument('--verbose', action='store_true', help='アプリのログを表示')
+    args = parser.parse_args(argv)
+
+    try:
+        entries = load_captures(args.capture_dir)
+    except OSError as e:
+        print(f"記録を読み込めません: {e}", file=sys.stderr)
+        return 1
+    if args.path:
+        entries = [entry for entry in entries if entry['path'] in args.path]
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        print("再生するリクエストがありません", file=sys.stderr)
+        return 1
+
+    stub = StubClaudeClient(delay=args.claude_delay)
+    app_module = load_app(stub, verbose=args.verbose)
+    profiles = register_profiles(app_module, entries)
+    input_index = index_inputs(args.inputs)
+    print(f"記録 {len(entries)}件 / 会社情報 {profiles}件 / 同時実行数 {args.concurrency} / 繰り返し {args.repeat}回")
+
+    try:
+        results, wall_seconds = replay(app_module, args.capture_dir, entries, input_index,
+                                       max(1, args.concurrency), max(1, args.repeat), args.speed)
+    except KeyboardInterrupt:
+        print("\n中断しました", file=sys.stderr)
+        return 130
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    baseline = load_results(args.baseline) if args.baseline else None
+    changed = compare(results, entries, baseline)
+    redacted = 0 if baseline else sum(1 for entry in entries if entry.get('redacted'))
+    print_summary(results, changed, wall_seconds, args.baseline or '記録時の応答', stub, redacted)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,45 @@
 #!/usr/bin/env python3
 """
 マイソク自動変換システム 起動スクリプト
+
+    python run.py                                   # 開発用（Flaskデバッグサーバー）
+    python run.py --production --workers 4          # 本番用（事前読み込み + ワーカープロセスのfork）
+
+本番モードでは、重いモジュール・日本語CIDフォント・正規表現・レイアウトキャッシュを親プロセスで読み込み、
+サンプルPDFでウォームアップ変換を行ってから、待ち受けソケットを共有するワーカーをforkする。
+読み込んだものはコピーオンライトで共有されるため、各ワーカーの初回リクエストも定常時と同じ速さになる。
+
+進捗の購読（/progress/<job_id>）と変換のPOSTは別のワーカーに届くことがあるため、複数ワーカーのときは
+進捗配信をSQLiteファイル（PROGRESS_STORE_PATH）で共有する。重複照合インデックスも同じくファイルで共有される。
 """
 
+import argparse
+import gc
+import logging
 import os
+import signal
+import socket
+import statistics
 import sys
-from app import app
+import tempfile
+import threading
+import time
+
+DEFAULT_PORT = 5001
+DEFAULT_WARMUP_RUNS = 3
+WORKER_RESTART_DELAY = 1.0   # 異常終了したワーカーを起動し直すまでの間隔（秒）
+
+WARMUP_COMPANY_INFO = {
+    'company_name': '株式会社ウォームアップ不動産',
+    'license_number': '東京都知事(1)第00000号',
+    'postal_code': '100-0001',
+    'address': '東京都千代田区千代田1-1',
+    'phone': '03-0000-0000',
+    'fax': '03-0000-0001',
+    'email': 'info@example.com',
+    'website': 'https://example.com',
+}
+
 
 def check_dependencies():
     """必要なライブラリの確認"""
@@ -32,54 +66,244 @@ def check_directories():
         'static/js',
         'templates'
     ]
-    
+
     for directory in directories:
         if not os.path.exists(directory):
             os.makedirs(directory)
             print(f"✓ ディレクトリを作成しました: {directory}")
         else:
             print(f"✓ ディレクトリが存在します: {directory}")
-    
+
+    return True
+
+def check_company_store(app_module):
+    """会社プロフィールストア（app.py で初期化済み）の確認"""
+    if app_module.company_model is None:
+        print("✗ 会社プロフィールストアを初期化できませんでした（会社情報はセッションに保存されます）")
+        return False
+    profiles = app_module.company_model.list()
+    print(f"✓ 会社プロフィールストア: {app_module.company_model.db_path}（{len(profiles)}件）")
     return True
 
-def main():
+
+def preload(app_module):
+    """fork前に共有しておくもの（フォント・フッターアセット・スタイル）を読み込む"""
+    from utils.footer_layout import build_footer_assets, get_footer_font
+    from utils.mysouku_builder import get_mysouku_styles
+
+    get_footer_font()
+    get_mysouku_styles()
+    build_footer_assets(WARMUP_COMPANY_INFO)
+    print(f"✓ フォント・スタイルを読み込みました（{get_footer_font()}）")
+
+
+def warm_up(app_module, runs=DEFAULT_WARMUP_RUNS):
+    """サンプルPDFで変換・抽出・生成を runs 回行い、1回目と2回目以降の所要時間（ms）を返す
+
+    Claude APIは呼ばない（信頼度が低くても規定のフッター領域で続行する）。
+    """
+    from utils.sample_pdf import build_sample_mysouku
+
+    sample = build_sample_mysouku(pages=2)
+    claude_available = app_module.CLAUDE_AVAILABLE
+    app_module.CLAUDE_AVAILABLE = False
+    timings = []
+    try:
+        for _ in range(max(1, runs)):
+            started = time.perf_counter()
+            text = app_module.extract_text_from_pdf(sample)
+            property_data = app_module.parse_property_data(text)
+            if app_module.convert_pdf_footer(sample, WARMUP_COMPANY_INFO, detect_workers=1) is None:
+                raise RuntimeError("ウォームアップ変換に失敗しました")
+            app_module.generate_simple_mysouku(property_data, WARMUP_COMPANY_INFO)
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        app_module.CLAUDE_AVAILABLE = claude_available
+    return timings
+
+
+def report_warm_up(timings):
+    first = timings[0]
+    if len(timings) == 1:
+        print(f"✓ ウォームアップ: 初回 {first:.0f}ms")
+        return
+    steady = statistics.median(timings[1:])
+    print(f"✓ ウォームアップ: 初回 {first:.0f}ms / 定常 {steady:.0f}ms（中央値, {len(timings) - 1}回）"
+          f" / 初回の上乗せ {first - steady:.0f}ms")
+
+
+def open_listener(host, port, backlog=128):
+    """ワーカーで共有する待ち受けソケット"""
+    listener = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(backlog)
+    listener.set_inheritable(True)
+    return listener
+
+
+def run_worker(app, host, port, listener, on_stop=None):
+    """ワーカープロセス: 共有ソケットで待ち受け、SIGTERMで処理中のリクエストを終えてから終了
+
+    on_stop: SIGTERM受信時に呼ぶ関数（進捗のSSEストリームのように、終わりを待てない応答を閉じる）
+    """
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    server.daemon_threads = False   # server_close() で処理中のリクエストのスレッドを待つ
+
+    def stop(*_):
+        if on_stop:
+            on_stop()
+        # serve_forever と同じスレッドから shutdown() を呼ぶと待ち合わせで止まるため別スレッドで呼ぶ
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+    return 0
+
+
+def serve_prefork(app, host, port, workers, on_stop=None):
+    """待ち受けソケットを開いてから workers 個のワーカーをforkし、異常終了したワーカーは起動し直す
+
+    on_stop: 各ワーカーがSIGTERM受信時に呼ぶ関数（run_worker を参照）
+    """
+    listener = open_listener(host, port)
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            # 子プロセス: ここから親のループに戻らず、終了時は通常どおり atexit を実行する
+            sys.exit(run_worker(app, host, port, listener, on_stop))
+        children[pid] = index
+        return pid
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    # fork前に既存オブジェクトをGCの対象から外し、参照カウント以外でページが複製されないようにする
+    gc.collect()
+    gc.freeze()
+
+    for index in range(workers):
+        spawn(index)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"✓ ワーカー {workers} 個を起動しました（pid: {', '.join(str(pid) for pid in children)}）")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        print(f"⚠️ ワーカー {pid} が終了しました（終了コード {code}）、起動し直します", file=sys.stderr)
+        time.sleep(WORKER_RESTART_DELAY)
+        if not stopping:
+            spawn(index)
+    listener.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='不動産マイソク自動変換システムを起動')
+    parser.add_argument('--production', action='store_true',
+                        help='本番モード（デバッグなし・事前読み込みとウォームアップ後にワーカーをfork）')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='ワーカープロセス数（本番モード）')
+    parser.add_argument('--warmup-runs', type=int, default=DEFAULT_WARMUP_RUNS,
+                        help='ウォームアップ変換の回数（0でウォームアップしない、本番モード）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """メイン実行関数"""
+    args = parse_args(argv)
+    workers = max(1, args.workers)
     print("=" * 50)
-    print("不動産マイソク自動変換システム")
+    print("不動産マイソク自動変換システム" + ("（本番モード）" if args.production else ""))
     print("=" * 50)
-    
+
     # 依存関係チェック
     print("\n1. 依存関係チェック...")
     if not check_dependencies():
         sys.exit(1)
-    
+
     # ディレクトリチェック
     print("\n2. ディレクトリチェック...")
     check_directories()
-    
-    # データベース初期化
-    print("\n3. データベース初期化...")
-    try:
-        from models.company import CompanyModel
-        company_model = CompanyModel()
-        print("✓ データベースが正常に初期化されました")
-    except Exception as e:
-        print(f"✗ データベース初期化エラー: {e}")
-        sys.exit(1)
-    
+
+    # アプリ読み込み（同時実行数はワーカー全体でCPU数になるよう、未指定ならワーカーごとに割り振る）
+    print("\n3. アプリケーション読み込み...")
+    if args.production and 'UPLOAD_MAX_CONCURRENCY' not in os.environ:
+        os.environ['UPLOAD_MAX_CONCURRENCY'] = str(max(1, (os.cpu_count() or 1) // workers))
+    # 進捗の購読と変換のPOSTが別のワーカーに届いても配信されるよう、ワーカー間で共有するファイルを使う
+    progress_store = None
+    parent_pid = os.getpid()
+    if args.production and workers > 1 and not os.environ.get('PROGRESS_STORE_PATH') and hasattr(os, 'fork'):
+        progress_store = os.path.join(tempfile.gettempdir(), f"mysouku_progress_{os.getpid()}.db")
+        os.environ['PROGRESS_STORE_PATH'] = progress_store
+    started = time.perf_counter()
+    import app as app_module
+    print(f"✓ アプリケーションを読み込みました（{(time.perf_counter() - started) * 1000:.0f}ms）")
+    check_company_store(app_module)
+
+    if args.production:
+        print("\n4. 事前読み込み・ウォームアップ...")
+        logging.getLogger().setLevel(logging.WARNING)
+        try:
+            # 初回の所要時間に読み込みの費用が表れるよう、ウォームアップ変換を先に行う
+            if args.warmup_runs > 0:
+                report_warm_up(warm_up(app_module, args.warmup_runs))
+            preload(app_module)
+        except Exception as e:
+            print(f"✗ ウォームアップエラー: {e}")
+            sys.exit(1)
+        finally:
+            logging.getLogger().setLevel(logging.INFO)
+
     # サーバー起動
-    print("\n4. Webサーバーを起動しています...")
-    print(f"アクセス先: http://localhost:5001")
+    print(f"\n{5 if args.production else 4}. Webサーバーを起動しています...")
+    print(f"アクセス先: http://localhost:{args.port}")
     print("停止するには Ctrl+C を押してください")
     print("=" * 50)
-    
+
     try:
-        app.run(debug=True, host='0.0.0.0', port=5001)
+        if not args.production:
+            app_module.app.run(debug=True, host=args.host, port=args.port)
+        elif hasattr(os, 'fork'):
+            serve_prefork(app_module.app, args.host, args.port, workers, on_stop=app_module.progress_hub.close)
+        else:
+            print("⚠️ この環境ではforkできないため、1プロセス（スレッド）で起動します")
+            app_module.app.run(debug=False, host=args.host, port=args.port, threaded=True)
     except KeyboardInterrupt:
         print("\n\nサーバーを停止しました")
     except Exception as e:
         print(f"\nサーバーエラー: {e}")
         sys.exit(1)
+    finally:
+        # ワーカー（fork した子プロセス）の終了時は消さない
+        if progress_store and os.getpid() == parent_pid:
+            for path in (progress_store, progress_store + '-wal', progress_store + '-shm'):
+                if os.path.exists(path):
+                    os.remove(path)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
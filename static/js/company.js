@@ -6,8 +6,43 @@ $(document).ready(function() {
     
     // フォームバリデーション
     setupValidation();
+    
+    // プロフィール切替
+    $('#profileSelect').on('change', handleProfileChange);
 });
 
+/**
+ * 会社プロフィール切替処理
+ */
+function handleProfileChange() {
+    const profileId = this.value;
+    
+    if (!profileId) {
+        // 新規プロフィール: フォームを空にして保存時に新規作成
+        document.getElementById('companyForm').reset();
+        $('#companyForm input[type="text"], #companyForm input[type="email"], #companyForm input[type="tel"], #companyForm input[type="url"]').val('');
+        $('#profileId').val('');
+        return;
+    }
+    
+    $.ajax({
+        url: '/select_profile',
+        type: 'POST',
+        data: { profile_id: profileId },
+        success: function(response) {
+            if (response.status === 'success') {
+                // 選択したプロフィールの内容で再表示
+                window.location.reload();
+            } else {
+                showAlert(response.message || 'プロフィールの切替に失敗しました。', 'danger');
+            }
+        },
+        error: function() {
+            showAlert('プロフィールの切替に失敗しました。', 'danger');
+        }
+    });
+}
+
 /**
  * 会社情報保存処理
  */
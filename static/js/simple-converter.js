@@ -1,6 +1,8 @@
 // マイソク会社名自動変換 - シンプル版
 
 let selectedFiles = [];
+let convertedResults = [];  // プレビュー表示用（元ファイルを保持）
+let activeScheduler = null;  // 処理中のアップロードスケジューラ（キャンセル用）
 
 $(document).ready(function() {
     // ファイル選択イベント
@@ -14,6 +16,14 @@ $(document).ready(function() {
     
     // リセット
     $('#resetBtn').on('click', handleReset);
+    
+    // キャンセル
+    $('#cancelBtn').on('click', handleCancel);
+    
+    // ページ範囲指定のときだけ範囲の入力欄を表示
+    $('#pageMode').on('change', function() {
+        $('#pageRangesGroup').toggleClass('d-none', this.value !== 'ranges');
+    });
 });
 
 /**
@@ -140,7 +150,7 @@ function setupDragAndDrop() {
 }
 
 /**
- * 変換処理実行
+ * 変換処理実行（サーバーのヒントに合わせて複数ファイルを並行処理）
  */
 async function handleProcessing(event) {
     event.preventDefault();
@@ -152,41 +162,52 @@ async function handleProcessing(event) {
     
     // UI更新
     const processBtn = document.getElementById('processBtn');
+    const cancelBtn = document.getElementById('cancelBtn');
     const processingStatus = document.getElementById('processingStatus');
     const statusMessage = document.getElementById('statusMessage');
     
     processBtn.disabled = true;
     processingStatus.classList.remove('d-none');
+    cancelBtn.classList.remove('d-none');
+    document.getElementById('stageProgress').classList.remove('d-none');
+    document.getElementById('stageProgressBar').style.width = '0%';
+    document.getElementById('stageDetail').textContent = '';
+    
+    const files = selectedFiles.slice();
+    const concurrency = await fetchUploadConcurrency();
+    statusMessage.textContent = `${files.length}件を処理中...（同時${Math.min(concurrency, files.length)}件）`;
+    activeScheduler = new UploadScheduler({ concurrency, onProgress: updateOverallProgress });
     
     try {
+        const outcomes = await activeScheduler.run(files, processIndividualFile);
         const results = [];
-        
-        // 各ファイルを順次処理
-        for (let i = 0; i < selectedFiles.length; i++) {
-            const file = selectedFiles[i];
-            const current = i + 1;
-            const total = selectedFiles.length;
-            
-            statusMessage.textContent = `${current}/${total}: ${file.name} を処理中...`;
-            
-            const result = await processIndividualFile(file, i);
+        let cancelled = 0;
+        outcomes.forEach((result, i) => {
             if (result.success) {
                 results.push(result);
-                statusMessage.textContent = `${current}/${total}: ${file.name} 完了`;
+                if (result.duplicate) {
+                    showNotification(`${files[i].name} は処理済みの ${result.duplicate.filename} とほぼ同じ内容です`, 'info');
+                }
+            } else if (result.cancelled) {
+                cancelled++;
             } else {
-                showNotification(`${file.name} の処理でエラー: ${result.error}`, 'warning');
+                showNotification(`${files[i].name} の処理でエラー: ${result.error}`, 'warning');
             }
-            
-            // 短時間の遅延でUI更新を視覚化
-            await new Promise(resolve => setTimeout(resolve, 500));
+        });
+        if (cancelled > 0) {
+            showNotification(`${cancelled}件の処理をキャンセルしました`, 'info');
         }
         
         if (results.length > 0) {
             statusMessage.textContent = '変換完了！';
+            cancelBtn.classList.add('d-none');
             setTimeout(() => {
                 processingStatus.classList.add('d-none');
                 showDownloadResults(results);
             }, 1000);
+        } else if (cancelled > 0) {
+            processingStatus.classList.add('d-none');
+            processBtn.disabled = false;
         } else {
             throw new Error('すべてのファイルの処理に失敗しました');
         }
@@ -195,13 +216,34 @@ async function handleProcessing(event) {
         showNotification(`処理エラー: ${error.message}`, 'error');
         processingStatus.classList.add('d-none');
         processBtn.disabled = false;
+    } finally {
+        cancelBtn.classList.add('d-none');
+        activeScheduler = null;
+    }
+}
+
+/**
+ * 処理中のファイルをキャンセル
+ */
+function handleCancel() {
+    if (activeScheduler) {
+        activeScheduler.cancel();
+        document.getElementById('statusMessage').textContent = 'キャンセルしています...';
     }
 }
 
+/**
+ * 全体の進捗表示（完了件数と各ファイルの段階進捗の合計）
+ */
+function updateOverallProgress(fraction, completed, total) {
+    document.getElementById('stageProgressBar').style.width = Math.round(fraction * 100) + '%';
+    document.getElementById('stageDetail').textContent = `${completed}/${total}件完了`;
+}
+
 /**
  * 個別ファイル処理
  */
-async function processIndividualFile(file, index) {
+async function processIndividualFile(file, index, scheduler) {
     const formData = new FormData();
     formData.append('pdf_file', file);
     
@@ -209,19 +251,33 @@ async function processIndividualFile(file, index) {
     const outputFormat = document.querySelector('input[name="outputFormat"]:checked')?.value || 'separate';
     formData.append('output_format', outputFormat);
     
+    // 検出するページ（1ページ目のみ・抜き取り・ページ範囲）
+    const pageMode = document.getElementById('pageMode')?.value || 'all';
+    formData.append('page_mode', pageMode);
+    if (pageMode === 'ranges') {
+        formData.append('page_ranges', document.getElementById('pageRanges').value);
+    }
+    
+    // 実際の進捗をSSEで購読
+    const jobId = generateJobId();
+    formData.append('job_id', jobId);
+    const progressSource = await openProgressStream(
+        jobId, event => updateStageProgress(file.name, event, index, scheduler)
+    );
+    
     try {
-        // タイムアウト付きfetch
-        const controller = new AbortController();
-        const timeoutId = setTimeout(() => controller.abort(), 120000); // 2分タイムアウト
-        
-        const response = await fetch('/process_pdf_simple', {
+        // 混雑時（429/503）は待って再送、1回あたり2分でタイムアウト
+        const response = await scheduler.fetchWithRetry('/process_pdf_simple', {
             method: 'POST',
-            body: formData,
-            signal: controller.signal
+            body: formData
+        }, 120000, (attempt, delay) => {
+            document.getElementById('statusMessage').textContent =
+                `${file.name}: 混雑のため${(delay / 1000).toFixed(1)}秒後に再試行（${attempt}回目）`;
         });
         
-        clearTimeout(timeoutId);
-        
+        if (response.status === 429 || response.status === 503) {
+            throw new Error('サーバーが混雑しています。しばらくしてから再試行してください');
+        }
         if (!response.ok) {
             throw new Error(`HTTPエラー: ${response.status}`);
         }
@@ -233,7 +289,9 @@ async function processIndividualFile(file, index) {
                 success: true,
                 filename: result.filename,
                 pdfData: result.pdf_data,
-                originalName: file.name
+                originalName: file.name,
+                file: file,
+                duplicate: result.duplicate
             };
         } else {
             return {
@@ -245,7 +303,8 @@ async function processIndividualFile(file, index) {
         if (error.name === 'AbortError') {
             return {
                 success: false,
-                error: 'タイムアウト: 処理に時間がかかりすぎています'
+                cancelled: scheduler.cancelled,
+                error: scheduler.cancelled ? 'キャンセルしました' : 'タイムアウト: 処理に時間がかかりすぎています'
             };
         } else {
             return {
@@ -253,13 +312,98 @@ async function processIndividualFile(file, index) {
                 error: error.message || 'ネットワークエラーが発生しました'
             };
         }
+    } finally {
+        if (progressSource) {
+            progressSource.close();
+        }
+    }
+}
+
+/**
+ * ジョブID生成（進捗購読用）
+ */
+function generateJobId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID().replace(/-/g, '');
+    }
+    return Date.now().toString(16) + Math.random().toString(16).slice(2);
+}
+
+/**
+ * 進捗ストリーム（SSE）を開く
+ * 購読開始を待ってから解決する（最大1秒、非対応環境ではnull）
+ */
+function openProgressStream(jobId, onEvent) {
+    return new Promise(resolve => {
+        if (!window.EventSource) {
+            resolve(null);
+            return;
+        }
+        
+        const source = new EventSource(`/progress/${jobId}`);
+        let resolved = false;
+        const finish = value => {
+            if (!resolved) {
+                resolved = true;
+                resolve(value);
+            }
+        };
+        
+        source.onmessage = message => {
+            const event = JSON.parse(message.data);
+            if (event.stage === 'subscribed') {
+                finish(source);
+                return;
+            }
+            onEvent(event);
+            if (event.stage === 'done' || event.stage === 'error') {
+                source.close();
+            }
+        };
+        source.onerror = () => {
+            // 進捗が取れなくても変換自体は続行する
+            source.close();
+            finish(null);
+        };
+        setTimeout(() => finish(source), 1000);
+    });
+}
+
+/**
+ * 進捗イベントの表示更新
+ */
+function updateStageProgress(fileName, event, index, scheduler) {
+    const statusMessage = document.getElementById('statusMessage');
+    
+    const stageLabels = {
+        parsed: 'PDF読込完了',
+        claude_fallback: event.status === 'start' ? 'AI解析中' : 'AI解析完了',
+        detected: 'フッター検出',
+        overlaid: '会社情報を配置',
+        written: 'PDF出力完了',
+        optimized: 'PDF最適化完了',
+        done: '完了',
+        error: 'エラー'
+    };
+    
+    let label = stageLabels[event.stage] || event.stage;
+    if (event.page && event.total) {
+        label += ` ${event.page}/${event.total}ページ`;
+        // 検出とオーバーレイでそれぞれ半分ずつ（出力完了までは1未満に留める）
+        const offset = event.stage === 'overlaid' ? 0.45 : 0;
+        scheduler.setProgress(index, offset + event.page / event.total * 0.45);
+    } else if (event.stage === 'written' || event.stage === 'optimized') {
+        scheduler.setProgress(index, 0.95);
     }
+    
+    statusMessage.textContent = `${fileName}: ${label}（経過 ${(event.elapsed_ms / 1000).toFixed(1)}秒）`;
 }
 
 /**
  * ダウンロード結果表示
  */
 function showDownloadResults(results) {
+    convertedResults = results;
     const downloadCard = document.getElementById('downloadCard');
     const downloadContent = document.getElementById('downloadContent');
     
@@ -278,6 +422,11 @@ function showDownloadResults(results) {
                 <i class="fas fa-download me-2"></i>
                 PDFをダウンロード
             </a>
+            <button type="button" class="btn btn-outline-secondary btn-lg ms-2" onclick="showPreview(0)">
+                <i class="fas fa-eye me-2"></i>
+                プレビュー
+            </button>
+            <div id="preview-0" class="mt-3"></div>
         `;
     } else {
         // 複数ファイル
@@ -285,10 +434,16 @@ function showDownloadResults(results) {
         results.forEach((result, index) => {
             html += `
                 <div class="col-md-6 mb-2">
-                    <a href="#" class="btn btn-success btn-sm w-100" onclick="downloadPDF('${result.pdfData}', '${result.filename}')">
-                        <i class="fas fa-download me-1"></i>
-                        ${escapeHtml(result.filename)}
-                    </a>
+                    <div class="btn-group w-100">
+                        <a href="#" class="btn btn-success btn-sm w-100" onclick="downloadPDF('${result.pdfData}', '${result.filename}')">
+                            <i class="fas fa-download me-1"></i>
+                            ${escapeHtml(result.filename)}
+                        </a>
+                        <button type="button" class="btn btn-outline-secondary btn-sm" onclick="showPreview(${index})" title="プレビュー">
+                            <i class="fas fa-eye"></i>
+                        </button>
+                    </div>
+                    <div id="preview-${index}" class="mt-2"></div>
                 </div>
             `;
         });
@@ -304,6 +459,47 @@ function showDownloadResults(results) {
     downloadCard.scrollIntoView({ behavior: 'smooth' });
 }
 
+/**
+ * 変換前後のプレビュー（ページ下部の帯）を表示
+ * 変換済みPDFをダウンロードせずに白塗り範囲を確認できる
+ */
+async function showPreview(index) {
+    const result = convertedResults[index];
+    const container = document.getElementById(`preview-${index}`);
+    if (!result || !result.file || !container) {
+        return;
+    }
+    
+    // 表示済みなら閉じる
+    if (container.innerHTML) {
+        container.innerHTML = '';
+        return;
+    }
+    
+    container.innerHTML = '<div class="text-muted small"><i class="fas fa-spinner fa-spin me-1"></i>プレビュー作成中...</div>';
+    
+    const formData = new FormData();
+    formData.append('pdf_file', result.file);
+    
+    try {
+        const response = await fetch('/preview', { method: 'POST', body: formData });
+        const preview = await response.json();
+        if (preview.status !== 'success') {
+            throw new Error(preview.message || 'プレビューの作成に失敗しました');
+        }
+        
+        container.innerHTML = `
+            <div class="row g-2 small text-muted">
+                <div class="col-6">変換前<img src="${preview.images.before}" class="img-fluid border" alt="変換前"></div>
+                <div class="col-6">変換後<img src="${preview.images.after}" class="img-fluid border" alt="変換後"></div>
+            </div>
+            <div class="small text-muted mt-1">白塗り高さ ${preview.bottom_height}mm（信頼度 ${preview.confidence}%）</div>
+        `;
+    } catch (error) {
+        container.innerHTML = `<div class="text-danger small">${escapeHtml(error.message)}</div>`;
+    }
+}
+
 /**
  * リセット処理
  */
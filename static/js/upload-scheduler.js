@@ -0,0 +1,143 @@
+// アップロードスケジューラ（同時実行数の上限・429/503の再試行・キャンセル・全体進捗）
+
+// ブラウザのHTTP/1.1同時接続数（1ホスト6本）のうち、各アップロードは
+// 本体のPOSTと進捗購読（SSE）で2本使うため、クライアント側の上限は3
+const UPLOAD_CLIENT_MAX_CONCURRENCY = 3;
+const UPLOAD_RETRY_STATUSES = [429, 503];
+
+/**
+ * サーバーの同時実行数ヒントを取得（取得できなければ1）
+ */
+async function fetchUploadConcurrency() {
+    try {
+        const response = await fetch('/upload_hints');
+        const hints = await response.json();
+        return Math.max(1, Math.min(UPLOAD_CLIENT_MAX_CONCURRENCY, hints.max_concurrency || 1));
+    } catch (error) {
+        return 1;
+    }
+}
+
+class UploadScheduler {
+    /**
+     * @param {Object} options
+     *   concurrency: 同時実行数 / maxRetries: 429・503での最大再試行回数
+     *   baseDelay: 再試行の初回待ち時間（ms、以降倍々） / onProgress(fraction, completed, total)
+     */
+    constructor(options = {}) {
+        this.concurrency = options.concurrency || 1;
+        this.maxRetries = options.maxRetries ?? 5;
+        this.baseDelay = options.baseDelay || 1000;
+        this.maxDelay = options.maxDelay || 15000;
+        this.onProgress = options.onProgress || (() => {});
+        this.controller = new AbortController();
+        this.fractions = [];
+        this.completed = 0;
+    }
+
+    get cancelled() {
+        return this.controller.signal.aborted;
+    }
+
+    /** 未開始のファイルを取りやめ、実行中のリクエストを中断する */
+    cancel() {
+        this.controller.abort();
+    }
+
+    /**
+     * items を最大 concurrency 件ずつ並行して worker(item, index, scheduler) で処理する
+     * 結果は入力順の配列（キャンセルで実行しなかったものは {cancelled: true}）
+     */
+    async run(items, worker) {
+        const results = new Array(items.length);
+        this.fractions = new Array(items.length).fill(0);
+        this.completed = 0;
+        let next = 0;
+
+        const lane = async () => {
+            while (next < items.length) {
+                const index = next++;
+                if (this.cancelled) {
+                    results[index] = { success: false, cancelled: true, error: 'キャンセルしました' };
+                    continue;
+                }
+                try {
+                    results[index] = await worker(items[index], index, this);
+                } catch (error) {
+                    results[index] = {
+                        success: false,
+                        cancelled: this.cancelled,
+                        error: this.cancelled ? 'キャンセルしました' : (error.message || 'エラーが発生しました')
+                    };
+                }
+                this.completed++;
+                this.setProgress(index, 1);
+            }
+        };
+
+        const lanes = [];
+        for (let i = 0; i < Math.min(this.concurrency, items.length); i++) {
+            lanes.push(lane());
+        }
+        await Promise.all(lanes);
+        return results;
+    }
+
+    /** ファイル単位の進捗（0〜1）を更新して全体の進捗を通知 */
+    setProgress(index, fraction) {
+        this.fractions[index] = Math.max(this.fractions[index] || 0, Math.min(1, fraction));
+        const total = this.fractions.length;
+        const sum = this.fractions.reduce((a, b) => a + b, 0);
+        this.onProgress(total ? sum / total : 1, this.completed, total);
+    }
+
+    /**
+     * 429/503 のときは Retry-After（無ければ指数バックオフ＋ゆらぎ）だけ待って再送する fetch
+     * timeoutMs を指定すると1回あたりのタイムアウトを設ける（超過時は AbortError）
+     */
+    async fetchWithRetry(url, options = {}, timeoutMs = 0, onRetry = null) {
+        for (let attempt = 0; ; attempt++) {
+            const controller = new AbortController();
+            const abort = () => controller.abort();
+            this.controller.signal.addEventListener('abort', abort);
+            const timer = timeoutMs ? setTimeout(abort, timeoutMs) : null;
+            let response;
+            try {
+                response = await fetch(url, Object.assign({}, options, { signal: controller.signal }));
+            } finally {
+                clearTimeout(timer);
+                this.controller.signal.removeEventListener('abort', abort);
+            }
+
+            if (!UPLOAD_RETRY_STATUSES.includes(response.status) || attempt >= this.maxRetries) {
+                return response;
+            }
+            const retryAfter = parseFloat(response.headers.get('Retry-After'));
+            const backoff = Math.min(this.maxDelay, this.baseDelay * 2 ** attempt);
+            const delay = (retryAfter > 0 ? retryAfter * 1000 : backoff) * (0.8 + Math.random() * 0.4);
+            if (onRetry) {
+                onRetry(attempt + 1, delay);
+            }
+            await this.sleep(delay);
+        }
+    }
+
+    /** キャンセルで中断される待機 */
+    sleep(ms) {
+        return new Promise((resolve, reject) => {
+            if (this.cancelled) {
+                reject(new DOMException('cancelled', 'AbortError'));
+                return;
+            }
+            const onAbort = () => {
+                clearTimeout(timer);
+                reject(new DOMException('cancelled', 'AbortError'));
+            };
+            const timer = setTimeout(() => {
+                this.controller.signal.removeEventListener('abort', onAbort);
+                resolve();
+            }, ms);
+            this.controller.signal.addEventListener('abort', onAbort, { once: true });
+        });
+    }
+}
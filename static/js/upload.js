@@ -109,23 +109,25 @@ async function handleUpload(event) {
     showProgressBar(0, totalFiles);
     
     try {
-        // 順次アップロード処理
-        for (let i = 0; i < files.length; i++) {
-            currentFileIndex = i;
-            const file = files[i];
-            
-            showProgressMessage(`ファイル ${i + 1}/${totalFiles} を処理中: ${file.name}`);
-            updateProgressBar(i, totalFiles);
-            
-            const result = await uploadSingleFile(file, i);
-            
+        // サーバーのヒントに合わせて並行アップロード（upload-scheduler.js）
+        const concurrency = await fetchUploadConcurrency();
+        const scheduler = new UploadScheduler({
+            concurrency,
+            onProgress: (fraction, completed, total) => {
+                updateProgressBar(fraction * total, total);
+                showProgressMessage(`${completed}/${total}ファイル完了`);
+            }
+        });
+        const results = await scheduler.run(files, uploadSingleFile);
+        
+        results.forEach((result, i) => {
             if (result.success) {
                 extractedDataArray.push(result.data.extracted_data);
                 fileIdArray.push(result.data.file_id);
             } else {
-                showAlert(`${file.name} の処理でエラー: ${result.message}`, 'warning');
+                showAlert(`${files[i].name} の処理でエラー: ${result.message || result.error}`, 'warning');
             }
-        }
+        });
         
         updateProgressBar(totalFiles, totalFiles);
         showProgressMessage(`全${totalFiles}ファイルの処理が完了しました`);
@@ -155,39 +157,83 @@ async function handleUpload(event) {
 }
 
 /**
- * 単一ファイルのアップロード処理
+ * 単一ファイルのアップロード処理（混雑時は待って再送）
  */
-function uploadSingleFile(file, index) {
-    return new Promise((resolve) => {
-        const formData = new FormData();
-        formData.append('pdf_file', file);
+async function uploadSingleFile(file, index, scheduler) {
+    const formData = new FormData();
+    formData.append('pdf_file', file);
+    
+    // 実際の抽出進捗をSSEで購読
+    const jobId = Date.now().toString(16) + Math.random().toString(16).slice(2);
+    formData.append('job_id', jobId);
+    // 購読が登録される前に送ると最初の進捗が届かないため、購読開始を待ってから送信
+    const progressSource = await subscribeUploadProgress(jobId, file, index, scheduler);
+    
+    try {
+        const response = await scheduler.fetchWithRetry('/upload_pdf', {
+            method: 'POST',
+            body: formData
+        }, 120000); // 2分タイムアウト
+        const payload = await response.json().catch(() => ({}));
         
-        $.ajax({
-            url: '/upload_pdf',
-            type: 'POST',
-            data: formData,
-            processData: false,
-            contentType: false,
-            timeout: 120000, // 2分タイムアウト
-            success: function(response) {
-                if (response.status === 'success') {
-                    resolve({ success: true, data: response });
-                } else {
-                    resolve({ success: false, message: response.message || 'アップロードに失敗しました' });
-                }
-            },
-            error: function(xhr, status, error) {
-                let message = 'アップロードエラーが発生しました';
-                
-                if (status === 'timeout') {
-                    message = 'アップロード処理がタイムアウトしました';
-                } else if (xhr.responseJSON && xhr.responseJSON.message) {
-                    message = xhr.responseJSON.message;
-                }
-                
-                resolve({ success: false, message: message });
+        if (response.ok && payload.status === 'success') {
+            return { success: true, data: payload };
+        }
+        return { success: false, message: payload.message || 'アップロードに失敗しました' };
+    } catch (error) {
+        if (error.name === 'AbortError') {
+            return {
+                success: false,
+                cancelled: scheduler.cancelled,
+                message: scheduler.cancelled ? 'キャンセルしました' : 'アップロード処理がタイムアウトしました'
+            };
+        }
+        return { success: false, message: 'アップロードエラーが発生しました' };
+    } finally {
+        if (progressSource) {
+            progressSource.close();
+        }
+    }
+}
+
+/**
+ * アップロード処理の進捗購読
+ * 購読開始を待ってから解決する（最大1秒、非対応環境ではnull）
+ */
+function subscribeUploadProgress(jobId, file, index, scheduler) {
+    return new Promise(resolve => {
+        if (!window.EventSource) {
+            resolve(null);
+            return;
+        }
+        
+        const source = new EventSource(`/progress/${jobId}`);
+        let resolved = false;
+        const finish = value => {
+            if (!resolved) {
+                resolved = true;
+                resolve(value);
             }
-        });
+        };
+        
+        source.onmessage = function(message) {
+            const event = JSON.parse(message.data);
+            if (event.stage === 'subscribed') {
+                finish(source);
+            } else if (event.stage === 'extracted' && event.total) {
+                showProgressMessage(`${file.name} テキスト抽出 ${event.page}/${event.total}ページ`);
+                // ファイル単位の進捗にページ単位の進み具合を加味
+                scheduler.setProgress(index, event.page / event.total * 0.95);
+            } else if (event.stage === 'done' || event.stage === 'error') {
+                source.close();
+            }
+        };
+        source.onerror = function() {
+            // 進捗が取れなくてもアップロード自体は続行する
+            source.close();
+            finish(null);
+        };
+        setTimeout(() => finish(source), 1000);
     });
 }
 
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""保存済みフッターアセットの描画テスト
+
+プロフィールを保存したプロセスとは別の新しいプロセスで、保存済みのアセットだけを使って
+会社情報フッターを描画し、会社名がPDFに描画されることを確認する
+（フォント登録は build_footer_assets を通らないため、再起動後・プロセスプールで抜けやすい）。
+
+    python test_footer_assets.py      # または pytest test_footer_assets.py
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from io import BytesIO
+
+import pdfplumber
+
+from models.company import CompanyModel
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+COMPANY_INFO = {
+    'company_name': '株式会社テスト不動産',
+    'license_number': '東京都知事(1)第12345号',
+    'address': '東京都千代田区千代田1-1',
+    'phone': '03-1234-5678',
+}
+
+# 新しいプロセスで実行: 保存済みのアセットでフッターを描画し、PDFを標準出力に書く
+DRAW_SCRIPT = '''
+import sys
+from io import BytesIO
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+from models.company import CompanyModel
+from app import add_company_footer
+
+profile = CompanyModel(sys.argv[1]).get(sys.argv[2])
+buffer = BytesIO()
+pdf_canvas = canvas.Canvas(buffer, pagesize=(595, 842))
+add_company_footer(pdf_canvas, profile['company_info'], 595, 35 * mm, profile['footer_assets'])
+pdf_canvas.save()
+sys.stdout.buffer.write(buffer.getvalue())
+'''
+
+
+def test_footer_from_stored_assets():
+    """保存済みアセットを新しいプロセスで読み込んで描画しても会社名が描かれる"""
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'company.db')
+        profile_id = CompanyModel(db_path).save(COMPANY_INFO)
+
+        completed = subprocess.run([sys.executable, '-c', DRAW_SCRIPT, db_path, profile_id],
+                                   cwd=ROOT, capture_output=True, check=True)
+
+    with pdfplumber.open(BytesIO(completed.stdout)) as pdf:
+        text = pdf.pages[0].extract_text() or ''
+    assert COMPANY_INFO['company_name'] in text, text
+    assert 'フッター項目描画エラー' not in completed.stderr.decode('utf-8', 'replace')
+
+
+if __name__ == '__main__':
+    try:
+        test_footer_from_stored_assets()
+        print("テスト結果: 成功")
+    except AssertionError as e:
+        print(f"テスト結果: 失敗 {e}")
+        sys.exit(1)
@@ -0,0 +1 @@
+"""マイソク変換システムの補助モジュール群"""
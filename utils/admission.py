@@ -0,0 +1,128 @@
+"""
+重い処理（PDF変換・テキスト抽出・Claude API呼び出し）の受付制御
+
+資源ごとに同時実行数の上限と待ち行列を持ち、上限に達したリクエストは期限付きで待たせる。
+
+- 待ち行列が満杯なら即座に断る（429）
+- 期限までに順番が来なければ断る（503）
+- どちらも Retry-After に、直近の処理時間と待ち件数から見積もった秒数を付ける
+
+クライアント側のアップロードスケジューラは /upload_hints の max_concurrency を同時実行数に使う。
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+ADMISSION_RETRY_AFTER = 2         # 秒（処理時間の実績がないときの Retry-After）
+ADMISSION_MAX_RETRY_AFTER = 30
+ADMISSION_WAIT_SAMPLES = 256      # 待ち時間の分位点を出すために保持する件数
+HOLD_TIME_SMOOTHING = 0.2         # 処理時間の指数移動平均の係数
+
+
+class Saturated(Exception):
+    """資源が埋まっていて受け付けられない"""
+
+    def __init__(self, pool, reason, retry_after):
+        self.pool = pool
+        self.reason = reason            # queue_full / timeout
+        self.retry_after = retry_after
+        self.status_code = 429 if reason == 'queue_full' else 503
+        super().__init__(f"{pool}: {reason}")
+
+
+class ResourcePool:
+    """同時実行数の上限と期限付きの待ち行列を持つ資源"""
+
+    def __init__(self, name, limit, max_queue=None, queue_timeout=10.0):
+        self.name = name
+        self.limit = max(1, int(limit))
+        self.max_queue = self.limit * 4 if max_queue is None else max(0, int(max_queue))
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._hold_ewma = None
+        self._waits = deque(maxlen=ADMISSION_WAIT_SAMPLES)
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def _retry_after(self):
+        """待ち件数が掃けるまでの見積もり秒数"""
+        if self._hold_ewma is None:
+            return ADMISSION_RETRY_AFTER
+        estimate = self._hold_ewma * (self._waiting + 1) / self.limit
+        return max(1, min(ADMISSION_MAX_RETRY_AFTER, math.ceil(estimate)))
+
+    def acquire(self, timeout=None):
+        """枠を確保して確保時刻を返す（確保できなければ Saturated）"""
+        timeout = self.queue_timeout if timeout is None else timeout
+        started = time.monotonic()
+        with self._condition:
+            if self._in_flight >= self.limit:
+                if self._waiting >= self.max_queue:
+                    self.rejected_queue_full += 1
+                    raise Saturated(self.name, 'queue_full', self._retry_after())
+                self._waiting += 1
+                try:
+                    deadline = started + timeout
+                    while self._in_flight >= self.limit:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected_timeout += 1
+                            raise Saturated(self.name, 'timeout', self._retry_after())
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_flight += 1
+            self.admitted += 1
+            acquired = time.monotonic()
+            self._waits.append(acquired - started)
+            return acquired
+
+    def release(self, acquired=None):
+        with self._condition:
+            self._in_flight = max(0, self._in_flight - 1)
+            if acquired is not None:
+                held = time.monotonic() - acquired
+                self._hold_ewma = held if self._hold_ewma is None else (
+                    HOLD_TIME_SMOOTHING * held + (1 - HOLD_TIME_SMOOTHING) * self._hold_ewma)
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self, timeout=None):
+        acquired = self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release(acquired)
+
+    def hints(self):
+        """クライアントに伝える同時実行数のヒント"""
+        with self._condition:
+            return {
+                'max_concurrency': self.limit,
+                'in_flight': self._in_flight,
+                'queued': self._waiting,
+                'retry_after': self._retry_after(),
+            }
+
+    def metrics(self):
+        with self._condition:
+            waits = sorted(self._waits)
+            return {
+                'limit': self.limit,
+                'max_queue': self.max_queue,
+                'queue_timeout_s': self.queue_timeout,
+                'in_flight': self._in_flight,
+                'queued': self._waiting,
+                'admitted': self.admitted,
+                'rejected_queue_full': self.rejected_queue_full,
+                'rejected_timeout': self.rejected_timeout,
+                'wait_p50_ms': round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+                'wait_p95_ms': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else None,
+                'hold_avg_ms': round(self._hold_ewma * 1000, 1) if self._hold_ewma is not None else None,
+            }
@@ -0,0 +1,287 @@
+"""
+重複・ほぼ重複マイソクの検出インデックス
+
+同じ物件が複数の業者からフッターだけ違う形で届くため、フッターを除いた本文部分で照合する。
+
+- 本文テキスト: 1ページ目のフッター領域より上の文字を正規化し、文字5-gramのMinHash（64個）を
+  LSH（16バンド×4行）のバケットに登録する。照合は同じバケットの候補だけを比較する
+- ページ画像: 同じ領域を低解像度でレンダリングした64bitのdHashを、16bit×4区間のバケットに登録する
+  （テキストレイヤーのない画像のみのPDF向け。ハミング距離3以下は必ず候補に入る）
+
+登録件数には上限があり、超えたら古いものから削除する。照合はメモリ上のバケットで行い、登録はSQLiteに
+1件ずつ書き込む。照合の前に他のプロセス（run.py の本番モードのワーカー等）が登録した分を読み込むため、
+同じファイルを使うプロセス間で登録が共有される。
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+import pypdfium2 as pdfium
+
+from utils.vector_footer import VECTOR_MAX_HEIGHT_MM
+
+logger = logging.getLogger(__name__)
+
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16                      # 16バンド×4行: Jaccard類似度0.5付近から候補に入る
+SHINGLE_SIZE = 5
+MIN_SHINGLES = 20                   # これ未満の文字量ではテキストで照合しない
+TEXT_SIMILARITY_THRESHOLD = 0.8     # 推定Jaccard類似度がこれ以上ならほぼ重複
+DHASH_CHUNKS = 4
+DHASH_MAX_DISTANCE = DHASH_CHUNKS - 1   # 画像で照合する場合のハミング距離の上限（区間数未満なら必ず候補に入る）
+DHASH_DPI = 30
+BODY_MIN_FOOTER_RATIO = 0.25        # ページ下部のこの割合（かつフッター高さの上限以上）を除外
+DUPLICATE_INDEX_MAX_ENTRIES = 50000
+DUPLICATE_INDEX_PRUNE_INTERVAL = 1000   # この件数の登録ごとに、上限を超えた古い行をファイルから削除
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_random = np.random.RandomState(20240501)
+_PERM_A = _random.randint(1, _MERSENNE_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _random.randint(0, _MERSENNE_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_ROWS_PER_BAND = MINHASH_PERMUTATIONS // LSH_BANDS
+
+
+def normalize_body_text(text):
+    """全角・半角の揺れと空白を除いた照合用テキスト"""
+    text = unicodedata.normalize('NFKC', text or '')
+    return ''.join(text.split())
+
+
+def minhash_signature(text):
+    """正規化済みテキストの文字n-gramのMinHash（文字量が少なければNone）"""
+    if len(text) < SHINGLE_SIZE + MIN_SHINGLES - 1:
+        return None
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    values = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') for s in shingles],
+        dtype=np.uint64,
+    )
+    # (a * x + b) mod p を64bitの桁あふれ込みで計算（datasketchと同じ方式）
+    with np.errstate(over='ignore'):
+        permuted = (values[:, None] * _PERM_A + _PERM_B) % _MERSENNE_PRIME
+    return (permuted & np.uint64(0xFFFFFFFF)).min(axis=0).astype(np.uint32)
+
+
+def dhash(image):
+    """グレースケール画像の64bit差分ハッシュ"""
+    small = np.asarray(image.convert('L').resize((9, 8)), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+def body_cut_pt(page_height_pt):
+    """ページ下端から除外する高さ（どの業者のフッターも含まれる高さ）"""
+    return max(page_height_pt * BODY_MIN_FOOTER_RATIO, VECTOR_MAX_HEIGHT_MM * 72 / 25.4)
+
+
+def page_signature(pdf_data, page_index=0):
+    """1ページ目の本文領域（フッター除外）のテキストMinHashと画像dHash"""
+    document = pdfium.PdfDocument(pdf_data)
+    try:
+        page = document[page_index]
+        try:
+            _, height = page.get_size()
+            textpage = page.get_textpage()
+            try:
+                if page.get_rotation() == 0:
+                    text = textpage.get_text_bounded(bottom=body_cut_pt(height))
+                else:
+                    text = textpage.get_text_range()
+            finally:
+                textpage.close()
+
+            display_height = page.get_height()
+            crop = (0, body_cut_pt(display_height), 0, 0)
+            image = page.render(scale=DHASH_DPI / 72, crop=crop).to_pil()
+        finally:
+            page.close()
+    finally:
+        document.close()
+
+    return {
+        'minhash': minhash_signature(normalize_body_text(text)),
+        'dhash': dhash(image),
+    }
+
+
+def _band_keys(minhash):
+    return [minhash[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND].tobytes() for band in range(LSH_BANDS)]
+
+
+def _dhash_chunks(value):
+    return [(value >> (16 * chunk)) & 0xFFFF for chunk in range(DHASH_CHUNKS)]
+
+
+class DuplicateIndex:
+    """ほぼ重複のマイソクを検索するインデックス（件数上限付き・SQLiteファイルでプロセス間共有）
+
+    path: SQLiteファイル（Noneならメモリ上だけで保持）
+    """
+
+    def __init__(self, path=None, max_entries=DUPLICATE_INDEX_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # 内容ハッシュ -> {'minhash', 'dhash', 'meta'}
+        self._text_buckets = [{} for _ in range(LSH_BANDS)]
+        self._image_buckets = [{} for _ in range(DHASH_CHUNKS)]
+        self._synced_seq = 0            # 読み込み済みの最後の行
+        self._added = 0
+        if path:
+            self._init_db()
+            self.sync()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _bucket_keys(self, entry):
+        keys = []
+        if entry['minhash'] is not None:
+            keys += [(self._text_buckets[band], key) for band, key in enumerate(_band_keys(entry['minhash']))]
+        if entry['dhash'] is not None:
+            keys += [(self._image_buckets[chunk], key) for chunk, key in enumerate(_dhash_chunks(entry['dhash']))]
+        return keys
+
+    def _insert(self, key, entry):
+        self._remove(key)
+        self._entries[key] = entry
+        for buckets, bucket_key in self._bucket_keys(entry):
+            buckets.setdefault(bucket_key, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for buckets, bucket_key in self._bucket_keys(entry):
+            members = buckets.get(bucket_key)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del buckets[bucket_key]
+
+    def _compare(self, signature, entry):
+        """(ほぼ重複か, テキスト類似度, 画像のハミング距離)"""
+        similarity = None
+        if signature['minhash'] is not None and entry['minhash'] is not None:
+            similarity = float(np.mean(signature['minhash'] == entry['minhash']))
+        distance = None
+        if signature['dhash'] is not None and entry['dhash'] is not None:
+            distance = bin(signature['dhash'] ^ entry['dhash']).count('1')
+        if similarity is not None:
+            return similarity >= TEXT_SIMILARITY_THRESHOLD, similarity, distance
+        return distance is not None and distance <= DHASH_MAX_DISTANCE, similarity, distance
+
+    def find(self, content_key, signature):
+        """最も近い既存エントリを返す（無ければNone）"""
+        self.sync()
+        with self._lock:
+            entry = self._entries.get(content_key)
+            if entry is not None:
+                return {'key': content_key, 'exact': True, 'similarity': 1.0, 'image_distance': 0,
+                        'meta': entry['meta']}
+
+            candidates = set()
+            for buckets, bucket_key in self._bucket_keys(signature):
+                candidates.update(buckets.get(bucket_key, ()))
+
+            best = None
+            for key in candidates:
+                entry = self._entries[key]
+                matched, similarity, distance = self._compare(signature, entry)
+                if not matched:
+                    continue
+                score = similarity if similarity is not None else 1 - distance / 64
+                if best is None or score > best[0]:
+                    best = (score, key, similarity, distance)
+            if best is None:
+                return None
+            _, key, similarity, distance = best
+            self._entries.move_to_end(key)
+            return {'key': key, 'exact': False, 'similarity': similarity, 'image_distance': distance,
+                    'meta': self._entries[key]['meta']}
+
+    def add(self, content_key, signature, meta=None):
+        """エントリを登録（同じ内容の再登録では既存の付加情報に上書きでまとめる）"""
+        self.sync()
+        with self._lock:
+            previous = self._entries.get(content_key)
+            merged = dict(previous['meta'], **(meta or {})) if previous else (meta or {})
+            entry = {'minhash': signature['minhash'], 'dhash': signature['dhash'], 'meta': merged}
+            self._insert(content_key, entry)
+            if not self.path:
+                return
+            try:
+                with self._connect() as conn:
+                    # 置き換えで行番号が新しくなり、他のプロセスにも最近の登録として読み込まれる
+                    conn.execute('DELETE FROM duplicate_entries WHERE content_key = ?', (content_key,))
+                    cursor = conn.execute(
+                        'INSERT INTO duplicate_entries (content_key, minhash, dhash, meta) VALUES (?, ?, ?, ?)',
+                        (content_key,
+                         entry['minhash'].tobytes() if entry['minhash'] is not None else None,
+                         # SQLiteの整数は符号付き64bitのため16進文字列で保存
+                         format(entry['dhash'], 'x') if entry['dhash'] is not None else None,
+                         json.dumps(merged, ensure_ascii=False)))
+                    if cursor.lastrowid == self._synced_seq + 1:
+                        self._synced_seq = cursor.lastrowid
+                    self._added += 1
+                    if self._added % DUPLICATE_INDEX_PRUNE_INTERVAL == 0:
+                        conn.execute('DELETE FROM duplicate_entries WHERE seq <= ?',
+                                     (cursor.lastrowid - self.max_entries,))
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ 重複インデックスに保存できませんでした: {e}")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS duplicate_entries (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    content_key TEXT NOT NULL,
+                    minhash BLOB,
+                    dhash TEXT,
+                    meta TEXT NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS duplicate_entries_key ON duplicate_entries (content_key)')
+
+    def sync(self):
+        """他のプロセスが登録した分（前回読み込んだ行より後）を読み込む"""
+        if not self.path:
+            return
+        try:
+            with self._lock:
+                with self._connect() as conn:
+                    rows = conn.execute(
+                        'SELECT seq, content_key, minhash, dhash, meta FROM duplicate_entries'
+                        ' WHERE seq > ? ORDER BY seq', (self._synced_seq,)).fetchall()
+                loaded = len(self._entries)
+                for seq, key, minhash, dhash_value, meta in rows:
+                    self._insert(key, {
+                        'minhash': np.frombuffer(minhash, dtype=np.uint32) if minhash else None,
+                        'dhash': int(dhash_value, 16) if dhash_value else None,
+                        'meta': json.loads(meta),
+                    })
+                    self._synced_seq = seq
+            if rows and not loaded:
+                logger.info(f"📚 重複インデックスを読み込みました: {len(self._entries)}件")
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"⚠️ 重複インデックスを読み込めませんでした: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'text_buckets': sum(len(buckets) for buckets in self._text_buckets),
+                'image_buckets': sum(len(buckets) for buckets in self._image_buckets),
+            }
@@ -0,0 +1,131 @@
+"""
+事業者フッターのキーワード照合（ページ検出・白塗り範囲・Claudeプロンプトで共有）
+
+カテゴリごとの語句・パターンを名前付きグループの1つの正規表現にまとめ、複数行を改行でつないで
+1回の走査で照合する。行のスコアは、その行に現れたカテゴリの重みの合計（同じカテゴリは1回だけ数える）。
+
+- license_number: 宅建業免許番号（東京都知事(3)第12345号、国土交通大臣(1)第1234号、宅建・免許）
+- corporate: 法人格（株式会社・有限会社・(株) 等）
+- contact: 連絡先（TEL・FAX・電話・電話番号の形）
+- transaction: 取引態様（仲介・媒介・代理・売主・AD・手数料）
+- realty: 不動産・賃貸・売買（本文にも現れるため単独ではフッターとみなさない）
+
+照合前にNFKC正規化するため、全角英数字・全角括弧・㈱・℡ なども同じパターンで照合できる。
+"""
+
+import re
+import unicodedata
+from bisect import bisect_right
+
+# (名前, 重み, 語句, 語句以外のパターン [(先頭になりうる文字, 正規表現)], Claudeプロンプトに載せる説明)
+FOOTER_KEYWORD_CATEGORIES = (
+    ('corporate', 5,
+     ('株式会社', '有限会社', '合同会社', '合資会社', '(株)', '(有)'),
+     (),
+     '会社名（株式会社○○、○○不動産、有限会社○○）'),
+    ('license_number', 6,
+     ('宅地建物取引業', '宅建', '免許', '知事', '大臣'),
+     (('知大', r'(?:知事|大臣)\s*\(\s*\d{1,2}\s*\)\s*第?\s*\d{1,6}\s*号'),),
+     '宅建業免許番号（東京都知事（○）第○○号、国土交通大臣（○）第○○号）'),
+    ('contact', 4,
+     ('TEL', 'FAX', 'Tel', 'Fax', 'tel', 'fax', '電話'),
+     (('-', r'(?<=\d\d)-\d{2,4}-\d{3,4}(?!\d)'),),   # 電話番号（数字ではなく「-」から照合を始める）
+     '連絡先（TEL、FAX、住所）'),
+    ('transaction', 3,
+     ('取引態様', '仲介', '媒介', '代理', '売主', '貸主', '手数料', '広告料', 'AD'),
+     (),
+     '取引形態（仲介、媒介、代理、売主）、AD情報、手数料情報'),
+    ('realty', 1,
+     ('不動産', '賃貸', '売買'),
+     (),
+     None),
+)
+FOOTER_CATEGORY_WEIGHTS = {name: weight for name, weight, _, _, _ in FOOTER_KEYWORD_CATEGORIES}
+FOOTER_LINE_MIN_SCORE = 2   # これ以上のスコアの行を事業者情報の行とみなす（realty 単独は除く）
+
+
+def _keyword_pattern(keyword):
+    """英字の語句（AD・TEL等）は英単語の一部でないものだけ一致させる
+
+    前後の判定は語句が一致した後の後読み・先読みで行う（先頭に後読みを置くと全ての位置で評価され遅い）。
+    """
+    pattern = re.escape(keyword)
+    if keyword.isascii() and keyword.isalpha():
+        pattern += f"(?<![A-Za-z]{'.' * len(keyword)})(?![A-Za-z])"
+    return pattern
+
+
+def _build_pattern(categories):
+    """カテゴリごとの名前付きグループの選択に、先頭文字の先読みを付けた1つの正規表現
+
+    先頭文字の文字クラスがあると、候補にならない位置を正規表現エンジンが選択を試さずに読み飛ばす。
+    """
+    leads = set()
+    groups = []
+    for name, _, keywords, patterns, _ in categories:
+        leads.update(keyword[0] for keyword in keywords)
+        for lead, _ in patterns:
+            leads.update(lead)
+        alternatives = [pattern for _, pattern in patterns]
+        alternatives += [_keyword_pattern(keyword) for keyword in sorted(keywords, key=len, reverse=True)]
+        groups.append(f"(?P<{name}>{'|'.join(alternatives)})")
+    lead_class = ''.join(re.escape(char) for char in sorted(leads))
+    return re.compile(f"(?=[{lead_class}])(?:{'|'.join(groups)})")
+
+
+_FOOTER_PATTERN = _build_pattern(FOOTER_KEYWORD_CATEGORIES)
+# NFKC正規化で照合結果が変わる文字（全角英数字・記号、㈱㈲㍿℡、全角空白）
+_WIDE_CHARS = re.compile('[\uff01-\uff5e\u3231\u3232\u337f\u2121\u3000]+')
+
+
+def _normalize_run(match):
+    return unicodedata.normalize('NFKC', match.group())
+
+
+def normalize(text):
+    """全角英数字・記号等だけをNFKC正規化する（文字列全体の正規化より速い）"""
+    return _WIDE_CHARS.sub(_normalize_run, text or '')
+
+
+def iter_matches(text):
+    """(カテゴリ名, 一致した文字列) を出現順に返す"""
+    for match in _FOOTER_PATTERN.finditer(normalize(text)):
+        yield match.lastgroup, match.group()
+
+
+def score_categories(categories):
+    return sum(FOOTER_CATEGORY_WEIGHTS[name] for name in categories)
+
+
+def score_line(text):
+    """1行の (スコア, 現れたカテゴリの集合)"""
+    categories = frozenset(name for name, _ in iter_matches(text))
+    return score_categories(categories), categories
+
+
+def score_lines(lines):
+    """複数行をまとめて1回の走査で照合し、行ごとの (スコア, カテゴリの集合) を返す"""
+    lines = [line.replace('\n', ' ') for line in lines]
+    text = normalize('\n'.join(lines))
+    starts = [0]
+    position = text.find('\n')
+    while position >= 0:
+        starts.append(position + 1)
+        position = text.find('\n', position + 1)
+
+    found = {}
+    for match in _FOOTER_PATTERN.finditer(text):
+        found.setdefault(bisect_right(starts, match.start()) - 1, set()).add(match.lastgroup)
+    empty = (0, frozenset())
+    return [(score_categories(found[index]), frozenset(found[index])) if index in found else empty
+            for index in range(len(lines))]
+
+
+def is_footer_text(text, min_score=FOOTER_LINE_MIN_SCORE):
+    return score_line(text)[0] >= min_score
+
+
+def prompt_elements():
+    """Claudeプロンプトの【事業者情報の必須要素】（照合と同じカテゴリから作る）"""
+    hints = [hint for _, _, _, _, hint in FOOTER_KEYWORD_CATEGORIES if hint]
+    return '\n'.join(f"{index}. {hint}" for index, hint in enumerate(hints, 1))
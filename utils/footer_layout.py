@@ -0,0 +1,315 @@
+"""
+会社情報フッターのフォント・文字列幅・配置の事前計算とレイアウト解決
+
+add_company_footer が毎ページ行っていたフォント選択と配置計算を
+会社情報（プロフィール）ごとに1回だけ行い、JSONで保存できる形にする。
+フッター枠に収まる配置（カラム幅・フォントサイズ・ベースライン）は
+(プロフィール, フッター幅, フッター高さの区分) ごとに1回だけ解いてキャッシュする。
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+logger = logging.getLogger(__name__)
+
+FOOTER_ASSETS_VERSION = 2
+
+# 日本語フォントの候補（ゴシック → 明朝 → 汎用）、すべて失敗したら欧文フォント
+FOOTER_FONT_CANDIDATES = ['HeiseiKakuGo-W5', 'HeiseiMin-W3', 'STSong-Light']
+FOOTER_FALLBACK_FONTS = ['Times-Roman', 'Helvetica']
+
+# 水平レイアウト設計: 3カラム構成（ページ幅に対する割合）
+# 左カラム: 宅建番号 + 会社名 / 中央カラム: 住所 + 電話番号 / 右カラム: メール + Web
+FOOTER_COLUMNS = {'left': 0.35, 'center': 0.45, 'right': 0.2}
+FOOTER_MARGIN_MM = 8           # 左右マージン
+FOOTER_VERTICAL_MARGIN_MM = 4  # 上下マージン
+FOOTER_TOP_OFFSET_MM = 2       # 上から少し下げて開始
+FOOTER_LINE_GAP_MM = 8         # 上段と下段の間隔
+FOOTER_COLUMN_GAP_MM = 4       # カラム間の最小間隔
+FOOTER_MIN_ROW_GAP_MM = 1      # 高さが足りない場合の上段・下段の最小間隔
+FOOTER_MIN_FONT_SIZE = 5       # 縮小時の下限フォントサイズ（pt）
+FOOTER_HEIGHT_BUCKET_MM = 2    # レイアウトキャッシュのフッター高さ区分
+FOOTER_LAYOUT_CACHE_SIZE = 512
+
+# CJKフォントのおおよそのアセント・ディセント（フォントサイズ比）
+FONT_ASCENT = 0.88
+FONT_DESCENT = 0.12
+
+COLUMN_ORDER = ('left', 'center', 'right')
+
+_footer_font_name = None
+_registered_fonts = set()
+_register_lock = threading.Lock()
+
+
+def get_footer_font():
+    """フッター用フォントを登録して名前を返す（登録はプロセスで1回だけ）"""
+    global _footer_font_name
+    if _footer_font_name:
+        return _footer_font_name
+
+    for font_name in FOOTER_FONT_CANDIDATES:
+        try:
+            pdfmetrics.registerFont(UnicodeCIDFont(font_name))
+            _registered_fonts.add(font_name)
+            _footer_font_name = font_name
+            logger.info(f"日本語フォント設定成功: {font_name}")
+            return font_name
+        except Exception as font_error:
+            logger.warning(f"日本語フォント登録失敗: {font_name} - {font_error}")
+
+    logger.warning("すべての日本語フォント設定に失敗、欧文フォントにフォールバック")
+    _footer_font_name = FOOTER_FALLBACK_FONTS[0]
+    return _footer_font_name
+
+
+def ensure_footer_font(font_name):
+    """アセットに記録されたフォントをこのプロセスで使えるようにする
+
+    保存済みのプロフィールを別のプロセス（再起動後・プロセスプール・batch_convert）で読み込んだ場合、
+    build_footer_assets を通らないため CIDフォントが未登録のまま setFont が KeyError になる。
+    """
+    if font_name in _registered_fonts:
+        return font_name
+    with _register_lock:
+        try:
+            pdfmetrics.getFont(font_name)
+        except KeyError:
+            if font_name in FOOTER_FONT_CANDIDATES:
+                pdfmetrics.registerFont(UnicodeCIDFont(font_name))
+            else:
+                raise
+        _registered_fonts.add(font_name)
+    return font_name
+
+
+def footer_items(company_info):
+    """会社情報からフッターに描画する文字列の一覧を作成
+
+    各要素は key / text / size(pt) / column / row（top or bottom）を持つ。
+    """
+    items = []
+
+    # 左カラム: 宅建番号（上）+ 会社名（下）
+    license_number = company_info.get('license_number', '')
+    company_name = company_info.get('company_name', '不動産会社')
+    if license_number:
+        items.append({'key': 'license_number', 'text': f"免許番号: {license_number}",
+                      'size': 8, 'column': 'left', 'row': 'top'})
+    if company_name:
+        items.append({'key': 'company_name', 'text': company_name,
+                      'size': 20, 'column': 'left', 'row': 'bottom'})
+
+    # 中央カラム: 住所（上）+ 電話番号（下）
+    address = company_info.get('address', '')
+    postal_code = company_info.get('postal_code', '')
+    phone = company_info.get('phone', '')
+    fax = company_info.get('fax', '')
+    if address:
+        address_text = f"〒{postal_code} {address}" if postal_code else address
+        items.append({'key': 'address', 'text': address_text,
+                      'size': 9, 'column': 'center', 'row': 'top'})
+    if phone:
+        contact_line = f"TEL: {phone}"
+        if fax:
+            contact_line += f" / FAX: {fax}"
+        items.append({'key': 'contact', 'text': contact_line,
+                      'size': 9, 'column': 'center', 'row': 'bottom'})
+
+    # 右カラム: メール（上）+ Web（下）※オプション
+    email = company_info.get('email', '')
+    website = company_info.get('website', '')
+    if email:
+        items.append({'key': 'email', 'text': f"E-mail: {email}",
+                      'size': 8, 'column': 'right', 'row': 'top'})
+    if website:
+        items.append({'key': 'website', 'text': f"Web: {website}",
+                      'size': 8, 'column': 'right', 'row': 'bottom'})
+
+    return items
+
+
+def build_footer_assets(company_info):
+    """フッター描画用アセット（フォント・文字列幅・配置パラメータ）を事前計算"""
+    font_name = get_footer_font()
+    items = footer_items(company_info)
+    for item in items:
+        # 基準サイズでの文字列幅（pt）
+        item['width'] = round(pdfmetrics.stringWidth(item['text'], font_name, item['size']), 2)
+
+    # レイアウトキャッシュのキー（フォントと描画内容が同じなら同じ値）
+    fingerprint = hashlib.sha1(
+        json.dumps([font_name, items], ensure_ascii=False, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+
+    return {
+        'version': FOOTER_ASSETS_VERSION,
+        'fingerprint': fingerprint,
+        'font_name': font_name,
+        'items': items,
+        'columns': dict(FOOTER_COLUMNS),
+        'margin_mm': FOOTER_MARGIN_MM,
+        'vertical_margin_mm': FOOTER_VERTICAL_MARGIN_MM,
+        'top_offset_mm': FOOTER_TOP_OFFSET_MM,
+        'line_gap_mm': FOOTER_LINE_GAP_MM,
+    }
+
+
+def is_valid_footer_assets(assets):
+    """保存済みアセットが現在の形式で使えるか確認"""
+    return bool(assets) and assets.get('version') == FOOTER_ASSETS_VERSION and 'items' in assets
+
+
+_layout_cache = OrderedDict()
+_layout_cache_lock = threading.Lock()
+layout_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def solve_footer_layout(assets, page_width, footer_height):
+    """フッター枠に収まる配置を返す（(プロフィール, 幅, 高さ区分) 単位でキャッシュ）
+
+    高さは FOOTER_HEIGHT_BUCKET_MM 単位で切り下げて解くため、
+    同じ区分内のどの高さでも枠からはみ出さない。
+    """
+    ensure_footer_font(assets['font_name'])
+    bucket = int(footer_height // (FOOTER_HEIGHT_BUCKET_MM * mm))
+    key = (assets['fingerprint'], round(page_width, 1), bucket)
+
+    with _layout_cache_lock:
+        layout = _layout_cache.get(key)
+        if layout is not None:
+            _layout_cache.move_to_end(key)
+            layout_cache_stats['hits'] += 1
+            return layout
+
+    layout = _solve_layout(assets, page_width, max(bucket, 1) * FOOTER_HEIGHT_BUCKET_MM * mm)
+
+    with _layout_cache_lock:
+        layout_cache_stats['misses'] += 1
+        _layout_cache[key] = layout
+        if len(_layout_cache) > FOOTER_LAYOUT_CACHE_SIZE:
+            _layout_cache.popitem(last=False)
+    return layout
+
+
+def _solve_layout(assets, page_width, footer_height):
+    """カラム幅・フォントサイズ・ベースラインを計算"""
+    font_name = assets['font_name']
+    items = assets['items']
+    margin = assets['margin_mm'] * mm
+    vertical_margin = assets['vertical_margin_mm'] * mm
+    column_gap = FOOTER_COLUMN_GAP_MM * mm
+
+    # --- 垂直方向: 上段・下段の最大フォントサイズから縮小率の上限を決定 ---
+    row_size = {'top': 0, 'bottom': 0}
+    for item in items:
+        row_size[item['row']] = max(row_size[item['row']], item['size'])
+    used_rows = [r for r in ('top', 'bottom') if row_size[r]]
+    content_height = footer_height - 2 * vertical_margin
+    row_gap = FOOTER_MIN_ROW_GAP_MM * mm if len(used_rows) == 2 else 0
+    required = sum(row_size[r] for r in used_rows) + row_gap
+    vertical_scale = min(1.0, max(content_height, 0) / required) if required else 1.0
+
+    # --- 水平方向: 全カラムが収まる最大の縮小率を二分探索（下限サイズの項目はそれ以上縮まない） ---
+    used_columns = [c for c in COLUMN_ORDER if any(item['column'] == c for item in items)]
+    available = page_width - 2 * margin - column_gap * max(len(used_columns) - 1, 0)
+
+    def column_demand(scale):
+        demand = dict.fromkeys(used_columns, 0)
+        for item in items:
+            size = max(item['size'] * scale, FOOTER_MIN_FONT_SIZE)
+            demand[item['column']] = max(demand[item['column']], item['width'] * size / item['size'])
+        return demand
+
+    scale = vertical_scale
+    if sum(column_demand(scale).values()) > available:
+        low, high = 0.0, scale
+        for _ in range(20):
+            middle = (low + high) / 2
+            if sum(column_demand(middle).values()) <= available:
+                low = middle
+            else:
+                high = middle
+        scale = low
+
+    # カラム幅: 必要幅 + 余白を従来のカラム比率（35/45/20%）で配分
+    demand = column_demand(scale)
+    slack = max(available - sum(demand.values()), 0)
+    fraction_total = sum(assets['columns'][c] for c in used_columns) or 1
+    widths = {c: demand[c] + slack * assets['columns'][c] / fraction_total for c in used_columns}
+
+    column_x = {}
+    x = margin
+    for c in used_columns:
+        column_x[c] = x
+        x += widths[c] + column_gap
+
+    scaled_row = {r: max(row_size[r] * scale, FOOTER_MIN_FONT_SIZE) if row_size[r] else 0 for r in row_size}
+
+    # 従来の配置（上から2mm下げて開始、上段と下段は8mm間隔）が収まればそれを使う
+    top_y = footer_height - vertical_margin - assets['top_offset_mm'] * mm
+    bottom_y = top_y - assets['line_gap_mm'] * mm
+    natural_fits = (
+        top_y + scaled_row['top'] * FONT_ASCENT <= footer_height
+        and bottom_y - scaled_row['bottom'] * FONT_DESCENT >= vertical_margin
+        and top_y - scaled_row['top'] * FONT_DESCENT >= bottom_y + scaled_row['bottom'] * FONT_ASCENT
+    )
+    if not natural_fits:
+        if len(used_rows) == 2:
+            top_y = footer_height - vertical_margin - scaled_row['top'] * FONT_ASCENT
+            bottom_y = vertical_margin + scaled_row['bottom'] * FONT_DESCENT
+        else:
+            # 1段だけの場合は上下中央に配置
+            only = scaled_row[used_rows[0]] if used_rows else 0
+            center_y = (footer_height - only) / 2 + only * FONT_DESCENT
+            top_y = bottom_y = center_y
+    row_y = {'top': top_y, 'bottom': bottom_y}
+
+    # --- 各項目のサイズ・位置（カラム幅を超える場合のみ再計測して省略） ---
+    placed = []
+    overflow = False
+    for item in items:
+        size = max(item['size'] * scale, FOOTER_MIN_FONT_SIZE)
+        text = item['text']
+        width = item['width'] * size / item['size']
+        column_width = widths[item['column']]
+        if width > column_width + 0.5:
+            overflow = True
+            text, width = _truncate_to_width(text, font_name, size, column_width)
+        placed.append({
+            'key': item['key'],
+            'text': text,
+            'size': round(size, 2),
+            'x': column_x[item['column']],
+            'y': row_y[item['row']],
+            'width': width,
+        })
+
+    return {
+        'font_name': font_name,
+        'items': placed,
+        'scale': round(scale, 3),
+        'overflow': overflow,
+        'footer_height': footer_height,
+    }
+
+
+def _truncate_to_width(text, font_name, size, max_width):
+    """末尾を「…」で省略して幅に収める（二分探索で計測回数を抑える）"""
+    ellipsis = '…'
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if pdfmetrics.stringWidth(text[:middle] + ellipsis, font_name, size) <= max_width:
+            low = middle
+        else:
+            high = middle - 1
+    truncated = text[:low] + ellipsis if low < len(text) else text
+    return truncated, pdfmetrics.stringWidth(truncated, font_name, size)
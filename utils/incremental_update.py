@@ -0,0 +1,236 @@
+"""
+増分更新（incremental update）によるオーバーレイの書き出し
+
+PdfWriter.write は触っていない画像を含む全オブジェクトを書き直すため、画像の多い
+マイソクでは出力時間とメモリが文書サイズに比例する。ここでは元のPDFのバイト列は
+そのままに、末尾へ次だけを追記する。
+
+- オーバーレイ（白塗り＋会社情報）を Form XObject として1形状区分につき1つ
+- オーバーレイが使うフォント等のオブジェクト
+- 変更したページ辞書（/Contents を q … Q + XObject描画で挟み、/Resources に XObject を追加）
+- 追記分だけの相互参照（元がXRefストリームならXRefストリーム）と /Prev 付きトレーラ
+"""
+
+import zlib
+
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject
+
+from utils.pdf_optimize import COMPRESS_LEVEL, ObjectSerializer
+
+OVERLAY_XOBJECT_NAME = '/MysoukuFooter'
+
+
+def _last_xref_offset(pdf_data):
+    """末尾の startxref が指す相互参照の位置"""
+    tail = pdf_data[-2048:]
+    index = tail.rfind(b'startxref')
+    if index < 0:
+        raise ValueError("startxref が見つかりません")
+    return int(tail[index + len(b'startxref'):].split()[0])
+
+
+def _next_object_number(reader):
+    """追加オブジェクトに使う最初の番号（XRefストリームの文書ではトレーラに /Size が残らないため索引からも求める）"""
+    numbers = [int(reader.trailer.get('/Size', 0)) - 1]
+    for entries in reader.xref.values():
+        numbers.extend(entries.keys())
+    numbers.extend(getattr(reader, 'xref_objStm', {}).keys())
+    return max(numbers) + 1
+
+
+def _uses_xref_stream(pdf_data, offset):
+    return not pdf_data[offset:offset + 32].lstrip().startswith(b'xref')
+
+
+class IncrementalUpdate:
+    """元のPDFに追記するオブジェクトを組み立てる"""
+
+    def __init__(self, pdf_data, reader):
+        if reader.is_encrypted:
+            raise ValueError("暗号化PDFには増分更新できません")
+        self.pdf_data = pdf_data
+        self.reader = reader
+        self.next_number = _next_object_number(reader)
+        self.bodies = {}      # オブジェクト番号 -> (世代番号, 本体バイト列)
+        self._copied = {}     # 他の文書（オーバーレイ）から複製したオブジェクト -> 新番号
+        self._pending = []
+        self._xobjects = {}   # オーバーレイページ -> XObject番号
+        self._shared_streams = {}
+        self.serializer = ObjectSerializer(self._ref_number)
+
+    def allocate(self):
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def _ref_number(self, ref):
+        if ref.pdf is self.reader:
+            # 元の文書のオブジェクトは番号・世代をそのまま参照
+            return ref.idnum, ref.generation
+        if ref.pdf is self:
+            return ref.idnum
+        key = (id(ref.pdf), ref.idnum, ref.generation)
+        number = self._copied.get(key)
+        if number is None:
+            number = self.allocate()
+            self._copied[key] = number
+            self._pending.append((number, ref))
+        return number
+
+    def _flush_pending(self):
+        """参照されたオーバーレイ側のオブジェクト（フォント等）を複製"""
+        while self._pending:
+            number, ref = self._pending.pop()
+            obj = ref.get_object()
+            if hasattr(obj, '_data'):
+                data = obj._data or b""
+                body = self.serializer.stream(obj, data.encode('latin-1') if isinstance(data, str) else data)
+            else:
+                body = self.serializer.value(obj)
+            self.bodies[number] = (0, body)
+
+    def _stream(self, data, extra=b""):
+        packed = zlib.compress(data, COMPRESS_LEVEL)
+        return (b"<<" + extra + f" /Filter /FlateDecode /Length {len(packed)}>>\nstream\n".encode()
+                + packed + b"\nendstream")
+
+    def _shared_stream(self, data):
+        """ページ間で共有する短いコンテンツストリーム（q / Q + XObject描画）"""
+        number = self._shared_streams.get(data)
+        if number is None:
+            number = self.allocate()
+            self.bodies[number] = (0, self._stream(data))
+            self._shared_streams[data] = number
+        return number
+
+    def overlay_xobject(self, overlay_page, bbox):
+        """オーバーレイページを Form XObject として追加（同じページは1回だけ）"""
+        key = id(overlay_page)
+        if key in self._xobjects:
+            return self._xobjects[key]
+        number = self.allocate()
+        content = overlay_page.get_contents().get_data()
+        resources = overlay_page['/Resources'].get_object() if '/Resources' in overlay_page else DictionaryObject()
+        bbox_bytes = " ".join(f"{value:g}" for value in bbox).encode()
+        extra = (b" /Type /XObject /Subtype /Form /FormType 1 /BBox [" + bbox_bytes + b"] /Resources "
+                 + self.serializer.value(resources))
+        self.bodies[number] = (0, self._stream(content, extra))
+        self._xobjects[key] = number
+        self._flush_pending()
+        return number
+
+    def attach_overlay(self, page, xobject_number):
+        """ページ辞書を書き換えて最前面にXObjectを描画させる"""
+        page_ref = page.indirect_ref
+        if page_ref is None:
+            raise ValueError("ページが間接オブジェクトではありません")
+
+        contents = page.raw_get('/Contents') if '/Contents' in page else None
+        if contents is None:
+            content_refs = []
+        elif isinstance(contents, IndirectObject):
+            content_refs = [contents]
+        elif isinstance(contents, ArrayObject):
+            content_refs = list(contents)
+        else:
+            raise ValueError("ページの /Contents が直接オブジェクトです")
+
+        resources = page['/Resources'].get_object() if '/Resources' in page else DictionaryObject()
+        xobjects = resources['/XObject'].get_object() if '/XObject' in resources else DictionaryObject()
+        name = OVERLAY_XOBJECT_NAME
+        suffix = 1
+        while name in xobjects:
+            name = f"{OVERLAY_XOBJECT_NAME}{suffix}"
+            suffix += 1
+
+        new_xobjects = DictionaryObject(xobjects)
+        new_xobjects[NameObject(name)] = IndirectObject(xobject_number, 0, self)
+        new_resources = DictionaryObject(resources)
+        new_resources[NameObject('/XObject')] = new_xobjects
+
+        # 元の描画状態の変更がオーバーレイに及ばないよう q … Q で囲む
+        head = self._shared_stream(b"q\n")
+        tail = self._shared_stream(f"\nQ\nq {name} Do Q\n".encode())
+        new_contents = ArrayObject(
+            [IndirectObject(head, 0, self)] + content_refs + [IndirectObject(tail, 0, self)]
+        )
+
+        items = [(key, value) for key, value in page.items() if key not in ('/Contents', '/Resources')]
+        items += [('/Contents', new_contents), ('/Resources', new_resources)]
+        self.bodies[page_ref.idnum] = (page_ref.generation, self.serializer.dictionary(items))
+        self._flush_pending()
+
+    def build(self):
+        """追記部分（オブジェクト・相互参照・トレーラ）のバイト列を返す"""
+        prev = _last_xref_offset(self.pdf_data)
+        base = len(self.pdf_data)
+        chunks = [] if self.pdf_data.endswith(b"\n") else [b"\n"]
+        position = base + sum(len(chunk) for chunk in chunks)
+        offsets = {}
+        for number in sorted(self.bodies):
+            generation, body = self.bodies[number]
+            chunk = f"{number} {generation} obj\n".encode() + body + b"\nendobj\n"
+            offsets[number] = (position, generation)
+            chunks.append(chunk)
+            position += len(chunk)
+
+        trailer = self.reader.trailer
+        entries = [f"/Prev {prev}".encode()]
+        for name in ('/Root', '/Info'):
+            ref = trailer.raw_get(name) if name in trailer else None
+            if isinstance(ref, IndirectObject):
+                entries.append(f"{name} {ref.idnum} {ref.generation} R".encode())
+        if '/ID' in trailer:
+            entries.append(b"/ID " + self.serializer.value(trailer['/ID']))
+
+        if _uses_xref_stream(self.pdf_data, prev):
+            xref_number = self.allocate()
+            offsets[xref_number] = (position, 0)
+            numbers = sorted(offsets)
+            rows = b"".join(
+                bytes([1]) + offsets[number][0].to_bytes(4, 'big') + offsets[number][1].to_bytes(2, 'big')
+                for number in numbers
+            )
+            index = " ".join(f"{start} {count}" for start, count in _subsections(numbers))
+            extra = (f" /Type /XRef /Size {self.next_number} /W [1 4 2] /Index [{index}] ".encode()
+                     + b" ".join(entries))
+            chunks.append(f"{xref_number} 0 obj\n".encode() + self._stream(rows, extra) + b"\nendobj\n")
+        else:
+            numbers = sorted(offsets)
+            lines = [b"xref\n"]
+            for start, count in _subsections(numbers):
+                lines.append(f"{start} {count}\n".encode())
+                for number in range(start, start + count):
+                    offset, generation = offsets[number]
+                    lines.append(f"{offset:010d} {generation:05d} n \n".encode())
+            lines.append(f"trailer\n<< /Size {self.next_number} ".encode() + b" ".join(entries) + b" >>\n")
+            chunks.append(b"".join(lines))
+
+        chunks.append(f"startxref\n{position}\n%%EOF\n".encode())
+        return b"".join(chunks)
+
+
+def _subsections(numbers):
+    """昇順のオブジェクト番号を連続区間 [(開始番号, 個数), ...] にまとめる"""
+    sections = []
+    for number in numbers:
+        if sections and sections[-1][0] + sections[-1][1] == number:
+            sections[-1][1] += 1
+        else:
+            sections.append([number, 1])
+    return [(start, count) for start, count in sections]
+
+
+def write_incremental_update(pdf_data, reader, page_overlays, geometry_table):
+    """ページごとのオーバーレイを増分更新として追記したPDFを返す
+
+    page_overlays: {ページ番号: オーバーレイページ（PyPDF2, ユーザー空間へ変換済み）}
+    """
+    update = IncrementalUpdate(pdf_data, reader)
+    for page_num in sorted(page_overlays):
+        overlay_page = page_overlays[page_num]
+        if overlay_page is None:
+            continue
+        xobject_number = update.overlay_xobject(overlay_page, geometry_table[page_num].cropbox)
+        update.attach_overlay(reader.pages[page_num], xobject_number)
+    return pdf_data + update.build()
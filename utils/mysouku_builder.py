@@ -0,0 +1,175 @@
+"""
+簡易マイソクPDFの組版（1物件・一括）
+
+スタイルシート・ParagraphStyle・TableStyle・フォント登録は最初の利用時に1回だけ行い、
+一括生成では全物件を1回のReportLabビルドで組版する（物件ごとに改ページ）。
+物件レコードは JSON配列 / JSON Lines / CSV から逐次読み込める。
+"""
+
+import csv
+import io
+import json
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from utils.footer_layout import get_footer_font
+
+# 物件情報テーブルに載せる項目（キー, 表示名）
+PROPERTY_FIELDS = [
+    ('property_type', '物件種別'),
+    ('transaction_type', '取引種別'),
+    ('price', '価格・賃料'),
+    ('address', '所在地'),
+    ('floor_plan', '間取り'),
+    ('building_age', '築年数'),
+]
+
+RECORD_FORMATS = ('json', 'jsonl', 'csv')
+
+_styles = None
+
+
+def get_mysouku_styles():
+    """組版に使うスタイル一式（プロセスで1回だけ作成）"""
+    global _styles
+    if _styles is not None:
+        return _styles
+
+    font_name = get_footer_font()
+    sample_styles = getSampleStyleSheet()
+    _styles = {
+        'font_name': font_name,
+        'title': ParagraphStyle('MysoukuTitle', parent=sample_styles['Heading1'],
+                                fontName=font_name, fontSize=16, textColor=colors.navy,
+                                alignment=1, spaceAfter=20),
+        'property_table': TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.lightblue),
+            ('BACKGROUND', (1, 0), (1, -1), colors.white),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), font_name),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 5),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+        ]),
+        'contact_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, -1), font_name),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]),
+    }
+    return _styles
+
+
+def contact_lines(company_data):
+    """会社の連絡先行（全物件で共通なので一括生成では1回だけ作る）"""
+    lines = []
+    if company_data.get('address'):
+        lines.append(f"住所: {company_data['address']}")
+    if company_data.get('phone'):
+        lines.append(f"TEL: {company_data['phone']}")
+    if company_data.get('license_number'):
+        lines.append(f"免許番号: {company_data['license_number']}")
+    return lines
+
+
+def property_elements(property_data, company_data, styles, contacts=None):
+    """1物件分のフローアブル（タイトル・物件情報テーブル・連絡先）"""
+    elements = []
+
+    company_name = company_data.get('company_name', '不動産会社')
+    elements.append(Paragraph(escape(str(company_name)), styles['title']))
+
+    rows = [[label, str(property_data.get(key) or '')] for key, label in PROPERTY_FIELDS]
+    rows = [row for row in rows if row[1]]
+    if rows:
+        table = Table(rows, colWidths=[50 * mm, 120 * mm])
+        table.setStyle(styles['property_table'])
+        elements.append(table)
+
+    if contacts is None:
+        contacts = contact_lines(company_data)
+    if contacts:
+        elements.append(Spacer(1, 20 * mm))
+        contact_table = Table([[line] for line in contacts], colWidths=[170 * mm])
+        contact_table.setStyle(styles['contact_table'])
+        elements.append(contact_table)
+
+    return elements
+
+
+def build_mysouku_pdf(records, company_data):
+    """物件レコードを1回のビルドで組版し、(PDFのバイト列, 物件数) を返す"""
+    styles = get_mysouku_styles()
+    contacts = contact_lines(company_data)
+
+    elements = []
+    count = 0
+    for property_data in records:
+        if count:
+            elements.append(PageBreak())
+        elements.extend(property_elements(property_data, company_data, styles, contacts))
+        count += 1
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=20 * mm, rightMargin=20 * mm,
+                            topMargin=20 * mm, bottomMargin=20 * mm)
+    doc.build(elements)
+    return buffer.getvalue(), count
+
+
+def iter_property_records(text_stream, record_format):
+    """テキストストリームから物件レコード（dict）を逐次読み込む
+
+    json: 配列、または {"properties": [...]} / jsonl: 1行1レコード / csv: 1行目が項目名
+    """
+    if record_format == 'json':
+        data = json.load(text_stream)
+        if isinstance(data, dict):
+            data = data.get('properties', [])
+        for record in data:
+            if isinstance(record, dict):
+                yield record
+    elif record_format == 'jsonl':
+        for line_number, line in enumerate(text_stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{line_number}行目のJSONが不正です: {e}")
+            if isinstance(record, dict):
+                yield record
+    elif record_format == 'csv':
+        for record in csv.DictReader(text_stream):
+            yield {key.strip(): value for key, value in record.items() if key}
+    else:
+        raise ValueError(f"未対応の形式です: {record_format}")
+
+
+def detect_record_format(content_type, filename=None):
+    """Content-Type またはファイル名から形式を判定（判定できなければNone）"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines'):
+        return 'jsonl'
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if content_type == 'application/json':
+        return 'json'
+    if filename:
+        extension = filename.rsplit('.', 1)[-1].lower()
+        if extension in ('jsonl', 'ndjson'):
+            return 'jsonl'
+        if extension in ('csv', 'json'):
+            return extension
+    return None
@@ -0,0 +1,97 @@
+"""
+ページ形状（MediaBox / CropBox / 回転 / UserUnit）の表
+
+A4・B4・A3が混在する束や回転ページでも、オーバーレイを表示上のページ下部に正しく
+重ねるための情報を文書ごとに1回だけ計算する。
+同じ形状のページは同じ geometry.key を持ち、オーバーレイを使い回せる。
+"""
+
+from collections import namedtuple
+
+from reportlab.lib.pagesizes import A4
+
+
+def _box_tuple(box):
+    return tuple(round(float(value), 2) for value in (box.left, box.bottom, box.right, box.top))
+
+
+class PageGeometry(namedtuple('PageGeometry', ['mediabox', 'cropbox', 'rotation', 'user_unit'])):
+    """1ページ分の形状（ボックスは (左, 下, 右, 上) のユーザー空間座標）"""
+
+    __slots__ = ()
+
+    @property
+    def key(self):
+        """オーバーレイを共有できる形状区分"""
+        return (self.cropbox, self.rotation, self.user_unit)
+
+    @property
+    def box_size(self):
+        """表示領域（CropBox）の回転前の幅・高さ（ユーザー空間単位）"""
+        left, bottom, right, top = self.cropbox
+        return right - left, top - bottom
+
+    @property
+    def display_size(self):
+        """回転・UserUnit適用後の表示上の幅・高さ（pt）"""
+        width, height = self.box_size
+        if self.rotation in (90, 270):
+            width, height = height, width
+        return width * self.user_unit, height * self.user_unit
+
+    @property
+    def is_identity(self):
+        """表示座標とユーザー空間が一致する（変換不要な）ページか"""
+        return self.rotation == 0 and self.user_unit == 1 and self.cropbox[:2] == (0, 0)
+
+    def overlay_transform(self):
+        """表示座標（左下原点, pt）で描いたオーバーレイをユーザー空間へ写す変換行列 (a, b, c, d, e, f)"""
+        left, bottom = self.cropbox[:2]
+        width, height = self.box_size
+        scale = 1 / self.user_unit
+        # /Rotate は時計回りの表示回転なので、その逆変換を掛ける
+        if self.rotation == 90:
+            a, b, c, d, e, f = 0, 1, -1, 0, width, 0
+        elif self.rotation == 180:
+            a, b, c, d, e, f = -1, 0, 0, -1, width, height
+        elif self.rotation == 270:
+            a, b, c, d, e, f = 0, -1, 1, 0, 0, height
+        else:
+            a, b, c, d, e, f = 1, 0, 0, 1, 0, 0
+        return (a * scale, b * scale, c * scale, d * scale, e + left, f + bottom)
+
+
+def page_geometry(page):
+    """PyPDF2のページから形状を取得（ボックスが無ければA4とみなす）"""
+    try:
+        mediabox = _box_tuple(page.mediabox)
+    except Exception:
+        mediabox = (0, 0, round(A4[0], 2), round(A4[1], 2))
+    try:
+        cropbox = _box_tuple(page.cropbox)
+        # CropBoxはMediaBoxの範囲に切り詰める
+        cropbox = (max(cropbox[0], mediabox[0]), max(cropbox[1], mediabox[1]),
+                   min(cropbox[2], mediabox[2]), min(cropbox[3], mediabox[3]))
+        if cropbox[2] <= cropbox[0] or cropbox[3] <= cropbox[1]:
+            cropbox = mediabox
+    except Exception:
+        cropbox = mediabox
+
+    rotation = int(page.get('/Rotate', 0) or 0) % 360
+    if rotation not in (0, 90, 180, 270):
+        rotation = 0
+    user_unit = float(page.get('/UserUnit', 1) or 1)
+    return PageGeometry(mediabox, cropbox, rotation, user_unit)
+
+
+def build_geometry_table(reader):
+    """文書の全ページの形状表を作成（ページ順のリスト）"""
+    return [page_geometry(page) for page in reader.pages]
+
+
+def geometry_classes(table):
+    """形状区分ごとのページ番号一覧 {key: [page_num, ...]}（出現順）"""
+    classes = {}
+    for page_num, geometry in enumerate(table):
+        classes.setdefault(geometry.key, []).append(page_num)
+    return classes
@@ -0,0 +1,112 @@
+"""
+変換時のページ選択（どのページで検出し、どのページを変換するか）
+
+- all: 全ページを個別に検出して変換（従来どおり）
+- first: 1ページ目だけ検出し、その結果を全ページに適用
+- ranges: 指定したページ範囲（例 "1-3,5,8-"）だけを検出・変換し、他のページはそのまま出力
+- sample: 先頭・末尾を含む等間隔のページだけ検出し、間のページは前後の検出結果から補う
+
+補うページの白塗り高さは、前後の検出ページのうち高い方を採用する
+（フッターの高さは業者ごとに決まった値で、線形補間した中間の値はどちらのフッターにも合わないため、
+物件情報を少し多めに塗るほうを選ぶ）。
+"""
+
+import re
+
+PAGE_MODES = ('all', 'first', 'ranges', 'sample')
+DEFAULT_SAMPLE_PAGES = 3
+
+_RANGE_PATTERN = re.compile(r'^(\d+)?\s*(-)?\s*(\d+)?$')
+
+
+def parse_page_ranges(spec):
+    """ページ範囲の指定（1始まり、"1-3,5,8-"）を (開始, 終了 or None) のリストに変換"""
+    ranges = []
+    for part in (spec or '').replace('、', ',').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        match = _RANGE_PATTERN.match(part)
+        if not match or not (match.group(1) or match.group(3)):
+            raise ValueError(f"ページ範囲の指定が不正です: {part}")
+        start = int(match.group(1)) if match.group(1) else 1
+        if match.group(2):
+            end = int(match.group(3)) if match.group(3) else None
+        else:
+            end = start
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"ページ範囲の指定が不正です: {part}")
+        ranges.append((start, end))
+    if not ranges:
+        raise ValueError("ページ範囲を指定してください")
+    return ranges
+
+
+def resolve_page_ranges(ranges, total_pages):
+    """ページ範囲を文書のページ番号（0始まり、昇順・重複なし）に展開（範囲外は除く）"""
+    pages = set()
+    for start, end in ranges:
+        last = total_pages if end is None else min(end, total_pages)
+        pages.update(range(start - 1, last))
+    return sorted(pages)
+
+
+def sample_pages(total_pages, count=DEFAULT_SAMPLE_PAGES):
+    """先頭と末尾を含む等間隔のページ番号（0始まり）"""
+    count = max(1, min(count, total_pages))
+    if count == 1:
+        return [0]
+    return sorted({round(index * (total_pages - 1) / (count - 1)) for index in range(count)})
+
+
+def plan_pages(mode, total_pages, page_ranges=None, sample_count=None):
+    """(検出するページ, 変換するページ) を決める（どちらも0始まり・昇順）"""
+    if mode in (None, '', 'all'):
+        pages = list(range(total_pages))
+        return pages, pages
+    if mode == 'first':
+        return [0], list(range(total_pages))
+    if mode == 'ranges':
+        pages = resolve_page_ranges(parse_page_ranges(page_ranges) if isinstance(page_ranges, str) else page_ranges,
+                                    total_pages)
+        return pages, pages
+    if mode == 'sample':
+        return sample_pages(total_pages, sample_count or DEFAULT_SAMPLE_PAGES), list(range(total_pages))
+    raise ValueError(f"ページモードが不正です: {mode}（{' / '.join(PAGE_MODES)}）")
+
+
+def fill_page_results(detected, target_pages):
+    """検出しなかったページの結果を前後の検出ページから補う
+
+    detected: {ページ番号: 検出結果}
+    戻り値: ({ページ番号: 検出結果}, {補ったページ番号: [元にした検出ページ番号]})
+    """
+    detected_pages = sorted(detected)
+    results = {}
+    inherited = {}
+    for page_num in target_pages:
+        if page_num in detected:
+            results[page_num] = detected[page_num]
+            continue
+        before = [p for p in detected_pages if p < page_num]
+        after = [p for p in detected_pages if p > page_num]
+        sources = ([before[-1]] if before else []) + ([after[0]] if after else [])
+        source = max(sources, key=lambda p: (detected[p].get('bottom_height', 0), -p))
+        result = dict(detected[source])
+        result['confidence'] = min(detected[p].get('confidence', 60) for p in sources)
+        result['inherited_from'] = [p + 1 for p in sources]
+        results[page_num] = result
+        inherited[page_num] = sources
+    return results, inherited
+
+
+def page_plan_summary(mode, total_pages, detected_pages, inherited, target_pages):
+    """どのページで検出し、どのページが結果を引き継ぎ、どのページを変換しなかったか（1始まり）"""
+    targets = set(target_pages)
+    return {
+        'mode': mode or 'all',
+        'total_pages': total_pages,
+        'detected_pages': [p + 1 for p in detected_pages],
+        'inherited_pages': {str(p + 1): [s + 1 for s in sources] for p, sources in sorted(inherited.items())},
+        'skipped_pages': [p + 1 for p in range(total_pages) if p not in targets],
+    }
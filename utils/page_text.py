@@ -0,0 +1,288 @@
+"""
+ページの文字・図形の省メモリ表現（pdfplumber の page.chars / rects 等の代わり）
+
+pdfplumber の page.chars は1文字ごとに十数個のキーを持つdictを作るため、文字の多いマイソクでは
+フッター検出のメモリと時間の大半を占める。page.layout（pdfminerのレイアウト）を1回だけ走査して
+
+- 文字: 外接矩形（x0, top, x1, bottom）・文字サイズの float32 配列と、文字列表（ページ内で重複なし）への番号
+- 図形: 罫線・矩形・曲線・画像の外接矩形と種別
+
+を並列のNumPy配列で保持し、レイアウトは破棄する。座標は pdfplumber と同じ top 系（ページ上端からの距離, pt）。
+単語・行・テキストは配列から必要な範囲だけ組み立てる（pdfplumber の extract_words / extract_text_lines 相当）。
+
+バイト列に直列化でき、(内容ハッシュ, ページ番号) 単位でメモリ（と設定時はファイル）にキャッシュする。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from io import BytesIO
+
+import numpy as np
+from pdfminer.layout import LTChar, LTContainer, LTCurve, LTImage, LTLine, LTRect
+
+SHAPE_KINDS = ('line', 'rect', 'curve', 'image')
+WORD_X_TOLERANCE = 3    # pdfplumber の extract_words と同じ既定値
+WORD_Y_TOLERANCE = 3
+PAGE_TEXT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_CHAR_FIELDS = ('x0', 'top', 'x1', 'bottom', 'size')
+_SHAPE_FIELDS = ('shape_x0', 'shape_top', 'shape_x1', 'shape_bottom')
+
+
+class PageText:
+    """1ページの文字と図形（並列のNumPy配列）"""
+
+    __slots__ = ('width', 'height', 'x0', 'top', 'x1', 'bottom', 'size', 'text_index', 'strings',
+                 'shape_x0', 'shape_top', 'shape_x1', 'shape_bottom', 'shape_kind', '_is_space')
+
+    def __init__(self, width, height, chars, strings, shapes):
+        """chars: {'x0', 'top', 'x1', 'bottom', 'size', 'text_index'} / shapes: {'shape_x0', ..., 'shape_kind'} の配列"""
+        self.width = float(width)
+        self.height = float(height)
+        for field in _CHAR_FIELDS:
+            setattr(self, field, np.asarray(chars[field], dtype=np.float32))
+        self.text_index = np.asarray(chars['text_index'], dtype=np.uint32)
+        self.strings = tuple(strings)
+        for field in _SHAPE_FIELDS:
+            setattr(self, field, np.asarray(shapes[field], dtype=np.float32))
+        self.shape_kind = np.asarray(shapes['shape_kind'], dtype=np.uint8)
+        self._is_space = np.array([not text.strip() for text in self.strings], dtype=bool)
+
+    @classmethod
+    def from_layout(cls, layout, width, height):
+        """pdfminerのレイアウト（LTPage）から作る（図形やテキストボックスの中も走査）"""
+        chars = {field: [] for field in _CHAR_FIELDS + ('text_index',)}
+        shapes = {field: [] for field in _SHAPE_FIELDS + ('shape_kind',)}
+        interned = {}
+
+        def walk(objects):
+            for obj in objects:
+                if isinstance(obj, LTChar):
+                    text = obj.get_text()
+                    chars['x0'].append(obj.x0)
+                    chars['top'].append(height - obj.y1)
+                    chars['x1'].append(obj.x1)
+                    chars['bottom'].append(height - obj.y0)
+                    chars['size'].append(obj.size)
+                    chars['text_index'].append(interned.setdefault(text, len(interned)))
+                elif isinstance(obj, (LTCurve, LTImage)):
+                    # LTLine・LTRect は LTCurve の派生なので先に判定する
+                    kind = ('line' if isinstance(obj, LTLine) else 'rect' if isinstance(obj, LTRect)
+                            else 'curve' if isinstance(obj, LTCurve) else 'image')
+                    shapes['shape_x0'].append(obj.x0)
+                    shapes['shape_top'].append(height - obj.y1)
+                    shapes['shape_x1'].append(obj.x1)
+                    shapes['shape_bottom'].append(height - obj.y0)
+                    shapes['shape_kind'].append(SHAPE_KINDS.index(kind))
+                if isinstance(obj, LTContainer):
+                    walk(obj)
+
+        walk(layout)
+        return cls(width, height, chars, list(interned), shapes)
+
+    @classmethod
+    def from_page(cls, page, release=True):
+        """pdfplumberのページから作る（release=True ならページが保持するレイアウトを破棄する）"""
+        try:
+            return cls.from_layout(page.layout, float(page.width), float(page.height))
+        finally:
+            if release:
+                page.flush_cache()
+
+    def __len__(self):
+        return len(self.x0)
+
+    @property
+    def nbytes(self):
+        arrays = sum(getattr(self, field).nbytes for field in _CHAR_FIELDS + _SHAPE_FIELDS)
+        arrays += self.text_index.nbytes + self.shape_kind.nbytes + self._is_space.nbytes
+        return arrays + sum(len(text.encode('utf-8')) + 49 for text in self.strings)
+
+    def texts(self, indices):
+        return [self.strings[index] for index in self.text_index[indices]]
+
+    def in_band(self, top=None, bottom=None):
+        """上端が top 以上かつ下端が bottom 以下の文字のマスク（None の側は制限なし）"""
+        mask = np.ones(len(self), dtype=bool)
+        if top is not None:
+            mask &= self.top >= top
+        if bottom is not None:
+            mask &= self.bottom <= bottom
+        return mask
+
+    def shapes(self, kinds=SHAPE_KINDS, top=None):
+        """指定種別の図形を [(x0, top, x1, bottom, 種別), ...] で返す（top 指定時は下端がそれより下のもの）"""
+        codes = [SHAPE_KINDS.index(kind) for kind in kinds]
+        mask = np.isin(self.shape_kind, codes)
+        if top is not None:
+            mask &= self.shape_bottom > top
+        return [(float(self.shape_x0[i]), float(self.shape_top[i]), float(self.shape_x1[i]),
+                 float(self.shape_bottom[i]), SHAPE_KINDS[self.shape_kind[i]]) for i in np.flatnonzero(mask)]
+
+    def _line_order(self, mask, y_tolerance):
+        """対象文字を行（top の差が y_tolerance 以下で連なるもの）ごと・左から順に並べた番号と行番号"""
+        indices = np.flatnonzero(mask) if mask is not None else np.arange(len(self))
+        indices = indices[np.argsort(self.top[indices], kind='stable')]
+        line_ids = np.zeros(len(indices), dtype=np.int64)
+        if len(indices) > 1:
+            line_ids[1:] = np.cumsum(np.diff(self.top[indices]) > y_tolerance)
+        order = np.lexsort((self.x0[indices], line_ids))
+        return indices[order], line_ids[order]
+
+    def words(self, mask=None, x_tolerance=WORD_X_TOLERANCE, y_tolerance=WORD_Y_TOLERANCE):
+        """単語の一覧 [{'text', 'x0', 'top', 'x1', 'bottom', 'line'}, ...]（空白・行の変わり目・字間で区切る）"""
+        indices, line_ids = self._line_order(mask, y_tolerance)
+        if not len(indices):
+            return []
+        spaces = self._is_space[self.text_index[indices]]
+        spaces_before = np.cumsum(spaces) - spaces
+        keep = ~spaces
+        indices, line_ids, spaces_before = indices[keep], line_ids[keep], spaces_before[keep]
+        if not len(indices):
+            return []
+
+        x0, top, x1, bottom = self.x0[indices], self.top[indices], self.x1[indices], self.bottom[indices]
+        breaks = np.ones(len(indices), dtype=bool)
+        breaks[1:] = ((line_ids[1:] != line_ids[:-1]) | (spaces_before[1:] != spaces_before[:-1])
+                      | (x0[1:] > x1[:-1] + x_tolerance))
+        starts = np.flatnonzero(breaks)
+        ends = np.append(starts[1:], len(indices))
+        texts = self.texts(indices)
+        word_x0 = np.minimum.reduceat(x0, starts)
+        word_top = np.minimum.reduceat(top, starts)
+        word_x1 = np.maximum.reduceat(x1, starts)
+        word_bottom = np.maximum.reduceat(bottom, starts)
+        return [{
+            'text': ''.join(texts[start:end]),
+            'x0': float(word_x0[n]), 'top': float(word_top[n]),
+            'x1': float(word_x1[n]), 'bottom': float(word_bottom[n]),
+            'line': int(line_ids[start]),
+        } for n, (start, end) in enumerate(zip(starts, ends))]
+
+    def lines(self, mask=None, x_tolerance=WORD_X_TOLERANCE, y_tolerance=WORD_Y_TOLERANCE):
+        """行の一覧 [{'text', 'x0', 'top', 'x1', 'bottom'}, ...]（上から順、単語は空白1つで区切る）"""
+        lines = []
+        for word in self.words(mask, x_tolerance, y_tolerance):
+            if lines and lines[-1]['line'] == word['line']:
+                line = lines[-1]
+                line['text'] += ' ' + word['text']
+                line['x0'], line['top'] = min(line['x0'], word['x0']), min(line['top'], word['top'])
+                line['x1'], line['bottom'] = max(line['x1'], word['x1']), max(line['bottom'], word['bottom'])
+            else:
+                lines.append(dict(word))
+        for line in lines:
+            del line['line']
+        return lines
+
+    def text(self):
+        """ページのテキスト（行ごとに改行）"""
+        return '\n'.join(line['text'] for line in self.lines())
+
+    def to_bytes(self):
+        buffer = BytesIO()
+        arrays = {field: getattr(self, field) for field in _CHAR_FIELDS + _SHAPE_FIELDS}
+        np.savez(buffer, page_size=np.array([self.width, self.height]), text_index=self.text_index,
+                 shape_kind=self.shape_kind,
+                 strings=np.frombuffer(json.dumps(self.strings, ensure_ascii=False).encode('utf-8'), dtype=np.uint8),
+                 **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(BytesIO(data), allow_pickle=False) as arrays:
+            width, height = arrays['page_size']
+            chars = {field: arrays[field] for field in _CHAR_FIELDS + ('text_index',)}
+            shapes = {field: arrays[field] for field in _SHAPE_FIELDS + ('shape_kind',)}
+            strings = json.loads(arrays['strings'].tobytes().decode('utf-8'))
+        return cls(width, height, chars, strings, shapes)
+
+
+# pdfplumberの文書オブジェクトごとの内容ハッシュ（文書が閉じられたら自動で解放）
+_document_hashes = weakref.WeakKeyDictionary()
+
+
+def document_hash(pdf):
+    digest = _document_hashes.get(pdf)
+    if digest is None:
+        stream = pdf.stream
+        position = stream.tell()
+        stream.seek(0)
+        digest = hashlib.sha1(stream.read()).hexdigest()
+        stream.seek(position)
+        _document_hashes[pdf] = digest
+    return digest
+
+
+class PageTextCache:
+    """PageText のキャッシュ（(内容ハッシュ, ページ番号) 単位、バイト数上限のLRU）
+
+    directory を指定すると直列化したものをファイルにも保存し、プロセス間・再起動後も使い回す。
+    """
+
+    def __init__(self, max_bytes=PAGE_TEXT_CACHE_MAX_BYTES, directory=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.max_bytes = max_bytes
+        self.directory = directory or None
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key[0]}-{key[1]}.npz")
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                return PageText.from_bytes(f.read())
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _store(self, key, page_text):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp_')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(page_text.to_bytes())
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            pass
+
+    def get(self, key, build):
+        """キャッシュ済みの PageText を返す（無ければファイル、それも無ければ build() で作って保存）"""
+        with self._lock:
+            page_text = self._entries.get(key)
+            if page_text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return page_text
+        page_text = self._load(key)
+        if page_text is None:
+            page_text = build()
+            self._store(key, page_text)
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries:
+                self._entries[key] = page_text
+                self._bytes += page_text.nbytes
+                while self._bytes > self.max_bytes and self._entries:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= evicted.nbytes
+        return page_text
+
+    def page(self, page):
+        """pdfplumberのページの PageText（キャッシュに無ければ作り、ページのレイアウトは破棄する）"""
+        return self.get((document_hash(page.pdf), page.page_number - 1), lambda: PageText.from_page(page))
+
+    def stats(self):
+        with self._lock:
+            return {'pages': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
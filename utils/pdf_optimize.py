@@ -0,0 +1,331 @@
+"""
+変換後PDFの出力最適化（任意の後処理）
+
+merge_page でオーバーレイを重ねると、ページごとにフォントリソースや非圧縮の
+コンテンツストリームが複製され、元のPDFより大きくなる。ここでは書き出し済みのPDFを
+読み直して次を行い、独自に書き出す（PyPDF2 3.0 の PdfWriter は重複除去と
+オブジェクトストリームに対応していないため）。
+
+- /Root・/Info から到達できないオブジェクト（孤立オブジェクト）の削除
+- 内容が同一のオブジェクトの統合（参照先を揃えながら不動点まで繰り返す）
+- 非圧縮ストリームの Flate 圧縮
+- ストリーム以外のオブジェクトをオブジェクトストリームにまとめ、XRefストリームで索引（PDF 1.5）
+"""
+
+import hashlib
+import logging
+import struct
+import time
+import zlib
+from collections import deque
+from io import BytesIO
+
+import PyPDF2
+from PyPDF2.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    StreamObject,
+)
+
+logger = logging.getLogger(__name__)
+
+OBJECT_STREAM_SIZE = 100   # 1つのオブジェクトストリームに入れるオブジェクト数
+COMPRESS_LEVEL = 6
+# ページツリー上の位置に意味があるため、内容が同じでも統合しない種別
+_NO_DEDUPE_TYPES = ('/Catalog', '/Pages', '/Page', '/Annot')
+_SKIP_STREAM_KEYS = ('/Length',)
+
+
+def _primitive_bytes(obj):
+    buffer = BytesIO()
+    obj.write_to_stream(buffer, None)
+    return buffer.getvalue()
+
+
+class ObjectSerializer:
+    """参照番号を付け替えながらPDFオブジェクトをバイト列にする
+
+    ref_number: 間接参照（IndirectObject）を書き出し先のオブジェクト番号（または (番号, 世代)）に変換する関数
+    """
+
+    def __init__(self, ref_number):
+        self.ref_number = ref_number
+
+    def value(self, obj):
+        if isinstance(obj, IndirectObject):
+            target = self.ref_number(obj)
+            # 番号だけ返された場合は世代0、(番号, 世代) ならその世代で参照
+            number, generation = target if isinstance(target, tuple) else (target, 0)
+            return f"{number} {generation} R".encode()
+        if isinstance(obj, StreamObject):
+            raise ValueError("ストリームは間接オブジェクトである必要があります")
+        if isinstance(obj, DictionaryObject):
+            return self.dictionary(obj.items())
+        if isinstance(obj, ArrayObject):
+            return b"[" + b" ".join(self.value(item) for item in obj) + b"]"
+        return _primitive_bytes(obj)
+
+    def dictionary(self, items):
+        parts = [b"<<"]
+        for key, value in items:
+            parts.append(_primitive_bytes(NameObject(key)) + b" " + self.value(value))
+        parts.append(b">>")
+        return b"\n".join(parts)
+
+    def stream(self, obj, data):
+        items = [(key, value) for key, value in obj.items() if key not in _SKIP_STREAM_KEYS]
+        items.append(('/Length', PyPDF2.generic.NumberObject(len(data))))
+        return self.dictionary(items) + b"\nstream\n" + data + b"\nendstream"
+
+
+def _children(obj):
+    """オブジェクトが直接含む間接参照を列挙"""
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, IndirectObject):
+            yield current
+        elif isinstance(current, DictionaryObject):
+            for key, value in current.items():
+                if isinstance(current, StreamObject) and key in _SKIP_STREAM_KEYS:
+                    continue
+                stack.append(value)
+        elif isinstance(current, ArrayObject):
+            stack.extend(current)
+
+
+def _count_source_objects(reader):
+    count = sum(len(entries) for entries in reader.xref.values())
+    return count + len(getattr(reader, 'xref_objStm', {}))
+
+
+def optimize_pdf(pdf_data, dedupe=True, compress=True, object_streams=True):
+    """PDFを最適化して (最適化後のバイト列, レポート) を返す
+
+    最適化できない場合（暗号化PDF・読み込み失敗・かえって大きくなる場合）は元のバイト列を返す。
+    """
+    started = time.perf_counter()
+    report = {
+        'before_bytes': len(pdf_data),
+        'after_bytes': len(pdf_data),
+        'applied': False,
+    }
+
+    reader = PyPDF2.PdfReader(BytesIO(pdf_data), strict=False)
+    if reader.is_encrypted:
+        report['skipped'] = 'encrypted'
+        report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return pdf_data, report
+
+    trailer = reader.trailer
+    roots = [trailer.raw_get(key) for key in ('/Root', '/Info') if key in trailer]
+    roots = [ref for ref in roots if isinstance(ref, IndirectObject)]
+
+    # 1. 到達可能なオブジェクトを収集（幅優先、出現順を保持）
+    objects = {}
+    queue = deque((ref.idnum, ref.generation) for ref in roots)
+    seen = set(queue)
+    while queue:
+        key = queue.popleft()
+        obj = reader.get_object(IndirectObject(key[0], key[1], reader))
+        objects[key] = obj
+        for child in _children(obj):
+            child_key = (child.idnum, child.generation)
+            if child_key not in seen:
+                seen.add(child_key)
+                queue.append(child_key)
+
+    # 2. 非圧縮ストリームを圧縮（圧縮後のデータを保持）
+    stream_data = {}
+    streams_compressed = 0
+    for key, obj in objects.items():
+        if not isinstance(obj, StreamObject):
+            continue
+        data = obj._data or b""
+        if isinstance(data, str):
+            data = data.encode('latin-1')
+        if compress and '/Filter' not in obj and '/DecodeParms' not in obj and data:
+            packed = zlib.compress(data, COMPRESS_LEVEL)
+            if len(packed) < len(data):
+                obj[NameObject('/Filter')] = NameObject('/FlateDecode')
+                data = packed
+                streams_compressed += 1
+        stream_data[key] = data
+
+    # 3. 同一内容のオブジェクトを統合（参照先が統合されると親も同一になりうるので不動点まで）
+    canonical = {key: key for key in objects}
+
+    def find(key):
+        root = key
+        while canonical[root] != root:
+            root = canonical[root]
+        while canonical[key] != root:
+            canonical[key], key = root, canonical[key]
+        return root
+
+    def placeholder_ref(ref):
+        key = (ref.idnum, ref.generation)
+        if key not in canonical:
+            return 0  # 到達不能な参照（壊れた参照）は null 相当
+        rep = find(key)
+        return rep[0] * 65536 + rep[1]
+
+    deduplicated = 0
+    if dedupe:
+        hasher = ObjectSerializer(placeholder_ref)
+        changed = True
+        while changed:
+            changed = False
+            groups = {}
+            for key, obj in objects.items():
+                if find(key) != key:
+                    continue
+                if isinstance(obj, DictionaryObject) and obj.get('/Type') in _NO_DEDUPE_TYPES:
+                    continue
+                if isinstance(obj, StreamObject):
+                    body = hasher.stream(obj, stream_data[key])
+                else:
+                    body = hasher.value(obj)
+                digest = hashlib.sha1(body).digest()
+                first = groups.setdefault(digest, key)
+                if first != key:
+                    canonical[key] = first
+                    deduplicated += 1
+                    changed = True
+
+    # 4. 新しいオブジェクト番号を割り当て（代表オブジェクトのみ、出現順）
+    new_numbers = {}
+    for key in objects:
+        if find(key) == key:
+            new_numbers[key] = len(new_numbers) + 1
+
+    def new_ref(ref):
+        key = (ref.idnum, ref.generation)
+        if key not in canonical:
+            return 0
+        return new_numbers[find(key)]
+
+    serializer = ObjectSerializer(new_ref)
+    bodies = {}
+    for key, number in new_numbers.items():
+        obj = objects[key]
+        if isinstance(obj, StreamObject):
+            bodies[number] = (True, serializer.stream(obj, stream_data[key]))
+        else:
+            bodies[number] = (False, serializer.value(obj))
+
+    trailer_items = {}
+    for name in ('/Root', '/Info'):
+        ref = trailer.raw_get(name) if name in trailer else None
+        if isinstance(ref, IndirectObject):
+            trailer_items[name] = new_ref(ref)
+
+    if object_streams:
+        output = _write_with_object_streams(bodies, trailer_items, trailer.get('/ID'))
+    else:
+        output = _write_classic(bodies, trailer_items, trailer.get('/ID'), reader.pdf_header)
+
+    report.update({
+        'objects_before': _count_source_objects(reader),
+        'objects_after': len(new_numbers),
+        'orphans_dropped': max(0, _count_source_objects(reader) - len(objects)),
+        'deduplicated': deduplicated,
+        'streams_compressed': streams_compressed,
+        'object_streams': object_streams,
+    })
+
+    if len(output) >= len(pdf_data):
+        report['skipped'] = 'not_smaller'
+        output = pdf_data
+    else:
+        report['applied'] = True
+        report['after_bytes'] = len(output)
+
+    report['saved_bytes'] = report['before_bytes'] - report['after_bytes']
+    report['ratio'] = round(report['after_bytes'] / report['before_bytes'], 3) if report['before_bytes'] else 1
+    report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return output, report
+
+
+def _trailer_entries(trailer_items, file_id):
+    entries = [f"/{name[1:]} {number} 0 R".encode() for name, number in trailer_items.items()]
+    if file_id is not None:
+        entries.append(b"/ID " + ObjectSerializer(lambda ref: 0).value(file_id))
+    return entries
+
+
+def _write_classic(bodies, trailer_items, file_id, header):
+    """従来形式のxrefテーブルで書き出す"""
+    output = BytesIO()
+    output.write((header or '%PDF-1.4').encode() if isinstance(header, str) else header or b'%PDF-1.4')
+    output.write(b"\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for number in sorted(bodies):
+        offsets[number] = output.tell()
+        output.write(f"{number} 0 obj\n".encode() + bodies[number][1] + b"\nendobj\n")
+
+    size = len(bodies) + 1
+    xref_location = output.tell()
+    output.write(f"xref\n0 {size}\n".encode())
+    output.write(b"0000000000 65535 f \n")
+    for number in range(1, size):
+        output.write(f"{offsets[number]:010d} 00000 n \n".encode())
+    entries = [f"/Size {size}".encode()] + _trailer_entries(trailer_items, file_id)
+    output.write(b"trailer\n<<" + b" ".join(entries) + b">>\n")
+    output.write(f"startxref\n{xref_location}\n%%EOF\n".encode())
+    return output.getvalue()
+
+
+def _write_with_object_streams(bodies, trailer_items, file_id):
+    """ストリーム以外をオブジェクトストリームにまとめ、XRefストリームで書き出す"""
+    output = BytesIO()
+    output.write(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+
+    packable = [number for number in sorted(bodies) if not bodies[number][0]]
+    next_number = len(bodies) + 1
+    xref = {}  # 番号 -> (種別, 値1, 値2)
+
+    for number in sorted(bodies):
+        is_stream, body = bodies[number]
+        if is_stream:
+            xref[number] = (1, output.tell(), 0)
+            output.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    for start in range(0, len(packable), OBJECT_STREAM_SIZE):
+        chunk = packable[start:start + OBJECT_STREAM_SIZE]
+        stream_number = next_number
+        next_number += 1
+        header_parts, payload, offset = [], [], 0
+        for index, number in enumerate(chunk):
+            body = bodies[number][1]
+            header_parts.append(f"{number} {offset}")
+            payload.append(body)
+            offset += len(body) + 1
+            xref[number] = (2, stream_number, index)
+        header = " ".join(header_parts).encode() + b"\n"
+        data = zlib.compress(header + b"\n".join(payload) + b"\n", COMPRESS_LEVEL)
+        xref[stream_number] = (1, output.tell(), 0)
+        output.write(
+            f"{stream_number} 0 obj\n<< /Type /ObjStm /N {len(chunk)} /First {len(header)} "
+            f"/Filter /FlateDecode /Length {len(data)} >>\nstream\n".encode()
+            + data + b"\nendstream\nendobj\n"
+        )
+
+    # XRefストリーム自身
+    xref_number = next_number
+    size = xref_number + 1
+    xref_location = output.tell()
+    xref[xref_number] = (1, xref_location, 0)
+    rows = [struct.pack('>BIH', 0, 0, 65535)]
+    for number in range(1, size):
+        kind, field2, field3 = xref[number]
+        rows.append(struct.pack('>BIH', kind, field2, field3))
+    data = zlib.compress(b"".join(rows), COMPRESS_LEVEL)
+    entries = [f"/Type /XRef /Size {size} /W [1 4 2] /Filter /FlateDecode /Length {len(data)}".encode()]
+    entries += _trailer_entries(trailer_items, file_id)
+    output.write(f"{xref_number} 0 obj\n".encode() + b"<< " + b" ".join(entries) + b" >>\nstream\n"
+                 + data + b"\nendstream\nendobj\n")
+    output.write(f"startxref\n{xref_location}\n%%EOF\n".encode())
+    return output.getvalue()
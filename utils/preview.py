@@ -0,0 +1,114 @@
+"""
+変換前後のプレビュー画像（ページ下部の帯・ページ全体のサムネイル）の生成とキャッシュ
+
+白塗り範囲の確認のために変換済みPDF全体をダウンロードしなくて済むよう、
+低解像度のPNGだけを返す。画像は (内容ハッシュ, ページ, 種別, 検出パラメータ) 単位で
+バイト数上限付きのLRUにキャッシュする。
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pypdfium2 as pdfium
+
+PREVIEW_BAND_DPI = 60           # 下部帯のレンダリング解像度
+PREVIEW_THUMBNAIL_DPI = 24      # ページ全体サムネイルの解像度
+PREVIEW_MIN_BAND_RATIO = 0.25   # 下部帯として表示するページ高さの最小割合
+PREVIEW_BAND_MARGIN = 1.3       # 白塗り高さに対して表示する帯の倍率
+PREVIEW_CACHE_MAX_BYTES = 32 * 1024 * 1024
+PREVIEW_DETECTION_CACHE_SIZE = 256
+
+
+def content_hash(pdf_data):
+    return hashlib.sha1(pdf_data).hexdigest()
+
+
+def band_ratio_for(bottom_height_pt, page_height_pt):
+    """白塗り範囲が余裕をもって収まる下部帯の割合"""
+    if not page_height_pt:
+        return PREVIEW_MIN_BAND_RATIO
+    return min(1.0, max(PREVIEW_MIN_BAND_RATIO, bottom_height_pt * PREVIEW_BAND_MARGIN / page_height_pt))
+
+
+def render_png(pdf_data, page_index=0, dpi=PREVIEW_BAND_DPI, band_ratio=None):
+    """ページ（band_ratio指定時は下部の帯のみ）をPNGのバイト列にレンダリング"""
+    document = pdfium.PdfDocument(pdf_data)
+    try:
+        page = document[page_index]
+        try:
+            crop = (0, 0, 0, 0)
+            if band_ratio is not None and band_ratio < 1:
+                # 表示上のページ高さ（回転後）から上側を切り落とす
+                crop = (0, 0, 0, page.get_height() * (1 - band_ratio))
+            image = page.render(scale=dpi / 72, crop=crop).to_pil()
+        finally:
+            page.close()
+    finally:
+        document.close()
+
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+class PreviewCache:
+    """プレビュー画像（バイト数上限のLRU）とページ検出結果（件数上限のLRU）のキャッシュ"""
+
+    def __init__(self, max_bytes=PREVIEW_CACHE_MAX_BYTES, max_detections=PREVIEW_DETECTION_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._images = OrderedDict()
+        self._bytes = 0
+        self._detections = OrderedDict()
+        self.max_bytes = max_bytes
+        self.max_detections = max_detections
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, store, key):
+        with self._lock:
+            value = store.get(key)
+            if value is not None:
+                store.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return value
+
+    def image(self, key, render):
+        """キャッシュ済みのPNGを返す（無ければ render() で生成して保存）。戻り値は (PNG, キャッシュ命中か)"""
+        png = self._lookup(self._images, key)
+        if png is not None:
+            return png, True
+        png = render()
+        with self._lock:
+            if key not in self._images:
+                self._images[key] = png
+                self._bytes += len(png)
+                while self._bytes > self.max_bytes and self._images:
+                    _, evicted = self._images.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return png, False
+
+    def detection(self, key, detect):
+        """ページのフッター検出結果をキャッシュ（同じPDFの再プレビューで検出をやり直さない）"""
+        result = self._lookup(self._detections, key)
+        if result is not None:
+            return result
+        result = detect()
+        with self._lock:
+            self._detections[key] = result
+            while len(self._detections) > self.max_detections:
+                self._detections.popitem(last=False)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'images': len(self._images),
+                'bytes': self._bytes,
+                'detections': len(self._detections),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
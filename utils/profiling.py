@@ -0,0 +1,170 @@
+"""
+リクエスト単位のプロファイリング（設定で許可した場合のみ、ヘッダー／クエリで指定したリクエストだけ）
+
+- 処理中のスレッドのスタックを一定間隔でサンプリングし、collapsed stack 形式
+  （speedscope・flamegraph.pl でそのまま開ける）でファイルに保存する
+- 進捗通知の段階（parsed / detected / overlaid / written ...）ごとに、所要時間と
+  tracemalloc で測ったメモリ確保量のピークを記録する
+
+tracemalloc はプロセス全体を計測し、確保の多い処理を2倍程度遅くするため、
+同時にプロファイルするリクエストは1件に限る。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+PROFILE_SAMPLE_INTERVAL = 0.005   # 秒
+PROFILE_MAX_DEPTH = 128
+
+_active_lock = threading.Lock()
+
+
+def _frame_label(code):
+    parts = code.co_filename.replace('\\', '/').split('/')
+    return f"{code.co_name} ({'/'.join(parts[-2:])}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """指定スレッドのスタックを別スレッドから定期的に採取"""
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None and len(labels) < PROFILE_MAX_DEPTH:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit=10):
+        """自身で時間を使っている関数（スタックの末端）の上位"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return [{'function': name, 'samples': count, 'share': round(count / max(1, self.samples), 3)}
+                for name, count in leaves.most_common(limit)]
+
+
+class StageMemoryTracker:
+    """進捗通知の段階ごとの所要時間と tracemalloc のピーク確保量"""
+
+    def __init__(self):
+        self._started_tracing = False
+        self.stages = {}
+        self.last = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+        self.last = time.perf_counter()
+
+    def __call__(self, stage, **data):
+        """段階の終わり（進捗イベント）ごとに直前からの計測値を集計"""
+        now = time.perf_counter()
+        current, peak = tracemalloc.get_traced_memory()
+        entry = self.stages.setdefault(stage, {'events': 0, 'ms': 0.0, 'peak_kb': 0, 'current_kb': 0})
+        entry['events'] += 1
+        entry['ms'] = round(entry['ms'] + (now - self.last) * 1000, 1)
+        entry['peak_kb'] = max(entry['peak_kb'], round(peak / 1024))
+        entry['current_kb'] = round(current / 1024)
+        tracemalloc.reset_peak()
+        self.last = now
+
+    def stop(self):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._started_tracing:
+            tracemalloc.stop()
+        return {'peak_kb': round(peak / 1024), 'current_kb': round(current / 1024)}
+
+
+class ProfileSession:
+    """1リクエスト分のプロファイル（サンプリング＋段階ごとのメモリ）"""
+
+    def __init__(self, output_dir, label):
+        self.output_dir = output_dir
+        self.profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+        self.label = label
+        self.sampler = StackSampler(threading.get_ident())
+        self.memory = StageMemoryTracker()
+        self.started = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.memory.start()
+        self.sampler.start()
+        return self
+
+    def wrap_progress(self, progress):
+        """進捗通知を段階ごとの計測にも流す"""
+        def profiled_progress(stage, **data):
+            self.memory(stage, **data)
+            if progress:
+                progress(stage, **data)
+        return profiled_progress
+
+    def finish(self):
+        """計測を止めてファイルに保存し、概要を返す"""
+        try:
+            self.sampler.stop()
+            memory_total = self.memory.stop()
+        finally:
+            _active_lock.release()
+
+        elapsed_ms = round((time.perf_counter() - self.started) * 1000, 1)
+        summary = {
+            'profile_id': self.profile_id,
+            'label': self.label,
+            'elapsed_ms': elapsed_ms,
+            'samples': self.sampler.samples,
+            'sample_interval_ms': self.sampler.interval * 1000,
+            'memory': memory_total,
+            'stages': self.memory.stages,
+            'top_functions': self.sampler.top_functions(),
+        }
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, self.profile_id)
+        with open(f"{base}.collapsed", 'w', encoding='utf-8') as f:
+            f.write(self.sampler.collapsed())
+        with open(f"{base}.json", 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        summary['files'] = [f"{self.profile_id}.collapsed", f"{self.profile_id}.json"]
+        return summary
+
+
+def start_profile(output_dir, label):
+    """プロファイルを開始（他のリクエストをプロファイル中ならNone）"""
+    if not _active_lock.acquire(blocking=False):
+        return None
+    try:
+        return ProfileSession(output_dir, label).start()
+    except Exception:
+        _active_lock.release()
+        raise
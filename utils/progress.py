@@ -0,0 +1,249 @@
+"""
+変換ジョブの進捗イベント配信（Server-Sent Events用）
+
+購読者がいないジョブに対しては publish がdict参照1回で終わるため、
+通常の変換処理にはほとんどオーバーヘッドを与えない。
+
+ProgressHub はプロセス内だけで配信する。run.py の本番モードのように複数のワーカープロセスが
+待ち受けを共有する場合は、購読（/progress/<job_id>）と変換のPOSTが別のプロセスに届くため、
+SQLiteファイルを介して配信する SharedProgressHub を使う。購読者の有無の確認はレポーターごとに
+poll_interval に1回までにまとめるため、購読者のいないジョブではページごとのイベントでもファイルを開かない。
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+
+class ProgressHub:
+    """ジョブIDごとの購読キューを管理し、進捗イベントを配信する"""
+
+    subscriber_check_interval = 0   # 購読者の確認はdict参照なので毎回行う
+
+    def __init__(self, max_queue_size=1000):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._max_queue_size = max_queue_size
+        self.closed = threading.Event()
+
+    def has_subscribers(self, job_id):
+        return job_id in self._subscribers
+
+    def subscribe(self, job_id):
+        """購読を開始してイベントキューを返す"""
+        subscriber = queue.Queue(maxsize=self._max_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, job_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(job_id, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    def publish(self, job_id, event):
+        """イベントを配信（購読者がいなければ何もしない）"""
+        subscribers = self._subscribers.get(job_id)
+        if not subscribers:
+            return
+        for subscriber in list(subscribers):
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # 読まれていない購読者のためにイベントを溜め込まない
+                pass
+
+    def reporter(self, job_id):
+        """ジョブ用の進捗レポーターを返す（job_idが無ければNone）"""
+        if not job_id:
+            return None
+        return ProgressReporter(self, job_id)
+
+    def close(self):
+        """サーバー停止時: 購読中のストリームを終了させる（以降の購読もすぐに終わる）"""
+        self.closed.set()
+        with self._lock:
+            subscribers = [subscriber for group in self._subscribers.values() for subscriber in group]
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(None)
+            except queue.Full:
+                pass
+
+
+class SharedProgressHub:
+    """SQLiteファイルを介してプロセス間で進捗イベントを配信する（ProgressHub と同じインターフェース）
+
+    購読者は自分のジョブのイベントを poll_interval ごとに読み出す。購読者のいないジョブのイベントは書き込まない。
+    """
+
+    def __init__(self, path, poll_interval=0.2, retention=900):
+        self.path = path
+        self.poll_interval = poll_interval
+        # 購読者の確認（ファイルを開く）はレポーターごとにこの間隔で1回まで。購読者もこの間隔で読み出すため遅れは同程度
+        self.subscriber_check_interval = poll_interval
+        self.retention = retention   # 異常終了したプロセスの購読・イベントを削除するまでの秒数
+        self.closed = threading.Event()
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS progress_subscribers (
+                    subscriber_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS progress_events (
+                    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS progress_subscribers_job ON progress_subscribers (job_id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS progress_events_job ON progress_events (job_id, event_id)')
+
+    def has_subscribers(self, job_id):
+        with self._connect() as conn:
+            return conn.execute('SELECT 1 FROM progress_subscribers WHERE job_id = ? LIMIT 1',
+                                (job_id,)).fetchone() is not None
+
+    def subscribe(self, job_id):
+        """購読を開始して、キューと同じ get(timeout) を持つ購読者を返す"""
+        now = time.time()
+        with self._connect() as conn:
+            expired = now - self.retention
+            conn.execute('DELETE FROM progress_subscribers WHERE created_at < ?', (expired,))
+            conn.execute('DELETE FROM progress_events WHERE created_at < ?', (expired,))
+            subscriber_id = conn.execute('INSERT INTO progress_subscribers (job_id, created_at) VALUES (?, ?)',
+                                         (job_id, now)).lastrowid
+            last_event_id = conn.execute('SELECT COALESCE(MAX(event_id), 0) FROM progress_events').fetchone()[0]
+        return _SharedSubscriber(self, job_id, subscriber_id, last_event_id)
+
+    def unsubscribe(self, job_id, subscriber):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM progress_subscribers WHERE subscriber_id = ?', (subscriber.subscriber_id,))
+            conn.execute('DELETE FROM progress_events WHERE job_id = ? AND NOT EXISTS'
+                         ' (SELECT 1 FROM progress_subscribers WHERE job_id = ?)', (job_id, job_id))
+
+    def publish(self, job_id, event):
+        """イベントを配信（購読者がいなければ何もしない）"""
+        with self._connect() as conn:
+            conn.execute('INSERT INTO progress_events (job_id, data, created_at) SELECT ?, ?, ?'
+                         ' WHERE EXISTS (SELECT 1 FROM progress_subscribers WHERE job_id = ?)',
+                         (job_id, json.dumps(event, ensure_ascii=False), time.time(), job_id))
+
+    def reporter(self, job_id):
+        if not job_id:
+            return None
+        return ProgressReporter(self, job_id)
+
+    def close(self):
+        """サーバー停止時: このプロセスで購読中のストリームを終了させる"""
+        self.closed.set()
+
+
+class _SharedSubscriber:
+    """SharedProgressHub の購読者（queue.Queue の get と同じく、時間内にイベントが無ければ queue.Empty）"""
+
+    def __init__(self, hub, job_id, subscriber_id, last_event_id):
+        self.hub = hub
+        self.job_id = job_id
+        self.subscriber_id = subscriber_id
+        self.last_event_id = last_event_id
+        self._pending = deque()
+
+    def get(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._pending:
+            if self.hub.closed.is_set():
+                return None
+            with self.hub._connect() as conn:
+                rows = conn.execute('SELECT event_id, data FROM progress_events WHERE job_id = ? AND event_id > ?'
+                                    ' ORDER BY event_id', (self.job_id, self.last_event_id)).fetchall()
+            for event_id, data in rows:
+                self.last_event_id = event_id
+                self._pending.append(json.loads(data))
+            if self._pending:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise queue.Empty
+            wait = self.hub.poll_interval if deadline is None else min(self.hub.poll_interval,
+                                                                       max(0, deadline - time.monotonic()))
+            self.hub.closed.wait(wait)
+        return self._pending.popleft()
+
+
+class ProgressReporter:
+    """変換処理から呼ばれる進捗通知（各イベントに経過時間を付与）"""
+
+    def __init__(self, hub, job_id):
+        self.hub = hub
+        self.job_id = job_id
+        self.started = time.perf_counter()
+        self.last = self.started
+        self._watched = False
+        self._checked_at = None
+
+    def _has_subscribers(self, now):
+        """購読者がいるか（hub.subscriber_check_interval の間は前回の確認結果を使う）"""
+        if self._checked_at is None or now - self._checked_at >= self.hub.subscriber_check_interval:
+            self._watched = self.hub.has_subscribers(self.job_id)
+            self._checked_at = now
+        return self._watched
+
+    def __call__(self, stage, **data):
+        now = time.perf_counter()
+        if self._has_subscribers(now):
+            event = {
+                'stage': stage,
+                'elapsed_ms': round((now - self.started) * 1000, 1),  # ジョブ開始からの経過
+                'stage_ms': round((now - self.last) * 1000, 1),       # 直前のイベントからの経過
+            }
+            event.update(data)
+            self.hub.publish(self.job_id, event)
+        self.last = now
+
+
+def format_sse(event, event_name=None):
+    """イベントをSSE形式の文字列に変換"""
+    lines = []
+    if event_name:
+        lines.append(f"event: {event_name}")
+    lines.append(f"data: {json.dumps(event, ensure_ascii=False)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_events(hub, job_id, subscriber, timeout=600, keepalive=15):
+    """SSEストリームを生成（done/errorイベント受信・タイムアウト・ハブの close() で終了）"""
+    deadline = time.monotonic() + timeout
+    try:
+        yield format_sse({'stage': 'subscribed', 'job_id': job_id})
+        while time.monotonic() < deadline and not hub.closed.is_set():
+            try:
+                event = subscriber.get(timeout=keepalive)
+            except queue.Empty:
+                # 接続維持用のコメント行
+                yield ': keepalive\n\n'
+                continue
+            if event is None:
+                # サーバー停止
+                break
+            yield format_sse(event)
+            if event.get('stage') in ('done', 'error'):
+                break
+    finally:
+        hub.unsubscribe(job_id, subscriber)
@@ -0,0 +1,144 @@
+"""
+物件データ抽出結果のエクスポート（JSON Lines / CSV / Parquet）
+
+1件ずつ書き込み、メモリ上に保持するのは Parquet の1行グループ分だけにする。
+どの形式でも列は EXPORT_FIELDS の固定スキーマ（値が無い項目は空文字・None）。
+Parquet の出力には pyarrow が必要（requirements-export.txt）。
+"""
+
+import csv
+import json
+
+EXPORT_FORMATS = ('jsonl', 'csv', 'parquet')
+PARQUET_ROW_GROUP_SIZE = 1000
+
+# (列名, 型) 型は str / int / list（文字列のリスト）
+EXPORT_FIELDS = [
+    ('source_path', str),
+    ('source_hash', str),
+    ('pages', int),
+    ('bytes', int),
+    ('text_chars', int),
+    ('property_type', str),
+    ('transaction_type', str),
+    ('price', str),
+    ('address', str),
+    ('access', str),
+    ('building_area', str),
+    ('land_area', str),
+    ('floor_plan', str),
+    ('building_age', str),
+    ('structure', str),
+    ('parking', str),
+    ('features', list),
+    ('extracted_at', str),
+    ('error', str),
+]
+EXPORT_COLUMNS = [name for name, _ in EXPORT_FIELDS]
+
+
+def normalize_record(record):
+    """固定スキーマに合わせたレコード（列の過不足・型を揃える）"""
+    row = {}
+    for name, kind in EXPORT_FIELDS:
+        value = record.get(name)
+        if kind is int:
+            row[name] = int(value) if value not in (None, '') else None
+        elif kind is list:
+            row[name] = [str(item) for item in value] if value else []
+        else:
+            row[name] = str(value) if value is not None else ''
+    return row
+
+
+class JsonlExportWriter:
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        self._file.write(json.dumps(normalize_record(record), ensure_ascii=False) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class CsvExportWriter:
+    """CSV（Excelで開けるようBOM付きUTF-8、featuresは「、」区切り）"""
+
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=EXPORT_COLUMNS)
+        self._writer.writeheader()
+
+    def write(self, record):
+        row = normalize_record(record)
+        row['features'] = '、'.join(row['features'])
+        self._writer.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetExportWriter:
+    """Parquet（行グループ単位で書き出し、保持するのは1行グループ分のみ）"""
+
+    def __init__(self, path, row_group_size=PARQUET_ROW_GROUP_SIZE):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet出力には pyarrow が必要です（pip install -r requirements-export.txt）")
+
+        types = {str: pa.string(), int: pa.int64(), list: pa.list_(pa.string())}
+        self._pa = pa
+        self._schema = pa.schema([(name, types[kind]) for name, kind in EXPORT_FIELDS])
+        self._writer = pq.ParquetWriter(path, self._schema, compression='zstd')
+        self._row_group_size = row_group_size
+        self._columns = {name: [] for name in EXPORT_COLUMNS}
+        self._rows = 0
+
+    def write(self, record):
+        row = normalize_record(record)
+        for name in EXPORT_COLUMNS:
+            self._columns[name].append(row[name])
+        self._rows += 1
+        if self._rows >= self._row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        table = self._pa.Table.from_pydict(self._columns, schema=self._schema)
+        self._writer.write_table(table)
+        self._columns = {name: [] for name in EXPORT_COLUMNS}
+        self._rows = 0
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+_WRITERS = {
+    'jsonl': JsonlExportWriter,
+    'csv': CsvExportWriter,
+    'parquet': ParquetExportWriter,
+}
+
+
+def export_format_for(path, export_format=None):
+    """指定された形式、無ければ拡張子から出力形式を決める"""
+    if export_format:
+        return export_format
+    extension = path.rsplit('.', 1)[-1].lower()
+    if extension in ('ndjson', 'jsonl'):
+        return 'jsonl'
+    if extension in EXPORT_FORMATS:
+        return extension
+    raise ValueError(f"出力形式を判定できません（--format で指定してください）: {path}")
+
+
+def open_export_writer(path, export_format):
+    """出力形式に応じたライター（write(record) / close()）"""
+    if export_format not in _WRITERS:
+        raise ValueError(f"未対応の出力形式です: {export_format}")
+    return _WRITERS[export_format](path)
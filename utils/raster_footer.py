@@ -0,0 +1,173 @@
+"""
+画像のみのマイソク（テキストレイヤーなし）向けのラスタ投影プロファイル型フッター検出
+
+ページ下部の帯だけを低解像度でレンダリングし、行ごとの墨量（row-ink projection）から
+水平区切り線とフッターのテキストブロックを見つける。
+レンダリングした帯は (文書のハッシュ, ページ, DPI, 帯の比率) 単位でキャッシュする。
+"""
+
+import hashlib
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pypdfium2 as pdfium
+
+logger = logging.getLogger(__name__)
+
+RASTER_DPI = 50                 # 帯のレンダリング解像度
+RASTER_BAND_RATIO = 0.3         # ページ下部の何割をレンダリングするか
+RASTER_INK_THRESHOLD = 160      # これより暗い画素を墨とみなす（0-255）
+RASTER_TEXT_ROW_RATIO = 0.01    # 墨の割合がこれ以上の行をテキスト行とみなす
+RASTER_RULE_ROW_RATIO = 0.6     # 墨の割合がこれ以上の行を水平区切り線とみなす
+RASTER_BLOCK_GAP_MM = 4         # これ以上の空白行でテキストブロックを区切る
+RASTER_SAFETY_MARGIN_MM = 2     # 境界の上に取る余白
+RASTER_MIN_HEIGHT_MM = 10
+RASTER_MAX_HEIGHT_MM = 70
+RASTER_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_band_cache = OrderedDict()
+_band_cache_bytes = 0
+_band_cache_lock = threading.Lock()
+
+# pdfplumberの文書オブジェクトごとのpdfium文書と内容ハッシュ（文書が閉じられたら自動で解放）
+_documents = weakref.WeakKeyDictionary()
+
+
+def _document_for(pdf):
+    """pdfplumberの文書に対応するpdfium文書と内容ハッシュを取得（文書ごとに1回だけ作成）"""
+    entry = _documents.get(pdf)
+    if entry is None:
+        stream = pdf.stream
+        stream.seek(0)
+        data = stream.read()
+        entry = (pdfium.PdfDocument(data), hashlib.sha1(data).hexdigest())
+        _documents[pdf] = entry
+    return entry
+
+
+def _cache_put(key, band):
+    global _band_cache_bytes
+    with _band_cache_lock:
+        if key in _band_cache:
+            return
+        _band_cache[key] = band
+        _band_cache_bytes += band.nbytes
+        while _band_cache_bytes > RASTER_CACHE_MAX_BYTES and _band_cache:
+            _, evicted = _band_cache.popitem(last=False)
+            _band_cache_bytes -= evicted.nbytes
+
+
+def render_bottom_band(page, dpi=RASTER_DPI, band_ratio=RASTER_BAND_RATIO):
+    """pdfplumberページの下部帯をグレースケールのNumPy配列（上→下の行順）で返す"""
+    document, content_hash = _document_for(page.pdf)
+    page_index = page.page_number - 1
+    key = (content_hash, page_index, dpi, band_ratio)
+
+    with _band_cache_lock:
+        band = _band_cache.get(key)
+        if band is not None:
+            _band_cache.move_to_end(key)
+            return band
+
+    pdfium_page = document[page_index]
+    try:
+        # 表示上の高さ（回転後）のうち上側を切り落とし、下部の帯だけをレンダリング
+        crop_top = float(page.height) * (1 - band_ratio)
+        bitmap = pdfium_page.render(scale=dpi / 72, crop=(0, 0, 0, crop_top), grayscale=True)
+        band = np.array(bitmap.to_numpy(), copy=True)
+    finally:
+        pdfium_page.close()
+
+    if band.ndim == 3:
+        band = band[:, :, :3].mean(axis=2).astype(np.uint8) if band.shape[2] >= 3 else band[:, :, 0]
+    _cache_put(key, band)
+    return band
+
+
+def _row_runs(mask):
+    """真の行が連続する区間 [(開始, 終了), ...] を返す（終了は含まない）"""
+    if not mask.any():
+        return []
+    padded = np.concatenate(([False], mask, [False]))
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(changes[0::2], changes[1::2]))
+
+
+def analyze_band(band, dpi=RASTER_DPI):
+    """行の墨量プロファイルから区切り線とフッターブロックの上端（帯の上からの行番号）を求める"""
+    height, width = band.shape
+    px_per_mm = dpi / 25.4
+    ink = band < RASTER_INK_THRESHOLD
+    row_ink = ink.mean(axis=1)
+
+    text_rows = row_ink >= RASTER_TEXT_ROW_RATIO
+    rule_rows = row_ink >= RASTER_RULE_ROW_RATIO
+
+    text_runs = _row_runs(text_rows & ~rule_rows)
+    rule_runs = _row_runs(rule_rows)
+    if not text_runs and not rule_runs:
+        return {'band_height': height, 'boundary_row': None, 'separator_row': None, 'text_rows': 0}
+
+    # 最下部のテキストブロック: 下から辿り、空白が RASTER_BLOCK_GAP_MM 以上開くか区切り線を越えたら終了
+    block_top = None
+    gap_limit = RASTER_BLOCK_GAP_MM * px_per_mm
+    for start, end in reversed(text_runs):
+        if block_top is not None:
+            crosses_rule = any(end <= rule_start and rule_end <= block_top for rule_start, rule_end in rule_runs)
+            if block_top - end >= gap_limit or crosses_rule:
+                break
+        block_top = start
+
+    # フッターブロックの上にある最も近い全幅区切り線を境界とする
+    separator_row = None
+    for start, end in reversed(rule_runs):
+        if block_top is None or end <= block_top:
+            separator_row = int(start)
+            break
+
+    boundary_row = separator_row if separator_row is not None else block_top
+    return {
+        'band_height': height,
+        'boundary_row': None if boundary_row is None else int(boundary_row),
+        'separator_row': separator_row,
+        'text_rows': int(text_rows.sum()),
+    }
+
+
+def detect_footer_raster(page, dpi=RASTER_DPI, band_ratio=RASTER_BAND_RATIO):
+    """テキストレイヤーのないページのフッター高さ（mm）を画像から推定"""
+    band = render_bottom_band(page, dpi, band_ratio)
+    analysis = analyze_band(band, dpi)
+    px_per_mm = dpi / 25.4
+
+    if analysis['boundary_row'] is None:
+        # 下部帯に何も描かれていない: フッターなしとみなし最小限の高さ
+        return {
+            'bottom_height': RASTER_MIN_HEIGHT_MM,
+            'confidence': 40,
+            'method': 'raster_blank',
+        }
+
+    raw_height_mm = (analysis['band_height'] - analysis['boundary_row']) / px_per_mm
+    final_height_mm = max(RASTER_MIN_HEIGHT_MM,
+                          min(RASTER_MAX_HEIGHT_MM, raw_height_mm + RASTER_SAFETY_MARGIN_MM))
+    has_separator = analysis['separator_row'] is not None
+
+    if has_separator:
+        # 区切り線があれば境界は明確
+        confidence, method = 75, 'raster_separator'
+    elif analysis['boundary_row'] == 0:
+        # ブロックが帯の上端まで続いている: 本文と分離できていない
+        confidence, method = 45, 'raster_unbounded'
+    else:
+        confidence, method = 60, 'raster_text_block'
+
+    return {
+        'bottom_height': round(final_height_mm, 1),
+        'confidence': confidence,
+        'method': method,
+        'raw_footer_height_mm': round(raw_height_mm, 1),
+    }
@@ -0,0 +1,171 @@
+"""
+フッターの白塗り範囲を、ページ下部の全幅の帯ではなく事業者情報のまとまりごとの矩形で求める
+
+右の段だけにフッターがあるマイソクや、横にロゴ枠を置いたマイソクでは、全幅の帯で塗ると
+左側の物件情報まで消え、帯の高さを抑えるとロゴが残る。そこで検出済みのフッター高さの帯の中で
+
+1. 単語の外接矩形をグリッド（一定サイズのセル）に登録し、近い単語どうしだけを比べて
+   文字の大きさに応じた間隔以内のものを同じまとまりにする（Union-Find）
+2. 事業者情報のキーワード（utils.footer_keywords）を含むまとまりを白塗り対象とし、接している画像（ロゴ等）も含める
+3. 余白を付けて重なる矩形をまとめる
+
+矩形が帯のほとんどを覆う場合は、従来どおり全幅の帯で塗る（None を返す）。
+座標は表示座標（左下原点, pt）の [x0, y0, x1, y1]。
+"""
+
+from collections import defaultdict
+
+from utils.footer_keywords import FOOTER_LINE_MIN_SCORE, score_lines
+
+MM_PER_PT = 25.4 / 72
+
+REGION_GRID_CELL = 24               # グリッドのセルの大きさ（pt）
+REGION_HORIZONTAL_GAP = 1.5         # 文字の高さのこの倍数以内の横の隙間は同じまとまり
+REGION_VERTICAL_GAP = 1.5           # 文字の高さのこの倍数以内の縦の隙間は同じまとまり（行間の広いフッター向け）
+REGION_PADDING_MM = 1.5
+REGION_GRAPHIC_GAP_MM = 6           # フッターのまとまりからこの距離以内の画像・枠（ロゴ等）を含める
+REGION_FULL_BAND_RATIO = 0.85       # 帯に対してこれ以上を覆うなら全幅の帯で塗る
+REGION_MIN_SIZE_MM = 5
+
+
+class BoxGrid:
+    """矩形の近傍検索用グリッド（矩形が重なるセルすべてに登録）"""
+
+    def __init__(self, cell_size=REGION_GRID_CELL):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+
+    def _cells(self, x0, top, x1, bottom):
+        size = self.cell_size
+        for cx in range(int(x0 // size), int(x1 // size) + 1):
+            for cy in range(int(top // size), int(bottom // size) + 1):
+                yield cx, cy
+
+    def insert(self, key, box):
+        for cell in self._cells(*box):
+            self.cells[cell].append(key)
+
+    def query(self, box):
+        """box と同じセルに登録された矩形のキー"""
+        found = set()
+        for cell in self._cells(*box):
+            found.update(self.cells.get(cell, ()))
+        return found
+
+
+def _find(parents, key):
+    while parents[key] != key:
+        parents[key] = parents[parents[key]]
+        key = parents[key]
+    return key
+
+
+def cluster_boxes(boxes):
+    """近い矩形どうしをまとめたクラスタ（矩形番号のリスト）の一覧
+
+    boxes: [(x0, top, x1, bottom), ...]（pdfplumber座標）
+    """
+    grid = BoxGrid()
+    for index, box in enumerate(boxes):
+        grid.insert(index, box)
+
+    parents = list(range(len(boxes)))
+    for index, (x0, top, x1, bottom) in enumerate(boxes):
+        height = bottom - top
+        reach_x = height * REGION_HORIZONTAL_GAP
+        reach_y = height * REGION_VERTICAL_GAP
+        # 判定は大きい方の文字の高さで行うため、低い方からは届かない組も高い方からの検索で見つかる
+        for other in grid.query((x0 - reach_x, top - reach_y, x1 + reach_x, bottom + reach_y)):
+            if other == index:
+                continue
+            ox0, otop, ox1, obottom = boxes[other]
+            gap_x = max(0, max(x0, ox0) - min(x1, ox1))
+            gap_y = max(0, max(top, otop) - min(bottom, obottom))
+            line_height = max(height, obottom - otop)
+            if gap_x <= line_height * REGION_HORIZONTAL_GAP and gap_y <= line_height * REGION_VERTICAL_GAP:
+                parents[_find(parents, index)] = _find(parents, other)
+
+    clusters = defaultdict(list)
+    for index in range(len(boxes)):
+        clusters[_find(parents, index)].append(index)
+    return list(clusters.values())
+
+
+def _bounds(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def _touches(a, b, margin):
+    return a[0] - margin <= b[2] and b[0] - margin <= a[2] and a[1] - margin <= b[3] and b[1] - margin <= a[3]
+
+
+def merge_regions(regions):
+    """重なる・接する矩形を1つにまとめる（まとまらなくなるまで繰り返す）"""
+    regions = [list(region) for region in regions]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                if _touches(regions[i], regions[j], 1):
+                    a, b = regions[i], regions.pop(j)
+                    regions[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    merged = True
+                    break
+            if merged:
+                break
+    return regions
+
+
+def region_area(regions):
+    return sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+
+
+def find_redaction_regions(page_text, band_height_pt):
+    """フッター帯（下端から band_height_pt）の中で白塗りする矩形（表示座標）。帯全体で塗るべきならNone
+
+    page_text: utils.page_text.PageText
+    """
+    page_width = page_text.width
+    page_height = page_text.height
+    band_top = max(0, page_height - band_height_pt)
+
+    words = page_text.words(page_text.bottom > band_top)
+    if not words:
+        return None
+    boxes = [(float(w['x0']), float(w['top']), float(w['x1']), float(w['bottom'])) for w in words]
+
+    footer_boxes = []
+    clusters = cluster_boxes(boxes)
+    texts = [' '.join(words[index]['text'] for index in cluster) for cluster in clusters]
+    for cluster, (score, _) in zip(clusters, score_lines(texts)):
+        if score >= FOOTER_LINE_MIN_SCORE:
+            footer_boxes.append(_bounds([boxes[index] for index in cluster]))
+    if not footer_boxes:
+        return None
+
+    # ロゴ等の画像・枠はフッターのまとまりに接していれば含める
+    padding = REGION_PADDING_MM / MM_PER_PT
+    graphics = [(x0, max(top, band_top), x1, bottom)
+                for x0, top, x1, bottom, _ in page_text.shapes(('image', 'rect'), top=band_top)
+                if bottom - max(top, band_top) > 3 and x1 - x0 > 3]
+    regions = list(footer_boxes)
+    graphic_gap = REGION_GRAPHIC_GAP_MM / MM_PER_PT
+    for graphic in graphics:
+        if any(_touches(graphic, region, graphic_gap) for region in footer_boxes):
+            regions.append(graphic)
+
+    regions = merge_regions([
+        (max(0, x0 - padding), max(band_top, top - padding), min(page_width, x1 + padding),
+         min(page_height, bottom + padding))
+        for x0, top, x1, bottom in regions
+    ])
+    min_size = REGION_MIN_SIZE_MM / MM_PER_PT
+    regions = [r for r in regions if r[2] - r[0] >= min_size and r[3] - r[1] >= min_size]
+    if not regions or region_area(regions) >= page_width * band_height_pt * REGION_FULL_BAND_RATIO:
+        return None
+
+    # pdfplumber座標（上端基準）→ 表示座標（左下原点）
+    return [[round(x0, 2), round(page_height - bottom, 2), round(x1, 2), round(page_height - top, 2)]
+            for x0, top, x1, bottom in sorted(regions, key=lambda r: (r[1], r[0]))]
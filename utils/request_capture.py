@@ -0,0 +1,232 @@
+"""
+本番リクエストの記録と、再生結果の照合
+
+変換の不具合や遅延をオフラインで再現するため、設定で有効にした場合だけ
+PDFを受け取るリクエストを記録する（replay_requests.py で再生する）。
+
+- captures.jsonl: 1リクエスト1行（時刻・ルート・フォーム値・入力ハッシュ・会社情報・応答の要約・所要時間）
+  応答の本文（抽出テキスト・PDF・画像）は記録せず、ハッシュだけを残す
+- inputs/<SHA-1>.pdf: 入力PDF（保存しない設定ではハッシュのみ記録し、再生時に元ファイルのフォルダを指定する）
+
+個人情報にあたる会社情報の項目（電話番号・住所等）とファイル名は伏せ字にして記録する。
+伏せ字は文字種ごとに同じ幅の文字で置き換えるため、フッターの文字配置は本番とほぼ同じになる
+（文字そのものは変わるので、伏せ字にした記録を記録時の応答と比べるとフッター部分は必ず違いが出る）。
+
+変換後PDFはリソース名に乱数が入りバイト列が毎回変わるため、応答は
+ページごとのテキストのハッシュと画像のdHashで要約し、その要約同士を比較する。
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+import pypdfium2 as pdfium
+
+from utils.duplicate_index import dhash
+from utils.preview import content_hash
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_LOG_NAME = 'captures.jsonl'
+CAPTURE_INPUT_DIR = 'inputs'
+CAPTURE_REDACT_FIELDS = (
+    'postal_code', 'address', 'phone', 'fax', 'email', 'website', 'license_number', 'representative_name',
+)
+CAPTURE_DROP_FORM_FIELDS = ('job_id',)   # 再生時に意味のない値
+FINGERPRINT_DPI = 18
+FINGERPRINT_MAX_DHASH_DISTANCE = 4       # これ以下のハミング距離なら見た目は同じとみなす
+VOLATILE_RESPONSE_KEYS = ('file_id', 'profile', 'cached')
+
+
+def redact_text(value):
+    """文字種ごとに同じ幅の文字で伏せ字にする（数字→0、英字→x、その他→＊、空白と記号はそのまま）"""
+    redacted = []
+    for char in str(value):
+        if char.isdigit():
+            redacted.append('0' if char.isascii() else '０')
+        elif char.isalpha():
+            redacted.append('x' if char.isascii() else '＊')
+        else:
+            redacted.append(char)
+    return ''.join(redacted)
+
+
+def redact_fields(data, fields=CAPTURE_REDACT_FIELDS):
+    return {key: redact_text(value) if key in fields and value else value for key, value in data.items()}
+
+
+def redact_filename(filename, digest):
+    """ファイル名は顧客名を含みうるため、拡張子だけ残して内容ハッシュに置き換える"""
+    extension = os.path.splitext(filename or '')[1].lower() or '.pdf'
+    return f"{digest[:12]}{extension}"
+
+
+def pdf_fingerprint(pdf_data):
+    """PDFの要約（ページ数・ページごとのテキストハッシュと画像dHash）"""
+    document = pdfium.PdfDocument(pdf_data)
+    pages = []
+    try:
+        for index in range(len(document)):
+            page = document[index]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    text = ''.join(textpage.get_text_range().split())
+                finally:
+                    textpage.close()
+                image = page.render(scale=FINGERPRINT_DPI / 72).to_pil()
+                width, height = page.get_size()
+            finally:
+                page.close()
+            pages.append({
+                'size': [round(width, 1), round(height, 1)],
+                'text': hashlib.sha1(text.encode('utf-8')).hexdigest()[:16],
+                'dhash': dhash(image),
+            })
+    finally:
+        document.close()
+    return {'pages': len(pages), 'page_fingerprints': pages}
+
+
+def response_fingerprint(payload):
+    """JSON応答の要約（PDF・画像は中身の要約に置き換え、毎回変わる値は除く）"""
+    if not isinstance(payload, dict):
+        return {'body': hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:16]}
+
+    fingerprint = {}
+    for key, value in payload.items():
+        if key in VOLATILE_RESPONSE_KEYS:
+            continue
+        if key == 'pdf_data' and value:
+            try:
+                fingerprint['pdf'] = pdf_fingerprint(base64.b64decode(value))
+            except Exception as e:
+                fingerprint['pdf'] = {'error': str(e)}
+        elif key == 'images' and isinstance(value, dict):
+            fingerprint['images'] = {
+                kind: hashlib.sha1(data.encode('ascii')).hexdigest()[:16] for kind, data in value.items()
+            }
+        elif key == 'raw_text':
+            fingerprint['raw_text'] = hashlib.sha1((value or '').encode('utf-8')).hexdigest()[:16]
+        elif key == 'filename':
+            continue
+        else:
+            fingerprint[key] = value
+    return fingerprint
+
+
+def diff_fingerprints(before, after):
+    """2つの応答要約の違いを項目ごとに列挙（同じなら空リスト）"""
+    differences = []
+    before, after = before or {}, after or {}
+    for key in sorted(set(before) | set(after)):
+        old, new = before.get(key), after.get(key)
+        if key == 'pdf' and isinstance(old, dict) and isinstance(new, dict):
+            differences += _diff_pdf(old, new)
+        elif key == 'extracted_data' and isinstance(old, dict) and isinstance(new, dict):
+            for field in sorted(set(old) | set(new)):
+                if old.get(field) != new.get(field):
+                    differences.append({'field': f'extracted_data.{field}', 'before': old.get(field),
+                                        'after': new.get(field)})
+        elif old != new:
+            differences.append({'field': key, 'before': old, 'after': new})
+    return differences
+
+
+def _diff_pdf(old, new):
+    if old.get('pages') != new.get('pages'):
+        return [{'field': 'pdf.pages', 'before': old.get('pages'), 'after': new.get('pages')}]
+    differences = []
+    for index, (a, b) in enumerate(zip(old.get('page_fingerprints', []), new.get('page_fingerprints', []))):
+        if a['size'] != b['size']:
+            differences.append({'field': f'pdf.page{index + 1}.size', 'before': a['size'], 'after': b['size']})
+        if a['text'] != b['text']:
+            differences.append({'field': f'pdf.page{index + 1}.text', 'before': a['text'], 'after': b['text']})
+        distance = bin(a['dhash'] ^ b['dhash']).count('1')
+        if distance > FINGERPRINT_MAX_DHASH_DISTANCE:
+            differences.append({'field': f'pdf.page{index + 1}.image', 'distance': distance})
+    return differences
+
+
+class RequestCapture:
+    """リクエストの記録先（JSON Lines への追記と入力PDFの保存）"""
+
+    def __init__(self, directory, store_inputs=True, sample_rate=1.0, redact=CAPTURE_REDACT_FIELDS):
+        self.directory = directory
+        self.store_inputs = store_inputs
+        self.sample_rate = sample_rate
+        self.redact = tuple(redact)
+        self._lock = threading.Lock()
+
+    @property
+    def log_path(self):
+        return os.path.join(self.directory, CAPTURE_LOG_NAME)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def store_input(self, data):
+        """入力PDFを内容ハッシュ名で保存（保存済みなら書かない）してハッシュを返す"""
+        digest = content_hash(data)
+        if not self.store_inputs:
+            return digest
+        input_dir = os.path.join(self.directory, CAPTURE_INPUT_DIR)
+        path = os.path.join(input_dir, f"{digest}.pdf")
+        if not os.path.exists(path):
+            os.makedirs(input_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=input_dir, prefix='.tmp_')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return digest
+
+    def build_entry(self, method, path, form, files, company_info=None):
+        """リクエストの記録（入力は保存して伏せ字・ハッシュに置き換え）"""
+        stored_files = {}
+        for field, (filename, data) in files.items():
+            digest = self.store_input(data)
+            stored_files[field] = {
+                'filename': redact_filename(filename, digest),
+                'sha1': digest,
+                'bytes': len(data),
+                'stored': self.store_inputs,
+            }
+        return {
+            'capture_id': f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}",
+            'captured_at': time.time(),
+            'method': method,
+            'path': path,
+            'form': {key: value for key, value in form.items() if key not in CAPTURE_DROP_FORM_FIELDS},
+            'files': stored_files,
+            'company_info': redact_fields(company_info, self.redact) if company_info else None,
+            'redacted': sorted(key for key in self.redact if company_info and company_info.get(key)),
+        }
+
+    def record(self, entry):
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        try:
+            with self._lock:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            logger.warning(f"⚠️ リクエストを記録できませんでした: {e}")
+
+
+def load_captures(directory):
+    """記録済みリクエストを記録順に読み込む（途中で切れた最終行は無視）"""
+    entries = []
+    path = os.path.join(directory, CAPTURE_LOG_NAME)
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return entries
@@ -0,0 +1,107 @@
+"""
+ベンチマーク・ウォームアップ用のサンプルマイソクPDF生成
+"""
+
+import os
+from io import BytesIO
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.lib.utils import ImageReader
+
+SAMPLE_FONT = 'HeiseiKakuGo-W5'
+
+SAMPLE_BODY_LINES = [
+    "物件種別: マンション",
+    "賃料: 12.5万円 / 管理費: 8,000円",
+    "所在地: 東京都渋谷区神宮前1-2-3",
+    "交通: JR山手線 原宿駅 徒歩5分",
+    "間取り: 2LDK / 専有面積: 55.20㎡",
+    "築: 15年 / 構造: RC造 10階建",
+    "設備: オートロック、宅配ボックス、浴室乾燥機",
+]
+
+SAMPLE_REMARK_LINES = [
+    "備考: ペット相談、楽器不可",
+    "更新料: 新賃料の1ヶ月分",
+    "保証会社加入必須",
+]
+
+SAMPLE_FOOTER_LINES = [
+    "取引態様: 仲介 / AD: 100%",
+    "株式会社サンプル不動産 東京都知事(3)第12345号",
+    "TEL: 03-1234-5678 / FAX: 03-1234-5679",
+]
+
+
+def _draw_lines(pdf_canvas, x, y, lines, font_size, line_gap, with_text):
+    """行を描画（with_text=Falseならスキャン画像相当の墨ベタ矩形で代用）"""
+    for line in lines:
+        if with_text:
+            pdf_canvas.drawString(x, y, line)
+        else:
+            pdf_canvas.rect(x, y, len(line) * font_size * 0.8, font_size * 0.8, fill=1, stroke=0)
+        y -= line_gap
+    return y
+
+
+def _noise_photo(photo_px):
+    """圧縮の効かない物件写真の代わり（ページごとに異なるJPEG）"""
+    image = Image.frombytes('RGB', (photo_px, photo_px), os.urandom(photo_px * photo_px * 3))
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    buffer.seek(0)
+    return ImageReader(buffer)
+
+
+def build_sample_mysouku(pages=1, body_repeat=3, pagesize=A4, with_text=True, with_footer=True, photo_px=0,
+                         footer_layout='band'):
+    """本文と事業者フッターを持つサンプルマイソクPDFを生成してバイト列で返す
+
+    with_text=False の場合はテキストレイヤーを持たない（スキャン相当の）PDFを生成する。
+    with_footer=False の場合はフッター（区切り線と事業者情報）を描かない。
+    photo_px>0 の場合は一辺 photo_px ピクセルの写真（ノイズ画像）を各ページに配置する。
+    footer_layout='right_column' の場合は、左の段に物件の備考、右の段にロゴ枠と事業者情報を置く。
+    """
+    pdfmetrics.registerFont(UnicodeCIDFont(SAMPLE_FONT))
+    buffer = BytesIO()
+    page_width, page_height = pagesize
+    pdf_canvas = canvas.Canvas(buffer, pagesize=pagesize)
+
+    for page_index in range(pages):
+        # 本文（物件情報）
+        pdf_canvas.setFont(SAMPLE_FONT, 16)
+        _draw_lines(pdf_canvas, 20 * mm, page_height - 25 * mm,
+                    [f"サンプル物件 No.{page_index + 1}"], 16, 0, with_text)
+        if photo_px:
+            pdf_canvas.drawImage(_noise_photo(photo_px), page_width - 90 * mm, page_height - 110 * mm,
+                                 width=80 * mm, height=80 * mm)
+        pdf_canvas.setFont(SAMPLE_FONT, 10)
+        y = page_height - 40 * mm
+        for _ in range(body_repeat):
+            y = _draw_lines(pdf_canvas, 20 * mm, y, SAMPLE_BODY_LINES, 10, 6 * mm, with_text)
+
+        # 右の段だけのフッター（左の段は物件の備考）
+        if with_footer and footer_layout == 'right_column':
+            pdf_canvas.setFont(SAMPLE_FONT, 9)
+            _draw_lines(pdf_canvas, 15 * mm, 30 * mm, SAMPLE_REMARK_LINES, 9, 6 * mm, with_text)
+            column_x = page_width / 2 + 5 * mm
+            pdf_canvas.setLineWidth(0.5)
+            pdf_canvas.rect(column_x, 10 * mm, 18 * mm, 18 * mm, fill=0, stroke=1)
+            pdf_canvas.setFont(SAMPLE_FONT, 7)
+            _draw_lines(pdf_canvas, column_x + 21 * mm, 24 * mm, SAMPLE_FOOTER_LINES, 7, 5 * mm, with_text)
+        # フッター区切り線 + 事業者情報
+        elif with_footer:
+            footer_top = 32 * mm
+            pdf_canvas.setLineWidth(1)
+            pdf_canvas.line(10 * mm, footer_top, page_width - 10 * mm, footer_top)
+            pdf_canvas.setFont(SAMPLE_FONT, 9)
+            _draw_lines(pdf_canvas, 15 * mm, footer_top - 8 * mm, SAMPLE_FOOTER_LINES, 9, 7 * mm, with_text)
+
+        pdf_canvas.showPage()
+
+    pdf_canvas.save()
+    return buffer.getvalue()
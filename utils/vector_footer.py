@@ -0,0 +1,129 @@
+"""
+罫線・矩形（ベクター図形）によるフッター境界検出
+
+マイソクのフッターは本文との間に罫線や塗りつぶしの帯が引かれていることが多い。
+ページの罫線・矩形・曲線（utils.page_text.PageText の図形）から水平な区切り候補を集めてy座標でソートし、
+文字ベースで求めたフッター上端以上にある最も低い全幅区切りを二分探索で求める
+（フッター枠の中の表の罫線・下線は、その上に事業者情報の行があるため採用しない）。
+座標はすべてpdfplumberの top 系（ページ上端からの距離, pt）。
+"""
+
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+MM_PER_PT = 25.4 / 72
+
+VECTOR_RULE_MAX_THICKNESS = 3     # これ以下の高さの図形を罫線とみなす（pt）
+VECTOR_FULL_WIDTH_RATIO = 0.6     # ページ幅に対してこの割合以上の長さを全幅とみなす
+VECTOR_MAX_FOOTER_MM = 70         # 区切り候補を探すページ下端からの範囲
+VECTOR_MIN_FOOTER_CHARS = 3       # 区切りの下にこれ以上の文字があればフッターとみなす
+VECTOR_SAFETY_MARGIN_MM = 1       # 区切りの上に取る余白（位置が正確なので小さくてよい）
+VECTOR_MIN_HEIGHT_MM = 10
+VECTOR_MAX_HEIGHT_MM = 70
+VECTOR_TEXT_TOP_TOLERANCE_MM = 1  # 文字ベースのフッター上端よりこれだけ下の区切りまでは上端と同じ位置とみなす
+VECTOR_AGREEMENT_GAP_MM = 10      # 区切りとフッター上端の間隔がこれ以下なら両者が一致したとみなす
+VECTOR_DISAGREEMENT_GAP_MM = 30   # 間隔がこれ以上なら信頼度を上げない（間は線形に減らす）
+
+
+class RuleIndex:
+    """水平区切り候補をy座標の昇順で保持するインデックス"""
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda rule: rule['y'])
+        self.ys = [rule['y'] for rule in self.rules]
+
+    def between(self, y_min, y_max):
+        """y_min <= y <= y_max の候補を上から順に返す"""
+        return self.rules[bisect_left(self.ys, y_min):bisect_right(self.ys, y_max)]
+
+    def __len__(self):
+        return len(self.rules)
+
+
+def build_rule_index(page_text, min_width_ratio=VECTOR_FULL_WIDTH_RATIO):
+    """ページの罫線・矩形・曲線から全幅の水平区切り候補を集めてインデックス化"""
+    min_width = page_text.width * min_width_ratio
+    rules = []
+
+    for x0, top, x1, bottom, kind in page_text.shapes(('line', 'rect', 'curve')):
+        if x1 - x0 < min_width:
+            continue
+        if bottom - top <= VECTOR_RULE_MAX_THICKNESS:
+            # 罫線・細い塗りつぶし矩形（罫線として描かれたもの）・水平な曲線
+            rules.append({'y': (top + bottom) / 2, 'x0': x0, 'x1': x1,
+                          'kind': 'thin_rect' if kind == 'rect' else kind})
+        elif kind == 'rect':
+            # フッターを囲む帯・枠は上辺を境界候補にする
+            rules.append({'y': top, 'x0': x0, 'x1': x1, 'kind': 'box'})
+
+    return RuleIndex(rules)
+
+
+def detect_footer_vector(page_text, rule_index=None, text_top=None):
+    """フッター文字の上にある最も低い全幅区切りを求める（見つからなければNone）
+
+    page_text: utils.page_text.PageText
+    text_top: 文字ベースで求めたフッター上端（pt、top系）。指定すると、それより下の区切りは候補にしない
+    """
+    page_height = page_text.height
+    if rule_index is None:
+        rule_index = build_rule_index(page_text)
+    if not len(rule_index):
+        return None
+
+    char_tops = np.sort(page_text.top).tolist()
+    if not char_tops:
+        return None
+
+    search_top = page_height - VECTOR_MAX_FOOTER_MM / MM_PER_PT
+    search_bottom = page_height
+    if text_top is not None:
+        search_bottom = min(page_height, text_top + VECTOR_TEXT_TOP_TOLERANCE_MM / MM_PER_PT)
+    # 下から順に、下側にフッター文字を持つ最初の区切りを採用
+    for rule in reversed(rule_index.between(search_top, search_bottom)):
+        chars_below = len(char_tops) - bisect_right(char_tops, rule['y'])
+        if chars_below >= VECTOR_MIN_FOOTER_CHARS:
+            raw_height_mm = (page_height - rule['y']) * MM_PER_PT
+            return {
+                'raw_footer_height_mm': round(raw_height_mm, 1),
+                'separator_y': round(rule['y'], 1),
+                'separator_kind': rule['kind'],
+                'chars_below': chars_below,
+                'rules_indexed': len(rule_index),
+            }
+    return None
+
+
+def combine_with_text_result(vector_result, text_result):
+    """罫線検出の結果と文字ベース検出の結果を統合して最終結果を返す
+
+    vector_result は文字ベースのフッター上端（text_top）を渡して求めたもの（区切りは上端以上にある）。
+    信頼度は区切りとフッター上端の間隔に応じて上げる（離れているほど本文まで塗る可能性があるため上げない）。
+    """
+    if vector_result is None:
+        return text_result
+
+    vector_height = vector_result['raw_footer_height_mm']
+    final_height_mm = max(VECTOR_MIN_HEIGHT_MM,
+                          min(VECTOR_MAX_HEIGHT_MM, vector_height + VECTOR_SAFETY_MARGIN_MM))
+    text_confidence = text_result.get('confidence', 0)
+
+    gap_mm = max(0.0, vector_height - text_result['raw_footer_height_mm'])
+    closeness = (VECTOR_DISAGREEMENT_GAP_MM - gap_mm) / (VECTOR_DISAGREEMENT_GAP_MM - VECTOR_AGREEMENT_GAP_MM)
+    closeness = max(0.0, min(1.0, closeness))
+    agreed_confidence = min(95, max(text_confidence, 80) + 5)
+    confidence = round(text_confidence + (agreed_confidence - text_confidence) * closeness)
+
+    result = dict(text_result)
+    result.update({
+        'bottom_height': round(final_height_mm, 1),
+        'confidence': confidence,
+        'method': f"vector_{vector_result['separator_kind']}",
+        'text_method': text_result.get('method'),
+        'text_confidence': text_confidence,
+        'raw_footer_height_mm': vector_height,
+        'separator_y': vector_result['separator_y'],
+        'separator_gap_mm': round(gap_mm, 1),
+    })
+    return result